@@ -5,8 +5,13 @@ from routes.course_gen import course_gen_bp
 from routes.course_fetch import course_fetch_bp
 from routes.quick_learn import quick_learn_bp
 from routes.flashcards import flashcards_bp
+from routes.progress import progress_bp
+from routes.search import search_bp
+from routes.library_export import library_export_bp
+from utils.json_provider import OrjsonProvider
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 
 # Enable CORS for all routes starting with /api
 CORS(app, supports_credentials=True, resources={r"/api/*": {"origins": ["http://localhost:3000", "https://luminous-learn.vercel.app"]}})
@@ -16,6 +21,9 @@ app.register_blueprint(course_gen_bp, url_prefix="/api")
 app.register_blueprint(course_fetch_bp, url_prefix="/api")
 app.register_blueprint(quick_learn_bp, url_prefix="/api")
 app.register_blueprint(flashcards_bp, url_prefix="/api")
+app.register_blueprint(progress_bp, url_prefix="/api")
+app.register_blueprint(search_bp, url_prefix="/api")
+app.register_blueprint(library_export_bp, url_prefix="/api")
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=8080, debug=True)
\ No newline at end of file
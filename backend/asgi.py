@@ -0,0 +1,47 @@
+'''
+Async serving mode.
+
+    hypercorn asgi:app --bind 0.0.0.0:8080
+
+The generation endpoints (/api/generate_syllabus[/stream], /api/generate_course,
+/api/generate_quick_learn) are served by a Quart app whose handlers await the async
+Gemini and Supabase clients. Every other route is passed through to the regular Flask
+app in app.py, so both modes expose the same API. The WSGI mode (gunicorn app:app)
+is unchanged.
+'''
+from asgiref.wsgi import WsgiToAsgi
+from quart import Quart
+from quart_cors import cors
+from app import app as flask_app
+from routes.async_gen import async_gen_bp
+from utils.json_provider import OrjsonProvider
+from utils.touch_buffer import flush_touches
+
+ALLOWED_ORIGINS = ["http://localhost:3000", "https://luminous-learn.vercel.app"]
+
+quart_app = Quart(__name__)
+quart_app.json = OrjsonProvider(quart_app)
+quart_app = cors(
+    quart_app,
+    allow_origin=ALLOWED_ORIGINS,
+    allow_credentials=True,
+    allow_headers=["Content-Type", "Authorization"],
+    allow_methods=["POST", "OPTIONS"],
+)
+quart_app.register_blueprint(async_gen_bp, url_prefix="/api")
+
+@quart_app.after_serving
+async def flush_pending_touches():
+    # Write out buffered last_accessed touches before the worker exits
+    flush_touches()
+
+ASYNC_PATHS = {rule.rule for rule in quart_app.url_map.iter_rules() if rule.endpoint != "static"}
+
+wsgi_app = WsgiToAsgi(flask_app)
+
+async def app(scope, receive, send):
+    # Lifespan events and the async routes go to Quart, everything else to Flask
+    if scope["type"] == "lifespan" or scope.get("path") in ASYNC_PATHS:
+        await quart_app(scope, receive, send)
+    else:
+        await wsgi_app(scope, receive, send)
@@ -0,0 +1,111 @@
+"""
+Microbenchmark for course assembly in generate_course_from_syllabus.
+
+Compares the old assembly (re-validating every Lesson/Unit, LessonComplete(**dict),
+CourseFull(...).model_dump()) against the single-pass pipeline on a synthetic
+70-lesson course built from course_content.json. No Gemini calls are made.
+
+Run from backend/:  python -m benchmarks.bench_course_assembly
+"""
+import copy
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.course_generation import (
+    Course, CourseFull, Lesson, LessonComplete, Unit,
+    build_course_document, syllabus_adapter, validate_lesson,
+)
+from utils.syllabus_generation import Syllabus
+
+UNITS = 10
+LESSONS_PER_UNIT = 7
+ROUNDS = 20
+
+
+def make_fixture():
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(os.path.join(base_dir, "course_content.json")) as f:
+        samples = [lesson for lesson in json.load(f) if "error" not in lesson]
+
+    units, lessons = [], []
+    for u in range(1, UNITS + 1):
+        outline = []
+        for i in range(LESSONS_PER_UNIT):
+            sample = copy.deepcopy(samples[(u * LESSONS_PER_UNIT + i) % len(samples)])
+            sample["unit_number"] = u
+            sample["status"] = "not started"
+            sample["duration_in_min"] = "45"
+            sample["assessments"] = {"question": "Q?", "answer_choices": ["A", "B"], "answer": "A"}
+            lessons.append(sample)
+            outline.append({
+                "lesson": sample["lesson"],
+                "lesson_summary": sample["lesson_summary"],
+                "learning_objectives": sample["learning_objectives"],
+            })
+        units.append({"unit_number": u, "title": f"Unit {u}", "unit_description": "desc", "lesson_outline": outline})
+
+    syllabus = {"course": {
+        "title": "Benchmark Course", "description": "desc",
+        "estimated_duration_hours_per_week": 3, "estimated_number_of_weeks": 10,
+        "level": "beginner", "depth": "deep", "units": units,
+        "last_accessed": "2025-01-01T00:00:00+00:00",
+    }}
+    return syllabus, lessons
+
+
+def legacy_assembly(syllabus_json, all_content):
+    c = Syllabus(**syllabus_json).course
+    full_course = Course(
+        title=c.title, description=c.description,
+        estimated_duration_hours_per_week=c.estimated_duration_hours_per_week,
+        estimated_number_of_weeks=c.estimated_number_of_weeks,
+        prerequisites=[], final_exam_description="", level=c.level, depth=c.depth,
+        units=[
+            Unit(unit_number=u.unit_number, title=u.title, unit_description=u.unit_description,
+                 lesson_outline=[Lesson(**l.model_dump()) for l in u.lesson_outline])
+            for u in c.units
+        ],
+        unit_lessons=[LessonComplete(**l) for l in all_content if l and "error" not in l],
+        is_draft=c.is_draft, last_accessed=c.last_accessed, completed=c.completed, user_id="",
+    )
+    return CourseFull(course=full_course).model_dump()
+
+
+def single_pass_assembly(syllabus_json, all_content):
+    # Lessons are validated in the worker threads; include that cost here
+    # (digests, also computed there, are left out: the legacy path had none).
+    validated = [validate_lesson(l) for l in all_content]
+    c = syllabus_adapter.validate_python(syllabus_json).course
+    return {"course": build_course_document(c, validated)}
+
+
+def measure(fn, syllabus, lessons):
+    fn(syllabus, lessons)  # warm-up
+    gc.collect()
+    timings = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        fn(syllabus, lessons)
+        timings.append(time.perf_counter() - start)
+    elapsed = statistics.median(timings)
+
+    tracemalloc.start()
+    fn(syllabus, lessons)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+if __name__ == "__main__":
+    syllabus, lessons = make_fixture()
+    print(f"{UNITS * LESSONS_PER_UNIT} lessons, {ROUNDS} rounds")
+    for name, fn in (("legacy", legacy_assembly), ("single-pass", single_pass_assembly)):
+        elapsed, peak = measure(fn, syllabus, lessons)
+        print(f"{name:>12}: {elapsed * 1000:8.2f} ms/course (median)   peak alloc {peak / 1024:8.1f} KiB")
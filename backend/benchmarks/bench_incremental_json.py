@@ -0,0 +1,150 @@
+"""
+Benchmark incremental JSON parsing (utils/incremental_json.py) against full-buffer parsing.
+
+Splits a synthetic 10-unit syllabus and a ~1 MB course document into stream-sized
+chunks and compares:
+
+- full buffer: join every chunk, then parse once (json / orjson)
+- incremental: IncrementalJSONParser.feed() per chunk, emitting each unit, then close()
+
+It reports CPU time per document and, for the incremental parser, how much of the
+stream had arrived when the header and the first unit could be sent. Full-buffer
+parsing can send nothing before 100%. No Gemini calls are made.
+
+Run from backend/:  python -m benchmarks.bench_incremental_json [--chunk 200]
+"""
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+
+import orjson
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.incremental_json import IncrementalJSONParser, WILDCARD
+from utils.syllabus_generation import SyllabusStream
+
+ROUNDS = 20
+UNITS = 10
+LESSONS_PER_UNIT = 7
+
+
+def make_syllabus():
+    sentence = "Students explore the ideas behind this topic with worked examples and practice. "
+    return {"course": {
+        "title": "Benchmark Course",
+        "description": sentence * 3,
+        "estimated_duration_hours_per_week": 4,
+        "estimated_number_of_weeks": 10,
+        "level": "Beginner",
+        "depth": "Standard (5–10 hours)",
+        "units": [
+            {
+                "unit_number": u + 1,
+                "title": f"Unit {u + 1}",
+                "unit_description": sentence * 2,
+                "lesson_outline": [
+                    {
+                        "lesson": f"Lesson {u + 1}.{l + 1}",
+                        "lesson_summary": sentence * 2,
+                        "learning_objectives": [f"Explain \"concept\" {k} of lesson {l + 1}" for k in range(4)],
+                    }
+                    for l in range(LESSONS_PER_UNIT)
+                ],
+            }
+            for u in range(UNITS)
+        ],
+    }}
+
+
+def make_course(target_bytes):
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(os.path.join(base_dir, "course_content.json")) as f:
+        samples = [lesson for lesson in json.load(f) if "error" not in lesson]
+    lessons, size, i = [], 0, 0
+    while size < target_bytes:
+        lesson = samples[i % len(samples)]
+        lessons.append(lesson)
+        size += len(json.dumps(lesson))
+        i += 1
+    return {"course": {"title": "Benchmark", "units": [], "unit_lessons": lessons}}
+
+
+def split(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def full_buffer_json(chunks):
+    return json.loads("".join(chunks))
+
+
+def full_buffer_orjson(chunks):
+    return orjson.loads("".join(chunks))
+
+
+def incremental(watch):
+    def run(chunks):
+        parser = IncrementalJSONParser(watch)
+        for chunk in chunks:
+            parser.feed(chunk)
+        return parser.close()
+    return run
+
+
+def timed(fn, chunks):
+    fn(chunks)  # warm-up
+    gc.collect()
+    timings = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        fn(chunks)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def first_events(chunks):
+    """Fraction of the stream received when the header and the first unit were emitted."""
+    stream = SyllabusStream()
+    total = sum(len(c) for c in chunks)
+    received, header_at, unit_at = 0, None, None
+    for chunk in chunks:
+        received += len(chunk)
+        for event in stream.feed(chunk):
+            if event["type"] == "header" and header_at is None:
+                header_at = received / total
+            if event["type"] == "unit" and unit_at is None:
+                unit_at = received / total
+    return header_at, unit_at
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental vs full-buffer JSON parsing")
+    parser.add_argument("--chunk", type=int, default=200, help="characters per streamed chunk")
+    args = parser.parse_args()
+
+    documents = (
+        ("syllabus", make_syllabus(), [("course", "units", WILDCARD)]),
+        ("~1 MB course", make_course(1_000_000), [("course", "unit_lessons", WILDCARD)]),
+    )
+    for name, doc, watch in documents:
+        text = json.dumps(doc, indent=2, ensure_ascii=False)
+        chunks = split(text, args.chunk)
+        print(f"--- {name}: {len(text) / 1000:.0f} kB in {len(chunks)} chunks of {args.chunk} chars")
+        for label, fn in (
+            ("full buffer (json)", full_buffer_json),
+            ("full buffer (orjson)", full_buffer_orjson),
+            ("incremental", incremental(watch)),
+        ):
+            print(f"{label:>22}: {timed(fn, chunks):8.2f} ms")
+        if name == "syllabus":
+            header_at, unit_at = first_events(chunks)
+            print(f"{'header sent at':>22}: {header_at:8.1%} of the stream (full buffer: 100%)")
+            print(f"{'first unit sent at':>22}: {unit_at:8.1%} of the stream (full buffer: 100%)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Benchmark JSON encoding of large course / quick learn documents.
+
+Compares Flask's default provider against OrjsonProvider for responses, and the
+old recursive make_json_serializable against to_json_compatible for DB payloads,
+on synthetic ~1 MB and ~5 MB documents built from course_content.json.
+
+Run from backend/:  python -m benchmarks.bench_json_encode
+"""
+import copy
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from utils.json_provider import OrjsonProvider, to_json_compatible
+from utils.quick_learn import Resource
+
+ROUNDS = 10
+
+
+def legacy_make_json_serializable(obj):
+    # Copy of the helper previously in utils/quick_learn_db.py
+    if isinstance(obj, (list, tuple)):
+        return [legacy_make_json_serializable(item) for item in obj]
+    elif isinstance(obj, dict):
+        return {k: legacy_make_json_serializable(v) for k, v in obj.items()}
+    elif hasattr(obj, "dict") and callable(getattr(obj, "dict")):
+        return legacy_make_json_serializable(obj.dict())
+    elif hasattr(obj, "to_dict") and callable(getattr(obj, "to_dict")):
+        return legacy_make_json_serializable(obj.to_dict())
+    elif hasattr(obj, "__dict__"):
+        return legacy_make_json_serializable(vars(obj))
+    else:
+        return obj
+
+
+def make_course(target_bytes):
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(os.path.join(base_dir, "course_content.json")) as f:
+        samples = [lesson for lesson in json.load(f) if "error" not in lesson]
+
+    lessons, size, i = [], 0, 0
+    while size < target_bytes:
+        lesson = copy.deepcopy(samples[i % len(samples)])
+        lesson["additional_resources"] = [Resource(**r) for r in lesson["additional_resources"]]
+        lessons.append(lesson)
+        size += len(lesson["readings"]) + len(lesson["examples"]) + len(lesson["exercises"]) + len(lesson["assessments"])
+        i += 1
+    return {"title": "Benchmark", "units": [], "unit_lessons": lessons, "completed": 0}
+
+
+def timed(fn, arg):
+    fn(arg)  # warm-up
+    gc.collect()
+    timings = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        fn(arg)
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(timings) * 1000, peak / (1024 * 1024)
+
+
+if __name__ == "__main__":
+    app = Flask(__name__)
+    default_provider = DefaultJSONProvider(app)
+    orjson_provider = OrjsonProvider(app)
+
+    for target in (1_000_000, 5_000_000):
+        doc = make_course(target)
+        plain = to_json_compatible(doc)
+        print(f"--- {len(json.dumps(plain)) / 1e6:.1f} MB document, {len(doc['unit_lessons'])} lessons")
+        cases = (
+            ("flask default response", lambda d: default_provider.response(d), plain),
+            ("orjson response", lambda d: orjson_provider.response(d), plain),
+            ("make_json_serializable", legacy_make_json_serializable, doc),
+            ("to_json_compatible", to_json_compatible, doc),
+        )
+        with app.app_context():
+            for name, fn, arg in cases:
+                ms, peak = timed(fn, arg)
+                print(f"{name:>24}: {ms:8.2f} ms   peak alloc {peak:6.2f} MiB")
@@ -8,6 +8,7 @@ from pydantic import BaseModel
 from typing import List, Optional
 import re
 import time
+from utils.model_routing import generate
 load_dotenv()
 
 
@@ -66,8 +67,9 @@ class Syllabus(BaseModel):
 
 
 def get_syllabus(topic: str, difficulty: str):
-    response = client.models.generate_content(
-        model="gemini-2.0-flash",
+    response = generate(
+        client,
+        "syllabus",
         contents=[
             f"Generate a complete syllabus for a {difficulty} {topic} class.",
             "Include lesson titles, and for each, provide Lesson Description,Learning Objectives, Lesson Outline, and Assessment.",
@@ -121,8 +123,9 @@ def extract_and_validate_additional_resources(text: str, unit_title: str) -> str
     return updated_text
 
 def generate_lesson_content(lesson_title: str, learning_objectives: List[str], lesson_outline: List[Lesson],unit_title: str):
-    response = client.models.generate_content(
-        model="gemini-2.0-flash",
+    response = generate(
+        client,
+        "lesson",
         contents=[
             f"Generate detailed content for the lesson titled '{lesson_title}' with the following learning objectives: {', '.join(learning_objectives)}.",
             "Provide readings to help learn the material, practical examples with explanations, exercises for practice, and assessments for evaluation.",
@@ -190,8 +193,9 @@ def generate_full_course(syllabus_json_str: str) -> str:
         def generate_final_exam(index, all_content):
             try:
                 time.sleep(0.5)
-                response = client.models.generate_content(
-                    model="gemini-2.0-flash",
+                response = generate(
+                    client,
+                    "final_exam",
                     contents=[
                         "Generate a final exam for the course based on the following description.",
                         final_exam_description,
@@ -0,0 +1,10 @@
+-- Row versions for optimistic concurrency on courses and quick learns
+-- (utils/document_patching.py). Every API write bumps `version`; PATCH
+-- endpoints honour If-Match against it, and lazy lesson / regeneration
+-- write-backs compare-and-set on it.
+--
+-- Safe to run on a live database: existing rows start at version 0. Until it
+-- has been run, the backend falls back to unconditional updates.
+
+alter table courses add column if not exists version integer not null default 0;
+alter table quick_learns add column if not exists version integer not null default 0;
@@ -0,0 +1,65 @@
+-- Per-lesson progress (utils/progress.py). Requires 001_document_versions.sql.
+
+create table if not exists lesson_progress (
+    user_id uuid not null,
+    source_id uuid not null,
+    lesson text not null,
+    status text not null,
+    updated_at timestamptz not null default now(),
+    primary key (user_id, source_id, lesson)
+);
+
+-- Store a batch of progress updates and recount `completed` on each touched
+-- course / quick learn in one transaction. p_updates and p_seeds are arrays of
+-- {"source_id", "lesson", "status"}; seeds (statuses copied from the document
+-- on a source's first sync) never overwrite a stored row.
+--
+-- The source rows are locked first, so concurrent syncs of the same source run
+-- one after the other and each recount sees every committed write. Returns the
+-- new completed count and version of each source owned by p_user_id.
+create or replace function sync_lesson_progress(p_user_id uuid, p_updates jsonb, p_seeds jsonb default '[]')
+returns table (source_id uuid, completed integer, version integer)
+language plpgsql
+as $$
+#variable_conflict use_column
+declare
+    v_sources uuid[];
+begin
+    select array_agg(distinct (u ->> 'source_id')::uuid) into v_sources
+    from jsonb_array_elements(p_updates || p_seeds) as u;
+
+    perform 1 from courses c where c.id = any(v_sources) and c.user_id = p_user_id order by c.id for update;
+    perform 1 from quick_learns q where q.id = any(v_sources) and q.user_id = p_user_id order by q.id for update;
+
+    insert into lesson_progress (user_id, source_id, lesson, status, updated_at)
+    select p_user_id, r.source_id, r.lesson, r.status, now()
+    from jsonb_to_recordset(p_seeds) as r(source_id uuid, lesson text, status text)
+    on conflict (user_id, source_id, lesson) do nothing;
+
+    insert into lesson_progress (user_id, source_id, lesson, status, updated_at)
+    select p_user_id, r.source_id, r.lesson, r.status, now()
+    from jsonb_to_recordset(p_updates) as r(source_id uuid, lesson text, status text)
+    on conflict (user_id, source_id, lesson) do update
+        set status = excluded.status, updated_at = excluded.updated_at;
+
+    return query
+    with counts as (
+        select s.id, (
+            select count(*) from lesson_progress lp
+            where lp.user_id = p_user_id and lp.source_id = s.id and lp.status = 'completed'
+        )::integer as n
+        from unnest(v_sources) as s(id)
+    ), courses_updated as (
+        update courses c set completed = counts.n, version = c.version + 1
+        from counts where c.id = counts.id and c.user_id = p_user_id
+        returning c.id, c.completed::integer, c.version
+    ), quick_learns_updated as (
+        update quick_learns q set completed = counts.n, version = q.version + 1
+        from counts where q.id = counts.id and q.user_id = p_user_id
+        returning q.id, q.completed::integer, q.version
+    )
+    select * from courses_updated
+    union all
+    select * from quick_learns_updated;
+end;
+$$;
@@ -0,0 +1,10 @@
+-- Flashcard library listing (/api/flashcard_sets?view=summary, utils/flashcards.py).
+
+-- Number of cards in a set, readable as a column (PostgREST computed column)
+-- without shipping the cards themselves.
+create or replace function card_count(flashcard_sets) returns integer language sql stable as $$
+    select coalesce(jsonb_array_length($1.flashcards -> 'flashcards'), 0)
+$$;
+
+-- Keyset pagination, most recently accessed first
+create index if not exists flashcard_sets_user_last_accessed on flashcard_sets (user_id, last_accessed desc, id desc);
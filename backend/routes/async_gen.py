@@ -0,0 +1,137 @@
+from quart import Blueprint, Response, request, jsonify
+from utils.course_generation import generate_course_from_syllabus_async
+from utils.syllabus_generation import get_syllabus_async, stream_syllabus_async, SyllabusStream, fill_learning_objectives_async, needs_learning_objectives, SYLLABUS_PROMPT_VERSION
+from utils.course_updating import save_course_draft_async
+from utils.quick_learn import generate_quick_learn_async, QUICK_LEARN_PROMPT_VERSION
+from utils.quick_learn_db import save_quick_learn_async
+from utils.token_verification import verify_token_and_get_user_id
+from utils.singleflight import singleflight, flight_key
+from utils.course_library import course_library, clone_course
+from utils.admission import admit_generation_async
+from utils.speculation import lesson_speculator
+from utils.lazy_lessons import build_lazy_course, prefetch_new_course
+from utils.json_provider import dumps_bytes
+
+# Async versions of the generation routes in course_gen.py and quick_learn.py, served by asgi.py.
+# Each request is a coroutine waiting on Gemini / PostgREST, so one worker can hold many
+# concurrent generations instead of one per thread.
+async_gen_bp = Blueprint('async_gen', __name__)
+
+@async_gen_bp.route('/generate_syllabus', methods=['POST'])
+@admit_generation_async
+async def generate_syllabus():
+    data = await request.get_json()
+    topic = data.get('topic')
+    difficulty = data.get('difficulty')
+    depth = data.get('depth')
+
+    library_syllabus = course_library.find_syllabus(topic, difficulty, depth)
+    if library_syllabus:
+        return Response(library_syllabus, status=200, mimetype='application/json')
+
+    key = flight_key("generate_syllabus", topic, difficulty, depth, SYLLABUS_PROMPT_VERSION)
+    syllabus_json_str = await singleflight.do_async(key, lambda: get_syllabus_async(topic, difficulty, depth))
+    lesson_speculator.start(syllabus_json_str)
+    return Response(syllabus_json_str, status=200, mimetype='application/json')
+
+@async_gen_bp.route('/generate_syllabus/stream', methods=['POST'])
+@admit_generation_async
+async def generate_syllabus_stream():
+    data = await request.get_json()
+    topic = data.get('topic')
+    difficulty = data.get('difficulty')
+    depth = data.get('depth')
+
+    library_syllabus = course_library.find_syllabus(topic, difficulty, depth)
+
+    async def generate():
+        try:
+            if library_syllabus:
+                stream = SyllabusStream()
+                for event in stream.feed(library_syllabus) + stream.finish():
+                    yield dumps_bytes(event) + b"\n"
+            else:
+                async for event in stream_syllabus_async(topic, difficulty, depth):
+                    if event["type"] == "done":
+                        lesson_speculator.start(event["syllabus"])
+                    yield dumps_bytes(event) + b"\n"
+        except Exception as e:
+            print(f"[ERROR streaming syllabus]: {e}")
+            yield dumps_bytes({"type": "error", "error": str(e)}) + b"\n"
+
+    return Response(generate(), mimetype="application/x-ndjson")
+
+@async_gen_bp.route("/generate_course", methods=["POST"])
+@admit_generation_async
+async def generate_course_using_syllabus():
+    try:
+        data = await request.get_json()
+        token = request.headers.get("Authorization", "").replace("Bearer ", "")
+
+        # Step 0: An unedited library syllabus is cloned instead of generated
+        library_course = course_library.find_course(data)
+        if library_course is not None:
+            save_response = await save_course_draft_async(clone_course(library_course, data), token)
+            return jsonify(save_response), 200
+
+        # Step 1: Fill in missing learning objectives
+        if needs_learning_objectives(data):
+            filled_syllabus = await fill_learning_objectives_async(data)
+        else:
+            filled_syllabus = data  # Already complete
+
+        # Lazy mode (see utils/lazy_lessons.py)
+        if request.args.get("lazy") in ("1", "true"):
+            lazy_course = build_lazy_course(filled_syllabus, lesson_speculator.claim(filled_syllabus))
+            save_response = await save_course_draft_async(lazy_course["course"], token)
+            prefetch_new_course(save_response)
+            return jsonify(save_response), 200
+
+        # Step 2: Generate full course content
+        full_course = await generate_course_from_syllabus_async(filled_syllabus, lesson_speculator.claim(filled_syllabus))
+
+        # Step 3: Save course to Supabase
+        save_response = await save_course_draft_async(full_course["course"], token)
+
+        return jsonify(save_response), 200
+
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@async_gen_bp.route('/generate_quick_learn', methods=['POST'])
+@admit_generation_async
+async def create_quick_learn():
+    try:
+        data = await request.get_json()
+        topic = data.get('topic')
+        difficulty = data.get('difficulty')
+
+        if not topic or not difficulty:
+            return jsonify({"error": "Missing required parameters: topic and difficulty"}), 400
+
+        valid_difficulties = ["beginner", "intermediate", "advanced"]
+        if difficulty.lower() not in valid_difficulties:
+            return jsonify({"error": f"Invalid difficulty level. Must be one of: {', '.join(valid_difficulties)}"}), 400
+
+        token = request.headers.get("Authorization", "").replace("Bearer ", "")
+        user_id = verify_token_and_get_user_id(token)
+        if not user_id:
+            return jsonify({"error": "Invalid or expired token"}), 401
+
+        print(f"[INFO] Generating quick learn (async) for topic: {topic}, difficulty: {difficulty}")
+        key = flight_key("generate_quick_learn", topic, difficulty, QUICK_LEARN_PROMPT_VERSION)
+        quick_learn_content = await singleflight.do_async(key, lambda: generate_quick_learn_async(topic, difficulty))
+
+        if not isinstance(quick_learn_content, dict):
+            return jsonify({"error": "Failed to generate quick learn content"}), 500
+
+        db_response = await save_quick_learn_async(quick_learn_content, token)
+
+        if isinstance(db_response, tuple) and isinstance(db_response[1], int):
+            return jsonify(db_response[0]), db_response[1]
+
+        return jsonify(db_response), 200
+
+    except Exception as e:
+        print(f"[ERROR] Exception in create_quick_learn (async): {str(e)}")
+        return jsonify({"error": f"Failed to generate quick learn: {str(e)}"}), 500
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_cors import cross_origin
 from utils.course_fetching import get_courses_for_user, get_single_course_for_user
+from utils.lazy_lessons import get_course_lesson
 
 course_fetch_bp = Blueprint("course_fetch", __name__)
 
@@ -31,4 +32,24 @@ def get_user_course():
     if "error" in response:
         return jsonify(response), 404  # <-- return 404 if error fetching course
 
-    return jsonify(response), 200
\ No newline at end of file
+    return jsonify(response), 200
+
+@course_fetch_bp.route("/course_lesson/<course_id>/<int:unit_number>/<int:lesson_index>", methods=["GET", "OPTIONS"])
+@cross_origin(origins=["http://localhost:3000", "https://luminous-learn.vercel.app"], methods=["GET", "OPTIONS"], allow_headers=["Content-Type", "Authorization"])
+def get_course_lesson_route(course_id, unit_number, lesson_index):
+    """
+    One lesson of a course, by unit number and position within the unit. Lessons of a
+    lazy course (/generate_course?lazy=1) are generated here the first time they are
+    opened, and the next ones are prefetched.
+    """
+    if request.method == "OPTIONS":
+        return '', 200
+
+    token = request.headers.get("Authorization", "").replace("Bearer ", "")
+    response = get_course_lesson(token, course_id, unit_number, lesson_index)
+
+    if isinstance(response, tuple):
+        body, status = response
+        return jsonify(body), status
+
+    return jsonify(response), 200
@@ -1,14 +1,21 @@
-from flask import Blueprint, Response, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from flask_cors import cross_origin
 from utils.course_generation import generate_course_from_syllabus
-from utils.syllabus_generation import get_syllabus, regenerate_learning_objectives
+from utils.syllabus_generation import get_syllabus, stream_syllabus, SyllabusStream, fill_learning_objectives, needs_learning_objectives, SYLLABUS_PROMPT_VERSION
 from utils.course_updating import save_course_draft
+from utils.singleflight import singleflight, flight_key
+from utils.course_library import course_library, clone_course
+from utils.admission import admit_generation
+from utils.speculation import lesson_speculator
+from utils.lazy_lessons import build_lazy_course, prefetch_new_course
+from utils.json_provider import dumps_bytes
 
 
 course_gen_bp = Blueprint('course_gen', __name__)
 
 @course_gen_bp.route('/generate_syllabus', methods=['POST', 'OPTIONS'])
 @cross_origin(origins=["http://localhost:3000", "https://luminous-learn.vercel.app"], methods=["POST", "OPTIONS"], allow_headers=["Content-Type", "Authorization"])
+@admit_generation
 def generate_syllabus():
     if request.method == "OPTIONS":
         return '', 200
@@ -18,11 +25,60 @@ def generate_syllabus():
     difficulty = data.get('difficulty')
     depth = data.get('depth')
 
-    syllabus_json_str = get_syllabus(topic, difficulty, depth)
+    # Popular topics are pre-generated (scripts/build_course_library.py)
+    library_syllabus = course_library.find_syllabus(topic, difficulty, depth)
+    if library_syllabus:
+        print(f"[course library] Serving syllabus for {topic} / {difficulty} / {depth}")
+        return Response(library_syllabus, status=200, mimetype='application/json')
+
+    # Identical requests already in flight share one Gemini call
+    key = flight_key("generate_syllabus", topic, difficulty, depth, SYLLABUS_PROMPT_VERSION)
+    syllabus_json_str = singleflight.do(key, lambda: get_syllabus(topic, difficulty, depth))
+    # Opt-in: start on the first unit's lessons while the user reviews the syllabus
+    lesson_speculator.start(syllabus_json_str)
     return Response(syllabus_json_str, status=200, mimetype='application/json')
 
+@course_gen_bp.route('/generate_syllabus/stream', methods=['POST', 'OPTIONS'])
+@cross_origin(origins=["http://localhost:3000", "https://luminous-learn.vercel.app"], methods=["POST", "OPTIONS"], allow_headers=["Content-Type", "Authorization"])
+@admit_generation
+def generate_syllabus_stream():
+    """
+    Same as /generate_syllabus, but streams NDJSON so the syllabus editor can fill in
+    progressively: {"type": "header"} with the course fields, a {"type": "unit"} line per
+    unit as soon as Gemini has finished writing it, then {"type": "done"} with the whole
+    syllabus, or {"type": "error"} if generation fails.
+    """
+    if request.method == "OPTIONS":
+        return '', 200
+
+    data = request.get_json()
+    topic = data.get('topic')
+    difficulty = data.get('difficulty')
+    depth = data.get('depth')
+
+    library_syllabus = course_library.find_syllabus(topic, difficulty, depth)
+
+    def generate():
+        try:
+            if library_syllabus:
+                print(f"[course library] Streaming syllabus for {topic} / {difficulty} / {depth}")
+                stream = SyllabusStream()
+                events = stream.feed(library_syllabus) + stream.finish()
+            else:
+                events = stream_syllabus(topic, difficulty, depth)
+            for event in events:
+                if event["type"] == "done" and not library_syllabus:
+                    lesson_speculator.start(event["syllabus"])
+                yield dumps_bytes(event) + b"\n"
+        except Exception as e:
+            print(f"[ERROR streaming syllabus]: {e}")
+            yield dumps_bytes({"type": "error", "error": str(e)}) + b"\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
 @course_gen_bp.route("/generate_course", methods=["POST", "OPTIONS"])
 @cross_origin(origins=["http://localhost:3000", "https://luminous-learn.vercel.app"], methods=["POST", "OPTIONS"], allow_headers=["Content-Type", "Authorization"])
+@admit_generation
 def generate_course_using_syllabus():
     if request.method == "OPTIONS":
         return '', 200
@@ -30,26 +86,33 @@ def generate_course_using_syllabus():
     try:
         data = request.get_json()
         token = request.headers.get("Authorization", "").replace("Bearer ", "")
+        # Step 0: An unedited library syllabus is cloned instead of generated
+        library_course = course_library.find_course(data)
+        if library_course is not None:
+            print("[course library] Cloning library course")
+            save_response = save_course_draft(clone_course(library_course, data), token)
+            return jsonify(save_response), 200
+
         print("check for misisng?")
         # Step 1: Check if any learning objectives are missing
-        def needs_filling(course_data):
-            units = course_data.get("units", [])
-            for unit in units:
-                for lesson in unit.get("lesson_outline", []):
-                    if not lesson.get("learning_objectives"):
-                        return True
-            return False
-
-        # If missing, call Gemini to regenerate
-        if needs_filling(data):
+        # If missing, ask Gemini for just those lessons' objectives
+        if needs_learning_objectives(data):
             print("missing stuff!!")
-            filled_syllabus = regenerate_learning_objectives(data)
+            filled_syllabus = fill_learning_objectives(data)
         else:
             print("no missing stuff :D")
             filled_syllabus = data  # Already complete
 
-        # Step 2: Generate full course content
-        full_course = generate_course_from_syllabus(filled_syllabus)
+        # Lazy mode: save the outline now and generate each lesson when it is first opened
+        if request.args.get("lazy") in ("1", "true"):
+            lazy_course = build_lazy_course(filled_syllabus, lesson_speculator.claim(filled_syllabus))
+            save_response = save_course_draft(lazy_course["course"], token)
+            prefetch_new_course(save_response)
+            return jsonify(save_response), 200
+
+        # Step 2: Generate full course content, reusing lessons pre-generated while
+        # the user reviewed the syllabus (if speculation is enabled)
+        full_course = generate_course_from_syllabus(filled_syllabus, lesson_speculator.claim(filled_syllabus))
 
         print("bouta save course:")
         print(type(full_course))
@@ -1,6 +1,10 @@
 from flask import Blueprint, request, jsonify
 from flask_cors import cross_origin
 from utils.course_updating import save_course_draft, update_course_draft, delete_course
+from utils.lesson_regeneration import regenerate_lessons
+from utils.admission import admit_generation
+from utils.document_patching import patch_document, if_match_version
+from utils.json_patch import JSONPatchError
 
 course_update_bp = Blueprint("course", __name__)
 
@@ -42,4 +46,52 @@ def delete_course_endpoint(course_id):
     if isinstance(response, tuple) and len(response) == 2 and isinstance(response[1], int):
         return jsonify(response[0]), response[1]
     
-    return jsonify(response)
\ No newline at end of file
+    return jsonify(response)
+
+@course_update_bp.route("/regenerate_lesson/<course_id>/<int:unit_number>/<int:lesson_index>", methods=["POST", "OPTIONS"])
+@cross_origin(origins=["http://localhost:3000", "https://luminous-learn.vercel.app"], methods=["POST", "OPTIONS"], allow_headers=["Content-Type", "Authorization"])
+@admit_generation
+def regenerate_lesson_endpoint(course_id, unit_number, lesson_index):
+    if request.method == "OPTIONS":
+        return '', 200  # preflight success
+
+    token = request.headers.get("Authorization", "").replace("Bearer ", "")
+    response = regenerate_lessons(token, course_id, unit_number, lesson_index)
+
+    if isinstance(response, tuple) and len(response) == 2 and isinstance(response[1], int):
+        return jsonify(response[0]), response[1]
+
+    return jsonify(response)
+
+@course_update_bp.route("/regenerate_unit/<course_id>/<int:unit_number>", methods=["POST", "OPTIONS"])
+@cross_origin(origins=["http://localhost:3000", "https://luminous-learn.vercel.app"], methods=["POST", "OPTIONS"], allow_headers=["Content-Type", "Authorization"])
+@admit_generation
+def regenerate_unit_endpoint(course_id, unit_number):
+    if request.method == "OPTIONS":
+        return '', 200  # preflight success
+
+    token = request.headers.get("Authorization", "").replace("Bearer ", "")
+    response = regenerate_lessons(token, course_id, unit_number)
+
+    if isinstance(response, tuple) and len(response) == 2 and isinstance(response[1], int):
+        return jsonify(response[0]), response[1]
+
+    return jsonify(response)
+
+@course_update_bp.route("/patch_course/<course_id>", methods=["PATCH", "OPTIONS"])
+@cross_origin(origins=["http://localhost:3000", "https://luminous-learn.vercel.app"], methods=["PATCH", "OPTIONS"], allow_headers=["Content-Type", "Authorization", "If-Match"], expose_headers=["ETag"])
+def patch_course(course_id):
+    if request.method == "OPTIONS":
+        return '', 200  # preflight success
+
+    token = request.headers.get("Authorization", "").replace("Bearer ", "")
+    try:
+        expected_version = if_match_version(request.headers.get("If-Match"))
+    except JSONPatchError as e:
+        return jsonify({"error": str(e)}), 400
+    response = patch_document("courses", course_id, request.get_json(silent=True), token, expected_version)
+
+    if isinstance(response, tuple) and len(response) == 2 and isinstance(response[1], int):
+        return jsonify(response[0]), response[1]
+
+    return jsonify(response), 200, {"ETag": f'"{response["version"]}"'}
@@ -1,15 +1,29 @@
 # --- ROUTES FILE ---
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from utils.token_verification import verify_token_and_get_user_id, supabase
-from utils.flashcards import generate_flashcards
+from utils.flashcards import generate_flashcards, load_flashcard_source, iter_flashcard_batches, FlashcardMerger, save_flashcard_set, list_flashcard_set_summaries, FLASHCARD_SETS_PAGE_SIZE
+from utils.json_provider import dumps_bytes
+from utils.dedup import DEFAULT_THRESHOLD, dedupe_cards
+from utils.row_cache import cached_row, invalidate_row
 from datetime import datetime, timezone
 from flask_cors import cross_origin
+from utils.admission import admit_generation
 
 flashcards_bp = Blueprint('create_flashcards', __name__)
 
+def parse_dedupe_threshold(body):
+    """Optional "dedupe_threshold" (Jaccard similarity, 0-1] from a request body; None if invalid."""
+    value = body.get("dedupe_threshold", DEFAULT_THRESHOLD)
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if 0 < value <= 1 else None
+
 @flashcards_bp.route("/create_flashcard_set", methods=["POST", "OPTIONS"])
 @cross_origin(origins=["http://localhost:3000", "https://luminous-learn.vercel.app"], methods=["POST", "OPTIONS"], allow_headers=["Content-Type", "Authorization"])
+@admit_generation
 def create_flashcards():
     if request.method == "OPTIONS":
         return '', 200
@@ -30,43 +44,32 @@ def create_flashcards():
         card_count = body.get('card_count')
         content_scope = body.get('content_scope', "all")
         learning_goal = body.get('learning_goal')
+        dedupe_threshold = parse_dedupe_threshold(body)
 
         print(source_id)
 
         if not all([source_type, source_id, card_count, learning_goal]):
             return jsonify({"error": "Missing required fields"}), 400
 
+        if dedupe_threshold is None:
+            return jsonify({"error": "dedupe_threshold must be a number between 0 and 1"}), 400
+
         # Generate flashcards and get metadata
         flashcards_data, course_data, real_source_type = generate_flashcards(
             source_id=source_id,
             source_type=source_type,
             contentInput=content_scope,
             num_cards=card_count,
-            learning_goal=learning_goal
+            learning_goal=learning_goal,
+            dedupe_threshold=dedupe_threshold,
+            user_id=user_id
         )
 
         if not course_data:
             return jsonify({"error": "Source content not found"}), 404
 
-        insert_data = {
-            "user_id": user_id,
-            "title": course_data.get('title', 'Untitled'),
-            "topic": course_data.get('topic', 'General'),
-            "flashcards": flashcards_data,
-            "sessions_completed": 0,
-            "last_test_score": 0,
-            "still_learning_count": 0,
-            "still_studying_count": 0,
-            "mastered_count": 0,
-            "source_id": source_id,
-            "source_type": real_source_type,
-            "created_at": datetime.now(timezone.utc).isoformat(),
-            "last_accessed": datetime.now(timezone.utc).isoformat(),
-        }
-
         try:
-            result = supabase.table('flashcard_sets').insert(insert_data).execute()
-            flashcard_set_id = result.data[0]['id']
+            flashcard_set_id = save_flashcard_set(user_id, course_data, flashcards_data, source_id, real_source_type)
         except Exception as e:
             print(f"[ERROR inserting flashcards]: {e}")
             return jsonify({"error": "Failed to insert flashcards", "details": str(e)}), 500
@@ -80,9 +83,75 @@ def create_flashcards():
         print(f"[ERROR] {str(e)}")
         return jsonify({"error": "Internal Server Error", "details": str(e)}), 500
 
+@flashcards_bp.route("/create_flashcard_set/stream", methods=["POST", "OPTIONS"])
+@cross_origin(origins=["http://localhost:3000", "https://luminous-learn.vercel.app"], methods=["POST", "OPTIONS"], allow_headers=["Content-Type", "Authorization"])
+@admit_generation
+def create_flashcards_stream():
+    """
+    Same as /create_flashcard_set, but streams NDJSON: a {"type": "cards"} line for every
+    generated batch (already deduplicated), then {"type": "done", "flashcard_set_id": ...}
+    once the set is saved, or {"type": "error"} if generation fails.
+    """
+    if request.method == "OPTIONS":
+        return '', 200
+
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return jsonify({"error": "Missing authorization header"}), 401
+
+    token = auth_header.replace("Bearer ", "")
+    user_id = verify_token_and_get_user_id(token)
+    if not user_id:
+        return jsonify({"error": "Invalid token"}), 401
+
+    body = request.get_json()
+    source_type = body.get('source_type')
+    source_id = body.get('source_id')
+    card_count = body.get('card_count')
+    content_scope = body.get('content_scope', "all")
+    learning_goal = body.get('learning_goal')
+    dedupe_threshold = parse_dedupe_threshold(body)
+
+    if not all([source_type, source_id, card_count, learning_goal]):
+        return jsonify({"error": "Missing required fields"}), 400
+
+    if dedupe_threshold is None:
+        return jsonify({"error": "dedupe_threshold must be a number between 0 and 1"}), 400
+
+    try:
+        course_data, source_type = load_flashcard_source(source_id, source_type, content_scope, user_id)
+    except Exception as e:
+        print(f"[ERROR fetching flashcard source]: {e}")
+        return jsonify({"error": "Source content not found", "details": str(e)}), 404
+
+    def generate():
+        merger = FlashcardMerger(dedupe_threshold)
+        try:
+            for batch in iter_flashcard_batches(course_data, source_type, card_count, learning_goal):
+                added = merger.add(batch)
+                if added:
+                    yield dumps_bytes({"type": "cards", "cards": added}) + b"\n"
+
+            if not merger.cards:
+                raise ValueError("Flashcard generation failed for every content chunk.")
+
+            flashcard_set_id = save_flashcard_set(user_id, course_data, {"flashcards": merger.cards}, source_id, source_type)
+            yield dumps_bytes({"type": "done", "flashcard_set_id": flashcard_set_id, "card_count": len(merger.cards)}) + b"\n"
+        except Exception as e:
+            print(f"[ERROR streaming flashcards]: {e}")
+            yield dumps_bytes({"type": "error", "error": str(e)}) + b"\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
 @flashcards_bp.route("/flashcard_sets", methods=["GET", "OPTIONS"])
 @cross_origin(origins=["http://localhost:3000", "https://luminous-learn.vercel.app"], methods=["GET", "OPTIONS"], allow_headers=["Content-Type", "Authorization"])
 def get_flashcard_sets():
+    """
+    All of the user's flashcard sets, cards included. With ?view=summary: one page of
+    {"flashcard_sets": [...], "next_cursor": ...} without the cards, most recently
+    accessed first, optionally filtered by ?type=course|quick-learn. Pass ?cursor=<next_cursor>
+    for the next page and ?limit= for the page size.
+    """
     if request.method == "OPTIONS":
         return '', 200
 
@@ -96,6 +165,17 @@ def get_flashcard_sets():
         if not user_id:
             return jsonify({"error": "Invalid token"}), 401
 
+        if request.args.get("view") == "summary":
+            limit = request.args.get("limit", FLASHCARD_SETS_PAGE_SIZE, type=int)
+            try:
+                page = list_flashcard_set_summaries(user_id, request.args.get("type"), limit, request.args.get("cursor"))
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            except Exception as e:
+                print(f"[ERROR fetching flashcard set summaries]: {e}")
+                return jsonify({"error": "Failed to fetch flashcard sets", "details": str(e)}), 500
+            return jsonify(page), 200
+
         try:
             response = supabase.table("flashcard_sets").select("*").eq("user_id", user_id).execute()
         except Exception as e:
@@ -138,22 +218,23 @@ def get_flashcard_set(source_type, flashcard_set_id):
         print(f"  flashcard_set_id: {flashcard_set_id}")
         print(f"  source_type: {source_type}")
 
-        result = supabase.table("flashcard_sets") \
-            .select("*") \
-            .eq("user_id", user_id) \
-            .eq("id", flashcard_set_id) \
-            .eq("source_type", source_type) \
-            .limit(1) \
-            .execute()
+        def load():
+            result = supabase.table("flashcard_sets") \
+                .select("*") \
+                .eq("user_id", user_id) \
+                .eq("id", flashcard_set_id) \
+                .eq("source_type", source_type) \
+                .limit(1) \
+                .execute()
+            print(f"[Supabase Query Result]: {result.data}")
+            return result.data[0] if result.data else None
 
-        print(f"[Supabase Query Result]: {result.data}")
+        flashcard_set = cached_row("flashcard_sets", user_id, flashcard_set_id, load)
 
-        if not result.data:
+        if not flashcard_set or flashcard_set.get("source_type") != source_type:
             print("[Error] Flashcard set not found in DB")
             return jsonify({"error": "Flashcard set not found"}), 404
 
-        flashcard_set = result.data[0]
-
         flashcards_data = flashcard_set.get('flashcards', [])
         if isinstance(flashcards_data, dict) and 'flashcards' in flashcards_data:
             flashcards_data = flashcards_data['flashcards']
@@ -221,6 +302,7 @@ def update_card_progress(source_type, flashcard_set_id, card_id):
             "flashcards": {"flashcards": flashcards_data},
             "last_accessed": datetime.now(timezone.utc).isoformat()
         }).eq("id", flashcard_set_id).execute()
+        invalidate_row("flashcard_sets", flashcard_set_id)
 
         return jsonify({"message": "Card progress updated successfully."}), 200
 
@@ -305,6 +387,7 @@ def update_flashcard_set_progress(source_type, flashcard_set_id):
             update_data["last_test_score"] = last_test_score
             
         supabase.table("flashcard_sets").update(update_data).eq("id", flashcard_set_id).eq("user_id", user_id).eq("source_type", source_type).execute()
+        invalidate_row("flashcard_sets", flashcard_set_id)
 
         return jsonify({"message": "Flashcard set progress updated successfully."}), 200
 
@@ -336,6 +419,14 @@ def update_flashcard_set_full(source_type, flashcard_set_id):
         if not title or not isinstance(flashcards, list):
             return jsonify({"error": "Missing title or invalid flashcards format"}), 400
 
+        # Optional near-duplicate removal (e.g. after merging or regenerating cards)
+        removed_duplicates = 0
+        if body.get("dedupe"):
+            dedupe_threshold = parse_dedupe_threshold(body)
+            if dedupe_threshold is None:
+                return jsonify({"error": "dedupe_threshold must be a number between 0 and 1"}), 400
+            flashcards, removed_duplicates = dedupe_cards(flashcards, dedupe_threshold)
+
         # 1. Fetch to make sure the flashcard set exists and belongs to this user
         result = supabase.table("flashcard_sets") \
             .select("id") \
@@ -361,8 +452,9 @@ def update_flashcard_set_full(source_type, flashcard_set_id):
             .eq("user_id", user_id) \
             .eq("source_type", source_type) \
             .execute()
+        invalidate_row("flashcard_sets", flashcard_set_id)
 
-        return jsonify({ "message": "Flashcard set updated successfully." }), 200
+        return jsonify({ "message": "Flashcard set updated successfully.", "removed_duplicates": removed_duplicates }), 200
 
     except Exception as e:
         print(f"[ERROR updating flashcard set full]: {str(e)}")
@@ -0,0 +1,60 @@
+from datetime import datetime, timezone
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from flask_cors import cross_origin
+from utils.token_verification import verify_token_and_get_user_id
+from utils.library_export import LibraryFormatError, export_lines, import_lines, open_lines, zstd_compress, zstd_module
+
+library_export_bp = Blueprint("library_export", __name__)
+
+def requested_compression() -> str:
+    """"zstd" if asked for with ?compression=zstd (or Content-Encoding: zstd on uploads)."""
+    if request.args.get("compression") == "zstd" or request.headers.get("Content-Encoding") == "zstd":
+        return "zstd"
+    return ""
+
+@library_export_bp.route("/export_library", methods=["GET", "OPTIONS"])
+@cross_origin(origins=["http://localhost:3000", "https://luminous-learn.vercel.app"], methods=["GET", "OPTIONS"], allow_headers=["Content-Type", "Authorization"], expose_headers=["Content-Disposition"])
+def export_library():
+    """The user's courses, quick learns, flashcard sets and progress as streamed NDJSON."""
+    if request.method == "OPTIONS":
+        return '', 200
+
+    token = request.headers.get("Authorization", "").replace("Bearer ", "")
+    user_id = verify_token_and_get_user_id(token)
+    if not user_id:
+        return jsonify({"error": "Invalid token or user not authenticated"}), 401
+
+    compression = requested_compression()
+    filename = f"luminous-library-{datetime.now(timezone.utc):%Y%m%d}.ndjson"
+    body = export_lines(user_id)
+    mimetype = "application/x-ndjson"
+    if compression:
+        try:
+            zstd_module()
+        except LibraryFormatError as e:
+            return jsonify({"error": str(e)}), 400
+        body, mimetype, filename = zstd_compress(body), "application/zstd", filename + ".zst"
+
+    return Response(stream_with_context(body), mimetype=mimetype,
+                    headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+@library_export_bp.route("/import_library", methods=["POST", "OPTIONS"])
+@cross_origin(origins=["http://localhost:3000", "https://luminous-learn.vercel.app"], methods=["POST", "OPTIONS"], allow_headers=["Content-Type", "Authorization", "Content-Encoding"])
+def import_library():
+    """Import an /export_library stream (the raw request body) into the user's account."""
+    if request.method == "OPTIONS":
+        return '', 200
+
+    token = request.headers.get("Authorization", "").replace("Bearer ", "")
+    user_id = verify_token_and_get_user_id(token)
+    if not user_id:
+        return jsonify({"error": "Invalid token or user not authenticated"}), 401
+
+    try:
+        summary = import_lines(user_id, open_lines(request.stream, requested_compression()))
+        return jsonify(summary), 200
+    except LibraryFormatError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"[ERROR] Library import failed: {e}")
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,49 @@
+from flask import Blueprint, request, jsonify
+from flask_cors import cross_origin
+from utils.progress import get_progress, sync_progress
+
+progress_bp = Blueprint("progress", __name__)
+
+@progress_bp.route("/progress/<source_id>", methods=["GET", "PUT", "OPTIONS"])
+@cross_origin(origins=["http://localhost:3000", "https://luminous-learn.vercel.app"], methods=["GET", "PUT", "OPTIONS"], allow_headers=["Content-Type", "Authorization"])
+def lesson_progress_route(source_id):
+    """
+    GET: the lesson statuses of a course / quick learn.
+    PUT: set one lesson's status: {"lesson": "<unit>/<index>" or section id, "status": "completed"}
+    """
+    if request.method == "OPTIONS":
+        return '', 200
+
+    token = request.headers.get("Authorization", "").replace("Bearer ", "")
+    if request.method == "GET":
+        response = get_progress(token, source_id)
+        if isinstance(response, tuple) and len(response) == 2 and isinstance(response[1], int):
+            return jsonify(response[0]), response[1]
+        return jsonify(response), 200
+
+    data = request.get_json(silent=True) or {}
+    response = sync_progress(token, [{"source_id": source_id, "lesson": data.get("lesson"), "status": data.get("status")}])
+
+    if isinstance(response, tuple) and len(response) == 2 and isinstance(response[1], int):
+        return jsonify(response[0]), response[1]
+    if response["rejected"]:
+        error = response["rejected"][0]["error"]
+        return jsonify({"error": error}), 404 if error == "Source not found" else 400
+
+    return jsonify({"source_id": source_id, **response["sources"][source_id]}), 200
+
+@progress_bp.route("/progress/sync", methods=["POST", "OPTIONS"])
+@cross_origin(origins=["http://localhost:3000", "https://luminous-learn.vercel.app"], methods=["POST", "OPTIONS"], allow_headers=["Content-Type", "Authorization"])
+def sync_progress_route():
+    """Batched progress: {"updates": [{"source_id", "lesson", "status"}, ...]}"""
+    if request.method == "OPTIONS":
+        return '', 200
+
+    token = request.headers.get("Authorization", "").replace("Bearer ", "")
+    data = request.get_json(silent=True) or {}
+    response = sync_progress(token, data.get("updates"))
+
+    if isinstance(response, tuple) and len(response) == 2 and isinstance(response[1], int):
+        return jsonify(response[0]), response[1]
+
+    return jsonify(response), 200
@@ -1,8 +1,14 @@
 from flask import Blueprint, request, jsonify
 from flask_cors import cross_origin
-from utils.quick_learn import generate_quick_learn
+from utils.quick_learn import generate_quick_learn, QUICK_LEARN_PROMPT_VERSION
 from utils.token_verification import verify_token_and_get_user_id
 from utils.quick_learn_db import save_quick_learn, get_quick_learns_for_user, get_quick_learn_by_id, delete_quick_learn
+from utils.source_resolution import invalidate_source
+from utils.row_cache import invalidate_row
+from utils.document_patching import select_columns, versioned, patch_document, if_match_version
+from utils.json_patch import JSONPatchError
+from utils.singleflight import singleflight, flight_key
+from utils.admission import admit_generation
 
 quick_learn_bp = Blueprint('quick_learn', __name__)
 
@@ -11,6 +17,7 @@ quick_learn_bp = Blueprint('quick_learn', __name__)
 # -------------------------------
 @quick_learn_bp.route('/generate_quick_learn', methods=['POST', 'OPTIONS'])
 @cross_origin(origins=["http://localhost:3000", "https://luminous-learn.vercel.app"], methods=["POST", "OPTIONS"], allow_headers=["Content-Type", "Authorization"])
+@admit_generation
 def create_quick_learn():
     if request.method == "OPTIONS":
         return '', 200
@@ -41,7 +48,9 @@ def create_quick_learn():
             return jsonify({"error": "Invalid or expired token"}), 401
 
         print(f"[INFO] Generating quick learn for topic: {topic}, difficulty: {difficulty}")
-        quick_learn_content = generate_quick_learn(topic, difficulty)
+        # Identical requests already in flight share one generation; each user saves its own copy
+        key = flight_key("generate_quick_learn", topic, difficulty, QUICK_LEARN_PROMPT_VERSION)
+        quick_learn_content = singleflight.do(key, lambda: generate_quick_learn(topic, difficulty))
         print(f"[DEBUG] Generated quick_learn_content: {quick_learn_content}")
 
         if not isinstance(quick_learn_content, dict):
@@ -154,9 +163,12 @@ def update_quick_learn(quick_learn_id):
 
         from utils.token_verification import supabase  # your supabase client
 
-        response = supabase.from_("quick_learns").update({
-            "sections": unit_lessons
-        }).eq("id", quick_learn_id).eq("user_id", user_id).execute()
+        current = supabase.from_("quick_learns").select(select_columns("quick_learns", "id")).eq("id", quick_learn_id).eq("user_id", user_id).limit(1).execute()
+        response = supabase.from_("quick_learns").update(versioned("quick_learns", {
+            "sections": unit_lessons,
+        }, current.data[0] if current.data else None)).eq("id", quick_learn_id).eq("user_id", user_id).execute()
+        invalidate_source(quick_learn_id)
+        invalidate_row("quick_learns", quick_learn_id)
 
         if not response.data or len(response.data) == 0:
             return jsonify({"error": "Failed to update quick learn"}), 500
@@ -165,4 +177,29 @@ def update_quick_learn(quick_learn_id):
 
     except Exception as e:
         print(f"[ERROR] Exception in update_quick_learn: {str(e)}")
-        return jsonify({"error": f"Failed to update quick learn: {str(e)}"}), 500
\ No newline at end of file
+        return jsonify({"error": f"Failed to update quick learn: {str(e)}"}), 500
+
+# -------------------------------
+# Patch a quick learn (RFC 6902 JSON Patch, see utils/document_patching.py)
+# -------------------------------
+@quick_learn_bp.route('/patch_quick_learn/<quick_learn_id>', methods=['PATCH', 'OPTIONS'])
+@cross_origin(origins=["http://localhost:3000", "https://luminous-learn.vercel.app"], methods=["PATCH", "OPTIONS"], allow_headers=["Content-Type", "Authorization", "If-Match"], expose_headers=["ETag"])
+def patch_quick_learn(quick_learn_id):
+    if request.method == "OPTIONS":
+        return '', 200
+
+    try:
+        token = request.headers.get("Authorization", "").replace("Bearer ", "")
+        expected_version = if_match_version(request.headers.get("If-Match"))
+        result = patch_document("quick_learns", quick_learn_id, request.get_json(silent=True), token, expected_version)
+
+        if isinstance(result, tuple) and isinstance(result[1], int):
+            return jsonify(result[0]), result[1]
+
+        return jsonify(result), 200, {"ETag": f'"{result["version"]}"'}
+
+    except JSONPatchError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"[ERROR] Exception in patch_quick_learn: {str(e)}")
+        return jsonify({"error": f"Failed to patch quick learn: {str(e)}"}), 500
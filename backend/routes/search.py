@@ -0,0 +1,22 @@
+from flask import Blueprint, request, jsonify
+from flask_cors import cross_origin
+from utils.search_index import search_content
+
+search_bp = Blueprint("search", __name__)
+
+@search_bp.route("/search", methods=["GET", "OPTIONS"])
+@cross_origin(origins=["http://localhost:3000", "https://luminous-learn.vercel.app"], methods=["GET", "OPTIONS"], allow_headers=["Content-Type", "Authorization"])
+def search():
+    """Full-text search: /api/search?q=<query>&page=1&page_size=20"""
+    if request.method == "OPTIONS":
+        return '', 200
+
+    token = request.headers.get("Authorization", "").replace("Bearer ", "")
+    page = request.args.get("page", 1, type=int)
+    page_size = request.args.get("page_size", 20, type=int)
+    response = search_content(token, request.args.get("q", ""), page, page_size)
+
+    if isinstance(response, tuple) and len(response) == 2 and isinstance(response[1], int):
+        return jsonify(response[0]), response[1]
+
+    return jsonify(response), 200
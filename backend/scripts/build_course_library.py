@@ -0,0 +1,66 @@
+"""
+Offline job that fills the precomputed course library (utils/course_library.py).
+
+For every topic/difficulty/depth in the topics file, generates a syllabus (filling in
+missing learning objectives) and the full course from it, then stores both. Entries
+already in the library are skipped unless --force is given.
+
+Run from backend/:  python -m scripts.build_course_library [--topics data/library_topics.json] [--workers 2] [--force]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.course_generation import generate_course_from_syllabus
+from utils.course_library import course_library
+from utils.json_provider import dumps_bytes
+from utils.syllabus_generation import generate_complete_syllabus
+
+DEFAULT_TOPICS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "library_topics.json")
+
+
+def build_entry(topic, difficulty, depth):
+    start = time.perf_counter()
+    syllabus = generate_complete_syllabus(topic, difficulty, depth)
+    full_course = generate_course_from_syllabus(syllabus)
+    filename = course_library.store(topic, difficulty, depth, dumps_bytes(syllabus).decode(), full_course["course"])
+    return filename, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate library syllabi and courses")
+    parser.add_argument("--topics", default=DEFAULT_TOPICS, help="JSON list of {topic, difficulty, depth}")
+    parser.add_argument("--workers", type=int, default=2, help="topics generated in parallel")
+    parser.add_argument("--force", action="store_true", help="regenerate entries that already exist")
+    args = parser.parse_args()
+
+    with open(args.topics) as f:
+        topics = json.load(f)
+
+    todo = [t for t in topics if args.force or not course_library.has(t["topic"], t["difficulty"], t["depth"])]
+    print(f"{len(topics)} topics, {len(topics) - len(todo)} already in library, {len(todo)} to generate")
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futures = {pool.submit(build_entry, t["topic"], t["difficulty"], t["depth"]): t for t in todo}
+        for future in as_completed(futures):
+            t = futures[future]
+            label = f"{t['topic']} / {t['difficulty']} / {t['depth']}"
+            try:
+                filename, elapsed = future.result()
+                print(f"[ok] {label} -> {filename} ({elapsed:.1f}s)")
+            except Exception as e:
+                failed += 1
+                print(f"[failed] {label}: {e}")
+
+    print(f"Done: {len(todo) - failed} generated, {failed} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
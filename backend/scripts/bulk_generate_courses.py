@@ -0,0 +1,239 @@
+"""
+Resumable bulk course generation.
+
+Reads topics from a CSV (columns: topic, difficulty, depth) or JSONL file and runs each
+through the same pipeline as the API: syllabus with learning objectives, then one
+Gemini call per lesson. Every completed syllabus and lesson is checkpointed to a
+local SQLite store as soon as it exists, so an interrupted run (or one with failed
+lessons) picks up only the missing work when started again with the same --store.
+
+Prints per-item timing and Gemini token usage. Finished courses can be written to a
+JSONL file (--out) and/or stored in the precomputed course library (--library).
+
+Run from backend/:
+    python -m scripts.bulk_generate_courses topics.csv [--store bulk_generation.db] [--items 2] [--concurrency 8] [--out courses.jsonl] [--library]
+"""
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.course_generation import build_course_document, generate_lesson, parse_syllabus
+from utils.course_library import course_library, library_key
+from utils.json_provider import dumps_bytes
+from utils.syllabus_generation import generate_complete_syllabus
+from utils.usage import UsageTracker, run_tracked
+
+
+class CheckpointStore:
+    """SQLite checkpoints: one row per item (syllabus, final course) and per finished lesson."""
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS items ("
+                " item_key TEXT PRIMARY KEY, topic TEXT, difficulty TEXT, depth TEXT,"
+                " syllabus TEXT, course TEXT, seconds REAL DEFAULT 0, total_tokens INTEGER DEFAULT 0)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS lessons ("
+                " item_key TEXT, idx INTEGER, lesson TEXT, PRIMARY KEY (item_key, idx))"
+            )
+
+    def _one(self, sql, *args):
+        with self._lock:
+            return self._conn.execute(sql, args).fetchone()
+
+    def _write(self, sql, *args):
+        with self._lock, self._conn:
+            self._conn.execute(sql, args)
+
+    def item(self, key):
+        row = self._one("SELECT syllabus, course FROM items WHERE item_key = ?", key)
+        if not row:
+            return None, None
+        return (json.loads(row[0]) if row[0] else None), (json.loads(row[1]) if row[1] else None)
+
+    def save_syllabus(self, key, item, syllabus):
+        self._write(
+            "INSERT INTO items (item_key, topic, difficulty, depth, syllabus) VALUES (?, ?, ?, ?, ?)"
+            " ON CONFLICT (item_key) DO UPDATE SET syllabus = excluded.syllabus",
+            key, item["topic"], item["difficulty"], item["depth"], dumps_bytes(syllabus).decode(),
+        )
+
+    def lessons(self, key):
+        with self._lock:
+            rows = self._conn.execute("SELECT idx, lesson FROM lessons WHERE item_key = ?", (key,)).fetchall()
+        return {idx: json.loads(lesson) for idx, lesson in rows}
+
+    def save_lesson(self, key, idx, lesson):
+        self._write("INSERT OR REPLACE INTO lessons (item_key, idx, lesson) VALUES (?, ?, ?)", key, idx, dumps_bytes(lesson).decode())
+
+    def add_cost(self, key, seconds, tokens):
+        self._write("UPDATE items SET seconds = seconds + ?, total_tokens = total_tokens + ? WHERE item_key = ?", seconds, tokens, key)
+
+    def save_course(self, key, course):
+        self._write("UPDATE items SET course = ? WHERE item_key = ?", dumps_bytes(course).decode(), key)
+
+    def totals(self, key):
+        return self._one("SELECT seconds, total_tokens FROM items WHERE item_key = ?", key) or (0, 0)
+
+
+def read_items(path):
+    with open(path, newline="") as f:
+        if path.lower().endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+    items = []
+    for row in rows:
+        item = {k: (row.get(k) or "").strip() for k in ("topic", "difficulty", "depth")}
+        if item["topic"]:
+            items.append(item)
+    return items
+
+
+def run_item(item, store, lesson_pool, args):
+    """Generate whatever is missing for one topic. Returns (status, report dict)."""
+    key = library_key(item["topic"], item["difficulty"], item["depth"])
+    tracker = UsageTracker()
+    start = time.perf_counter()
+
+    syllabus, course = store.item(key)
+    if course is not None:
+        return "done", {"resumed": True}
+
+    if syllabus is None:
+        syllabus = run_tracked(tracker, generate_complete_syllabus, item["topic"], item["difficulty"], item["depth"])
+        course_from_syllabus = parse_syllabus(syllabus).course  # don't checkpoint a syllabus that can't be used
+        store.save_syllabus(key, item, syllabus)
+    else:
+        course_from_syllabus = parse_syllabus(syllabus).course
+
+    outline = [
+        (f"UNIT {unit.unit_number}: {unit.title}", unit.unit_number, lesson)
+        for unit in course_from_syllabus.units
+        for lesson in unit.lesson_outline
+    ]
+    lessons = store.lessons(key)
+    missing = [idx for idx in range(len(outline)) if idx not in lessons]
+
+    futures = {
+        lesson_pool.submit(run_tracked, tracker, generate_lesson, outline[idx][2], outline[idx][0], outline[idx][1]): idx
+        for idx in missing
+    }
+    failed = 0
+    for future in as_completed(futures):
+        idx = futures[future]
+        try:
+            lesson = future.result()
+        except Exception as e:
+            lesson = {"error": str(e)}
+        if "error" in lesson:
+            failed += 1
+            print(f"  [lesson failed] {item['topic']} #{idx}: {lesson['error']}")
+            continue
+        store.save_lesson(key, idx, lesson)
+        lessons[idx] = lesson
+
+    elapsed = time.perf_counter() - start
+    usage = tracker.as_dict()
+    store.add_cost(key, elapsed, usage["total_tokens"])
+    total_seconds, total_tokens = store.totals(key)
+    report = {
+        "total_seconds": total_seconds,
+        "total_tokens": total_tokens,
+        "seconds": elapsed,
+        "lessons_generated": len(missing) - failed,
+        "lessons_resumed": len(outline) - len(missing),
+        "lessons_failed": failed,
+        "usage": usage,
+    }
+    if failed:
+        return "incomplete", report
+
+    document = build_course_document(course_from_syllabus, [lessons[idx] for idx in range(len(outline))])
+    store.save_course(key, document)
+    if args.library:
+        course_library.store(item["topic"], item["difficulty"], item["depth"], dumps_bytes(syllabus).decode(), document)
+    return "done", report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate many courses, resumably")
+    parser.add_argument("input", help="CSV (topic,difficulty,depth) or JSONL file")
+    parser.add_argument("--store", default="bulk_generation.db", help="SQLite checkpoint file (reuse it to resume)")
+    parser.add_argument("--items", type=int, default=2, help="topics in progress at once")
+    parser.add_argument("--concurrency", type=int, default=8, help="max concurrent Gemini lesson calls")
+    parser.add_argument("--out", help="write finished course documents to this JSONL file")
+    parser.add_argument("--library", action="store_true", help="store finished courses in the course library")
+    args = parser.parse_args()
+
+    items = read_items(args.input)
+    store = CheckpointStore(args.store)
+    print(f"{len(items)} items, store {args.store}")
+
+    counts = {"done": 0, "incomplete": 0, "failed": 0}
+    run_start = time.perf_counter()
+    total_tokens = 0
+    lesson_pool = ThreadPoolExecutor(max_workers=max(1, args.concurrency))
+    item_pool = ThreadPoolExecutor(max_workers=max(1, args.items))
+    try:
+        futures = {item_pool.submit(run_item, item, store, lesson_pool, args): item for item in items}
+        for future in as_completed(futures):
+            item = futures[future]
+            label = f"{item['topic']} / {item['difficulty']} / {item['depth']}"
+            try:
+                status, report = future.result()
+            except Exception as e:
+                counts["failed"] += 1
+                print(f"[failed] {label}: {e}")
+                continue
+            counts[status] += 1
+            if report.get("resumed"):
+                print(f"[done] {label}: already finished")
+                continue
+            usage = report["usage"]
+            total_tokens += usage["total_tokens"]
+            print(
+                f"[{status}] {label}: {report['seconds']:.1f}s, "
+                f"lessons {report['lessons_generated']} new / {report['lessons_resumed']} resumed / {report['lessons_failed']} failed, "
+                f"{usage['calls']} calls, {usage['prompt_tokens']} in + {usage['output_tokens']} out = {usage['total_tokens']} tokens "
+                f"(all runs: {report['total_seconds']:.1f}s, {report['total_tokens']} tokens)"
+            )
+    except KeyboardInterrupt:
+        print("Interrupted; finished lessons are checkpointed. Re-run with the same --store to resume.")
+        item_pool.shutdown(wait=False, cancel_futures=True)
+        lesson_pool.shutdown(wait=False, cancel_futures=True)
+        return 130
+    item_pool.shutdown()
+    lesson_pool.shutdown()
+
+    if args.out:
+        written = 0
+        with open(args.out, "wb") as f:
+            for item in items:
+                _, course = store.item(library_key(item["topic"], item["difficulty"], item["depth"]))
+                if course is not None:
+                    f.write(dumps_bytes({**item, "course": course}) + b"\n")
+                    written += 1
+        print(f"Wrote {written} courses to {args.out}")
+
+    print(
+        f"Done in {time.perf_counter() - run_start:.1f}s: {counts['done']} finished, "
+        f"{counts['incomplete']} incomplete, {counts['failed']} failed, {total_tokens} tokens this run"
+    )
+    return 0 if counts["incomplete"] == counts["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
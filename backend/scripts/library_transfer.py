@@ -0,0 +1,87 @@
+"""
+Back up or migrate a user's learning library as NDJSON (see utils/library_export.py).
+
+export streams the user's courses, quick learns, flashcard sets and lesson progress
+to a file (or stdout) page by page. import reads such a file line by line into a
+user's account with batched inserts. Memory use doesn't grow with the library. Files
+ending in .zst are zstd-compressed (needs the `zstandard` package).
+
+Uses the service Supabase client, so the user is named by id rather than by token.
+
+Run from backend/:
+    python -m scripts.library_transfer export --user <user_id> [--out library.ndjson.zst]
+    python -m scripts.library_transfer import --user <user_id> library.ndjson.zst
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.library_export import LibraryFormatError, export_lines, import_lines, open_lines, zstd_compress
+
+
+def compression_for(path, force_zstd):
+    return "zstd" if force_zstd or (path or "").endswith(".zst") else ""
+
+
+def run_export(args):
+    compression = compression_for(args.out, args.zstd)
+    body = export_lines(args.user)
+    if compression:
+        body = zstd_compress(body)
+    out = sys.stdout.buffer if args.out in (None, "-") else open(args.out, "wb")
+    start = time.perf_counter()
+    written = 0
+    try:
+        for chunk in body:
+            out.write(chunk)
+            written += len(chunk)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+    print(f"Exported {written / 1e6:.2f} MB in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+
+def run_import(args):
+    compression = compression_for(args.path, args.zstd)
+    source = sys.stdin.buffer if args.path == "-" else open(args.path, "rb")
+    start = time.perf_counter()
+    try:
+        summary = import_lines(args.user, open_lines(source, compression))
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+    print(json.dumps(summary, indent=2))
+    print(f"Imported in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export / import a user's learning library as NDJSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="write the user's library to a file or stdout")
+    export.add_argument("--user", required=True, help="user id to export")
+    export.add_argument("--out", help="output file ('-' or omitted for stdout; .zst to compress)")
+    export.add_argument("--zstd", action="store_true", help="compress with zstd regardless of the file name")
+    export.set_defaults(run=run_export)
+
+    load = commands.add_parser("import", help="read an export into the user's account")
+    load.add_argument("--user", required=True, help="user id to import into")
+    load.add_argument("path", help="export file ('-' for stdin)")
+    load.add_argument("--zstd", action="store_true", help="the input is zstd-compressed")
+    load.set_defaults(run=run_import)
+
+    args = parser.parse_args()
+    try:
+        args.run(args)
+    except LibraryFormatError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+import functools
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Dict, NamedTuple, Optional
+from flask import request, jsonify, make_response
+from utils.token_verification import verify_token_and_get_user_id
+
+'''
+Admission control for the generation endpoints.
+
+Each generation request must be admitted before it runs, and it holds its slot until
+the response is finished. Streamed responses hold it until the stream closes. A
+request is rejected when any of these limits would be exceeded:
+
+- per-user in-flight generations (GEN_MAX_INFLIGHT_PER_USER) -> 429
+- per-user requests in the sliding window (GEN_USER_REQUESTS_PER_WINDOW
+  per GEN_WINDOW_SECONDS) -> 429
+- global in-flight generations (GEN_MAX_INFLIGHT) -> 503
+- global requests in the sliding window (GEN_GLOBAL_REQUESTS_PER_WINDOW) -> 503
+
+Rejections carry a Retry-After header. Requests without a valid token are limited
+per client IP.
+
+Counters live in memory (per worker) by default. Setting ADMISSION_DB_PATH to a
+SQLite file shares them across the workers on a host. There, in-flight slots are
+leases that expire after GEN_LEASE_SECONDS, so a crashed worker can't hold slots
+forever.
+'''
+
+GEN_MAX_INFLIGHT_PER_USER = int(os.getenv("GEN_MAX_INFLIGHT_PER_USER", 2))
+GEN_MAX_INFLIGHT = int(os.getenv("GEN_MAX_INFLIGHT", 16))
+GEN_WINDOW_SECONDS = float(os.getenv("GEN_WINDOW_SECONDS", 600))
+GEN_USER_REQUESTS_PER_WINDOW = int(os.getenv("GEN_USER_REQUESTS_PER_WINDOW", 20))
+GEN_GLOBAL_REQUESTS_PER_WINDOW = int(os.getenv("GEN_GLOBAL_REQUESTS_PER_WINDOW", 600))
+GEN_LEASE_SECONDS = float(os.getenv("GEN_LEASE_SECONDS", 300))
+GEN_INFLIGHT_RETRY_AFTER = 10
+ADMISSION_DB_PATH = os.getenv("ADMISSION_DB_PATH")
+
+class Admission(NamedTuple):
+    admitted: bool
+    token: Optional[str] = None
+    status: int = 200
+    reason: str = ""
+    retry_after: int = 0
+
+def _window_retry(oldest: float, now: float) -> int:
+    return max(1, math.ceil(oldest + GEN_WINDOW_SECONDS - now))
+
+class MemoryAdmissionStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._user_starts: Dict[str, deque] = {}
+        self._global_starts = deque()
+        self._user_inflight: Dict[str, int] = {}
+        self._inflight: Dict[str, str] = {}  # token -> user
+
+    def _prune(self, starts: deque, now: float) -> None:
+        while starts and starts[0] <= now - GEN_WINDOW_SECONDS:
+            starts.popleft()
+
+    def acquire(self, user_key: str) -> Admission:
+        now = time.time()
+        with self._lock:
+            user_starts = self._user_starts.setdefault(user_key, deque())
+            self._prune(user_starts, now)
+            self._prune(self._global_starts, now)
+
+            if self._user_inflight.get(user_key, 0) >= GEN_MAX_INFLIGHT_PER_USER:
+                return Admission(False, status=429, reason="Too many generations in progress", retry_after=GEN_INFLIGHT_RETRY_AFTER)
+            if len(user_starts) >= GEN_USER_REQUESTS_PER_WINDOW:
+                return Admission(False, status=429, reason="Generation quota exceeded", retry_after=_window_retry(user_starts[0], now))
+            if len(self._inflight) >= GEN_MAX_INFLIGHT:
+                return Admission(False, status=503, reason="Generation capacity exhausted", retry_after=GEN_INFLIGHT_RETRY_AFTER)
+            if len(self._global_starts) >= GEN_GLOBAL_REQUESTS_PER_WINDOW:
+                return Admission(False, status=503, reason="Generation capacity exhausted", retry_after=_window_retry(self._global_starts[0], now))
+
+            token = uuid.uuid4().hex
+            user_starts.append(now)
+            self._global_starts.append(now)
+            self._user_inflight[user_key] = self._user_inflight.get(user_key, 0) + 1
+            self._inflight[token] = user_key
+            return Admission(True, token)
+
+    def release(self, token: str) -> None:
+        with self._lock:
+            user_key = self._inflight.pop(token, None)
+            if user_key is None:
+                return
+            remaining = self._user_inflight.get(user_key, 1) - 1
+            if remaining > 0:
+                self._user_inflight[user_key] = remaining
+            else:
+                self._user_inflight.pop(user_key, None)
+                if not self._user_starts.get(user_key):
+                    self._user_starts.pop(user_key, None)
+
+class SqliteAdmissionStore:
+    """Same limits as MemoryAdmissionStore, kept in a SQLite file shared by local workers."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS admissions ("
+                " token TEXT PRIMARY KEY, user_key TEXT NOT NULL,"
+                " started REAL NOT NULL, finished REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS admissions_user ON admissions (user_key, started)")
+            conn.execute("CREATE INDEX IF NOT EXISTS admissions_started ON admissions (started)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def acquire(self, user_key: str) -> Admission:
+        now = time.time()
+        window_start = now - GEN_WINDOW_SECONDS
+        lease_start = now - GEN_LEASE_SECONDS
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM admissions WHERE started <= ? AND (finished IS NOT NULL OR started <= ?)",
+                         (window_start, lease_start))
+
+            def one(sql, *args):
+                return conn.execute(sql, args).fetchone()
+
+            user_inflight, = one("SELECT COUNT(*) FROM admissions WHERE user_key = ? AND finished IS NULL AND started > ?", user_key, lease_start)
+            if user_inflight >= GEN_MAX_INFLIGHT_PER_USER:
+                conn.execute("ROLLBACK")
+                return Admission(False, status=429, reason="Too many generations in progress", retry_after=GEN_INFLIGHT_RETRY_AFTER)
+
+            user_count, user_oldest = one("SELECT COUNT(*), MIN(started) FROM admissions WHERE user_key = ? AND started > ?", user_key, window_start)
+            if user_count >= GEN_USER_REQUESTS_PER_WINDOW:
+                conn.execute("ROLLBACK")
+                return Admission(False, status=429, reason="Generation quota exceeded", retry_after=_window_retry(user_oldest, now))
+
+            inflight, = one("SELECT COUNT(*) FROM admissions WHERE finished IS NULL AND started > ?", lease_start)
+            if inflight >= GEN_MAX_INFLIGHT:
+                conn.execute("ROLLBACK")
+                return Admission(False, status=503, reason="Generation capacity exhausted", retry_after=GEN_INFLIGHT_RETRY_AFTER)
+
+            total, oldest = one("SELECT COUNT(*), MIN(started) FROM admissions WHERE started > ?", window_start)
+            if total >= GEN_GLOBAL_REQUESTS_PER_WINDOW:
+                conn.execute("ROLLBACK")
+                return Admission(False, status=503, reason="Generation capacity exhausted", retry_after=_window_retry(oldest, now))
+
+            token = uuid.uuid4().hex
+            conn.execute("INSERT INTO admissions (token, user_key, started) VALUES (?, ?, ?)", (token, user_key, now))
+            conn.execute("COMMIT")
+            return Admission(True, token)
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def release(self, token: str) -> None:
+        self._connect().execute("UPDATE admissions SET finished = ? WHERE token = ?", (time.time(), token))
+
+admission_store = SqliteAdmissionStore(ADMISSION_DB_PATH) if ADMISSION_DB_PATH else MemoryAdmissionStore()
+
+def admission_key(token: str, remote_addr: Optional[str]) -> str:
+    user_id = verify_token_and_get_user_id(token) if token else None
+    return f"user:{user_id}" if user_id else f"ip:{remote_addr}"
+
+def try_admit(token: str, remote_addr: Optional[str]) -> Admission:
+    user_key = admission_key(token, remote_addr)
+    admission = admission_store.acquire(user_key)
+    if not admission.admitted:
+        print(f"[admission] Rejected {user_key} ({admission.status}): {admission.reason}")
+    return admission
+
+def release(admission: Admission) -> None:
+    if admission.token:
+        try:
+            admission_store.release(admission.token)
+        except Exception as e:
+            print(f"[admission] Failed to release slot: {e}")
+
+def rejection_body(admission: Admission) -> dict:
+    return {"error": admission.reason, "retry_after": admission.retry_after}
+
+def admit_generation(view):
+    """Flask view decorator: admit the request or answer 429/503 with Retry-After."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method == "OPTIONS":
+            return view(*args, **kwargs)
+
+        token = request.headers.get("Authorization", "").replace("Bearer ", "")
+        admission = try_admit(token, request.remote_addr)
+        if not admission.admitted:
+            response = jsonify(rejection_body(admission))
+            response.status_code = admission.status
+            response.headers["Retry-After"] = str(admission.retry_after)
+            return response
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except BaseException:
+            release(admission)
+            raise
+        if response.is_streamed:
+            # Keep the slot until the streamed body has been sent
+            response.call_on_close(lambda: release(admission))
+        else:
+            release(admission)
+        return response
+
+    return wrapper
+
+def admit_generation_async(view):
+    """admit_generation() for Quart views."""
+    from quart import Response as QuartResponse, request as quart_request, jsonify as quart_jsonify
+    from quart.wrappers.response import IterableBody
+
+    @functools.wraps(view)
+    async def wrapper(*args, **kwargs):
+        token = quart_request.headers.get("Authorization", "").replace("Bearer ", "")
+        admission = try_admit(token, quart_request.remote_addr)
+        if not admission.admitted:
+            return quart_jsonify(rejection_body(admission)), admission.status, {"Retry-After": str(admission.retry_after)}
+        try:
+            response = await view(*args, **kwargs)
+        except BaseException:
+            release(admission)
+            raise
+        if isinstance(response, QuartResponse) and isinstance(response.response, IterableBody):
+            # Keep the slot until the streamed body has been sent
+            body = response.response.iter
+
+            async def release_on_close():
+                try:
+                    async for chunk in body:
+                        yield chunk
+                finally:
+                    if hasattr(body, "aclose"):
+                        await body.aclose()
+                    release(admission)
+
+            response.response = IterableBody(release_on_close())
+        else:
+            release(admission)
+        return response
+
+    return wrapper
@@ -1,5 +1,7 @@
 from utils.token_verification import supabase
 from utils.token_verification import verify_token_and_get_user_id
+from utils.row_cache import cached_row
+from utils.progress import apply_progress
 
 def get_courses_for_user(token: str):
     user_id = verify_token_and_get_user_id(token)
@@ -29,18 +31,22 @@ def get_single_course_for_user(token, course_id):
         # Use token to fetch user_id
         user_id = verify_token_and_get_user_id(token)
 
-        # Fetch the specific course
-        result = supabase \
-            .table("courses") \
-            .select("*") \
-            .eq("user_id", user_id) \
-            .eq("id", course_id) \
-            .single() \
-            .execute()
+        # Fetch the specific course (served from the row cache when warm)
+        def load():
+            result = supabase \
+                .table("courses") \
+                .select("*") \
+                .eq("user_id", user_id) \
+                .eq("id", course_id) \
+                .single() \
+                .execute()
+            return result.data
+
+        course = cached_row("courses", user_id, course_id, load)
 
-        if not result.data:
+        if not course:
             return {"error": "Course not found"}, 404  # Explicit if no data
 
-        return result.data
+        return apply_progress(user_id, "course", course)
     except Exception as e:
         return {"error": str(e)}, 500
\ No newline at end of file
@@ -1,14 +1,19 @@
 import datetime
+import hashlib
 from uuid import UUID
 from google import genai
 import os
 from dotenv import load_dotenv
 import threading
+import asyncio
 import json
 import time
 import re
 import requests
 from utils.syllabus_generation import Syllabus
+from utils.digests import lesson_digest
+from utils.model_routing import generate, generate_async
+from utils.json_provider import dumps_bytes
 
 '''
 1. Setup
@@ -21,8 +26,9 @@ client = genai.Client(api_key=google_key)
 '''
 2. Pydantic schema for the syllabus generation
 '''
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 from typing import List, Optional
+from typing_extensions import TypedDict
 
 class Resource(BaseModel):
     unit_title: str
@@ -82,101 +88,205 @@ class Course(BaseModel):
 class CourseFull(BaseModel):
     course: Course
 
+# Plain-dict mirrors of the lesson models above. Validating into TypedDicts gives us the
+# stored unit_lessons shape in one pass, without building and then dumping model instances.
+class ResourceRecord(TypedDict):
+    unit_title: str
+    text: str
+    url: str
+
+class GradedQuestionRecord(TypedDict):
+    question: str
+    answer_choices: List[str]
+    answer: str
+
+class LessonRecord(TypedDict):
+    unit_number: int
+    lesson: str
+    lesson_summary: str
+    learning_objectives: List[str]
+    readings: str
+    examples: str
+    exercises: str
+    assessments: GradedQuestionRecord
+    additional_resources: List[ResourceRecord]
+    duration_in_min: str
+    status: str
+
 '''
 3. Functions
 '''
 
-def generate_course_from_syllabus(syllabus_json: dict) -> dict:
-    print("Generating full course from syllabus...")
+# Reusable validators: building a TypeAdapter compiles the core schema, so do it once
+# at import time instead of on every request.
+syllabus_adapter = TypeAdapter(Syllabus)
+lesson_record_adapter = TypeAdapter(LessonRecord)
 
+def parse_syllabus(syllabus_json) -> Syllabus:
+    """Validate a syllabus given as a dict or as the raw JSON string Gemini returns."""
     try:
-        print(syllabus_json)
+        if isinstance(syllabus_json, (str, bytes)):
+            syllabus_json = json.loads(syllabus_json)
 
         # 🛠 WRAP it if missing course
         if "course" not in syllabus_json:
             syllabus_json = {"course": syllabus_json}
 
-        # Validate and parse
-        syllabus_obj = Syllabus(**syllabus_json)
+        # Validate and parse (the only validation pass over the syllabus)
+        syllabus_obj = syllabus_adapter.validate_python(syllabus_json)
         print("Syllabus parsed successfully.")
+        return syllabus_obj
 
     except Exception as e:
         raise ValueError(f"Invalid syllabus input. Error: {e}")
 
-    print("course from syllabus")
-    # Get the course fields from Syllabus
-    course_from_syllabus = syllabus_obj.course
+def generate_course_from_syllabus(syllabus_json, speculative: Optional[dict] = None) -> dict:
+    """
+    speculative: lesson_key -> Future of lessons pre-generated while the syllabus was
+    being reviewed (utils/speculation.py). Lessons whose inputs still match are reused.
+    """
+    print("Generating full course from syllabus...")
 
-    print("creating full course")
-    # 🛠️ Now MANUALLY assemble the Course object
-    
-    print("total_lessons")
-    total_lessons = total_lessons = sum(len(unit.lesson_outline) for unit in course_from_syllabus.units)
-    print("init vars")
+    course_from_syllabus = parse_syllabus(syllabus_json).course
+
+    total_lessons = sum(len(unit.lesson_outline) for unit in course_from_syllabus.units)
+    reused = take_speculative(speculative, [lesson for unit in course_from_syllabus.units for lesson in unit.lesson_outline])
     # Now generate lesson contents
     all_content = [None] * total_lessons
     threads = []
     index = 0
-    print("thread create and start")
     for unit in course_from_syllabus.units:
         unit_title = f"UNIT {unit.unit_number}: {unit.title}"
         for lesson in unit.lesson_outline:
             thread = threading.Thread(
                 target=generate_lesson_threaded,
-                args=(lesson, unit_title, index, unit.unit_number, all_content)
+                args=(lesson, unit_title, index, unit.unit_number, all_content, reused[index])
             )
             threads.append(thread)
             thread.start()
             index += 1
-    print("joining threads....")
     for thread in threads:
         thread.join()
 
     print("All lessons generated.")
 
-    # Finally wrap it into CourseFull
-    print("creeating course full")
+    return {"course": build_course_document(course_from_syllabus, all_content)}
+
+async def generate_course_from_syllabus_async(syllabus_json, speculative: Optional[dict] = None) -> dict:
+    """
+    Async version of generate_course_from_syllabus: lessons are generated concurrently
+    on the event loop with asyncio.gather instead of one thread per lesson.
+    """
+    print("Generating full course from syllabus (async)...")
+
+    course_from_syllabus = parse_syllabus(syllabus_json).course
+
+    outline = [
+        (lesson, f"UNIT {unit.unit_number}: {unit.title}", unit.unit_number)
+        for unit in course_from_syllabus.units
+        for lesson in unit.lesson_outline
+    ]
+    reused = take_speculative(speculative, [lesson for lesson, _, _ in outline])
+    all_content = await asyncio.gather(*[
+        generate_lesson_async(lesson, unit_title, unit_number, future)
+        for (lesson, unit_title, unit_number), future in zip(outline, reused)
+    ])
+
+    print("All lessons generated.")
+
+    return {"course": build_course_document(course_from_syllabus, all_content)}
+
+def build_course_document(course_from_syllabus, all_content: list) -> dict:
+    """
+    Assemble the persisted course document straight from the validated syllabus and
+    the already-validated lesson dicts, without rebuilding intermediate models.
+    """
+    return {
+        "title": course_from_syllabus.title,
+        "description": course_from_syllabus.description,
+        "estimated_duration_hours_per_week": course_from_syllabus.estimated_duration_hours_per_week,
+        "estimated_number_of_weeks": course_from_syllabus.estimated_number_of_weeks,
+        "prerequisites": [],  # Default empty
+        "final_exam_description": "",  # Default empty
+        "level": course_from_syllabus.level,
+        "depth": course_from_syllabus.depth,
+        "units": [unit.model_dump() for unit in course_from_syllabus.units],
+        "unit_lessons": [
+            lesson
+            for lesson in all_content
+            if lesson and "error" not in lesson  # <-- SKIP error lessons
+        ],
+        "is_draft": course_from_syllabus.is_draft,
+        "last_accessed": course_from_syllabus.last_accessed,
+        "completed": course_from_syllabus.completed,
+        "user_id": "",
+    }
 
-    print(all_content)
+def validate_lesson(lesson_data) -> dict:
+    """
+    Validate one generated lesson against the LessonComplete shape and return it as a
+    plain dict, ready to be stored in unit_lessons. Returns an error dict if validation fails.
+    """
     try:
-        full_course = Course(
-            title=course_from_syllabus.title,
-            description=course_from_syllabus.description,
-            estimated_duration_hours_per_week=course_from_syllabus.estimated_duration_hours_per_week,
-            estimated_number_of_weeks=course_from_syllabus.estimated_number_of_weeks,
-            prerequisites=[],  # Default empty
-            final_exam_description="",  # Default empty
-            level=course_from_syllabus.level,
-            depth=course_from_syllabus.depth,
-            units=[
-                Unit(
-                    unit_number=unit.unit_number,
-                    title=unit.title,
-                    unit_description=unit.unit_description,
-                    lesson_outline=[
-                        Lesson(**lesson.model_dump()) for lesson in unit.lesson_outline
-                    ]
-                )
-                for unit in course_from_syllabus.units
-            ],
-            unit_lessons=[
-                LessonComplete(**lesson)
-                for lesson in all_content
-                if lesson and "error" not in lesson  # <-- SKIP error lessons
-            ],  # will fill later
-            is_draft=course_from_syllabus.is_draft,
-            last_accessed=course_from_syllabus.last_accessed,
-            completed=course_from_syllabus.completed,
-            user_id=""
-        )
+        return lesson_record_adapter.validate_python(lesson_data)
     except Exception as e:
-        print(e)
-    print("assinging into coursefull block")
-    course_full = CourseFull(course=full_course)
+        return {"error": f"Generated lesson failed validation: {e}"}
+
+def finalize_lesson(lesson_content: dict, unit_number: int) -> dict:
+    """
+    Validate a generated lesson and attach its study digest (see utils/digests.py).
+    Runs in the lesson worker, so assembly only has to collect dicts.
+    """
+    lesson_content["unit_number"] = unit_number
+    lesson = validate_lesson(lesson_content)
+    if "error" not in lesson:
+        lesson["digest"] = lesson_digest(lesson)
+    return lesson
+
+def lesson_key(lesson) -> str:
+    """Hash of the inputs a lesson is generated from: its title, summary and objectives."""
+    return hashlib.sha1(dumps_bytes([lesson.lesson, lesson.lesson_summary, list(lesson.learning_objectives)])).hexdigest()
+
+def take_speculative(speculative: Optional[dict], lessons: list) -> list:
+    """
+    The speculative lesson future for each lesson of the outline whose key still matches,
+    else None. Futures that haven't started yet are cancelled (generating directly is
+    quicker than queueing behind them), and those for edited or removed lessons are
+    discarded.
+    """
+    if not speculative:
+        return [None] * len(lessons)
+    pending = dict(speculative)
+    matched = []
+    for lesson in lessons:
+        future = pending.pop(lesson_key(lesson), None)
+        if future is not None and future.cancel():
+            future = None
+        matched.append(future)
+    for future in pending.values():
+        future.cancel()
+    print(f"[speculation] Reusing {sum(f is not None for f in matched)} of {len(speculative)} speculative lessons")
+    return matched
 
-    return course_full.model_dump()
+def adopt_speculative(result, unit_title: str, unit_number: int) -> Optional[dict]:
+    """A finished speculative lesson moved into its (possibly renamed) unit, or None if it failed."""
+    if not result or "error" in result:
+        return None
+    result["unit_number"] = unit_number
+    for resource in result.get("additional_resources") or []:
+        resource["unit_title"] = unit_title
+    return result
 
-def generate_lesson_threaded(lesson, unit_title, index, unit_number, all_content):
+def generate_lesson(lesson, unit_title, unit_number, speculative=None) -> dict:
+    """Generate and finalize one lesson of the outline; returns an error dict on failure."""
+    if speculative is not None:
+        try:
+            reused = adopt_speculative(speculative.result(), unit_title, unit_number)
+        except Exception as e:
+            print(f"[speculation] Speculative lesson failed: {e}")
+            reused = None
+        if reused:
+            return reused
     try:
         print(f"Generating content for lesson: {lesson.lesson}")
         # Generate the detailed content for this lesson
@@ -190,13 +300,82 @@ def generate_lesson_threaded(lesson, unit_title, index, unit_number, all_content
             unit_title  # unit title
         )
         
-        # Now, directly update the 2D array at the correct index
-        lesson_content["unit_number"] = unit_number
-        all_content[index] = lesson_content  # Assign to the specific slot in the 2D array
+        if "error" in lesson_content:
+            return lesson_content
+
+        return finalize_lesson(lesson_content, unit_number)
         
     except Exception as e:
-        # Handle errors and assign error message at the specific index
-        all_content[index] = {"error": f"Error generating content for lesson {lesson.lesson}: {e}"}
+        # Handle errors and return the error message in place of the lesson
+        return {"error": f"Error generating content for lesson {lesson.lesson}: {e}"}
+
+def generate_lesson_threaded(lesson, unit_title, index, unit_number, all_content, speculative=None):
+    all_content[index] = generate_lesson(lesson, unit_title, unit_number, speculative)  # Assign to the specific slot in the 2D array
+
+async def generate_lesson_async(lesson, unit_title, unit_number, speculative=None) -> dict:
+    if speculative is not None:
+        try:
+            reused = adopt_speculative(await asyncio.wrap_future(speculative), unit_title, unit_number)
+        except Exception as e:
+            print(f"[speculation] Speculative lesson failed: {e}")
+            reused = None
+        if reused:
+            return reused
+    try:
+        print(f"Generating content for lesson: {lesson.lesson}")
+        lesson_content = await generate_lesson_content_async(
+            lesson.lesson,
+            lesson.lesson_summary,
+            lesson.learning_objectives,
+            unit_title
+        )
+
+        if "error" in lesson_content:
+            return lesson_content
+
+        return finalize_lesson(lesson_content, unit_number)
+
+    except Exception as e:
+        return {"error": f"Error generating content for lesson {lesson.lesson}: {e}"}
+
+def build_lesson_prompt(lesson_title: str, lesson_summary: str, learning_objectives: List[str]) -> List[str]:
+    return [
+        # Core instruction
+        f"Create educational content for the lesson '{lesson_title}' based on this summary: {lesson_summary}. Learning objectives: {', '.join(learning_objectives)}.",
+        
+        # Section specifications
+        "Structure your response with these four sections:",
+        "1. Readings: Clear, comprehensive explanations of key concepts",
+        "2. Examples: Practical demonstrations of the concepts",
+        "3. Exercises: Practice activities for students",
+        "4. Assessments: Questions to test understanding (should be auto-gradable) using given JSON schema",
+        
+        # Resources request
+        "Add a final section titled 'Additional Resources' with 6 relevant links to articles, papers, books, or educational materials (not courses).",
+        
+        # Formatting instructions - clear, valid syntax
+        "FORMATTING RULES: Use these precise formats in the content sections:",
+        "1. MARKDOWN: Use properly closed tags:",
+        "   - Bold: **bold text**",
+        "   - Italic: *italic text*",
+        "   - Headers: ## Section Title",
+        "   - Lists: - Item 1\n  - Item 2 (with proper indentation)",
+        "   - Code: ```language\ncode here\n```",
+        "2. LATEX: For mathematical notation:",
+        "   - Inline math: $x^2 + y^2 = z^2$",
+        "   - Display math: $$\\frac{d}{dx}f(x) = \\lim_{h \\to 0}\\frac{f(x+h) - f(x)}{h}$$",
+        "   - Always check that LaTeX delimiters ($ and $$) are properly paired",
+        "3. QUALITY GUIDELINES:",
+        "   - Use syntax highlighting in code blocks by specifying the language",
+        "   - Keep formatting clean and consistent",
+        "   - For complex formulas, prefer display math ($$...$$) over inline ($...$)",
+        "   - Avoid mixing HTML with markdown unless absolutely necessary",
+        "   - Ensure all formatting syntax is valid and properly closed"
+    ]
+
+LESSON_CONFIG = {'response_mime_type': 'application/json',
+                 'response_schema': LessonComplete,  # Assuming this schema is correct
+                }
 
 def generate_lesson_content(lesson_title: str, lesson_summary: str, learning_objectives: List[str], unit_title: str) -> dict:
     """
@@ -204,46 +383,22 @@ def generate_lesson_content(lesson_title: str, lesson_summary: str, learning_obj
     """
     print(f"gemini call: {lesson_title}")
     
-    response = client.models.generate_content(
-        model="gemini-2.0-flash",
-        contents=[
-            # Core instruction
-            f"Create educational content for the lesson '{lesson_title}' based on this summary: {lesson_summary}. Learning objectives: {', '.join(learning_objectives)}.",
-            
-            # Section specifications
-            "Structure your response with these four sections:",
-            "1. Readings: Clear, comprehensive explanations of key concepts",
-            "2. Examples: Practical demonstrations of the concepts",
-            "3. Exercises: Practice activities for students",
-            "4. Assessments: Questions to test understanding (should be auto-gradable) using given JSON schema",
-            
-            # Resources request
-            "Add a final section titled 'Additional Resources' with 6 relevant links to articles, papers, books, or educational materials (not courses).",
-            
-            # Formatting instructions - clear, valid syntax
-            "FORMATTING RULES: Use these precise formats in the content sections:",
-            "1. MARKDOWN: Use properly closed tags:",
-            "   - Bold: **bold text**",
-            "   - Italic: *italic text*",
-            "   - Headers: ## Section Title",
-            "   - Lists: - Item 1\n  - Item 2 (with proper indentation)",
-            "   - Code: ```language\ncode here\n```",
-            "2. LATEX: For mathematical notation:",
-            "   - Inline math: $x^2 + y^2 = z^2$",
-            "   - Display math: $$\\frac{d}{dx}f(x) = \\lim_{h \\to 0}\\frac{f(x+h) - f(x)}{h}$$",
-            "   - Always check that LaTeX delimiters ($ and $$) are properly paired",
-            "3. QUALITY GUIDELINES:",
-            "   - Use syntax highlighting in code blocks by specifying the language",
-            "   - Keep formatting clean and consistent",
-            "   - For complex formulas, prefer display math ($$...$$) over inline ($...$)",
-            "   - Avoid mixing HTML with markdown unless absolutely necessary",
-            "   - Ensure all formatting syntax is valid and properly closed"
-        ],
-        config={'response_mime_type': 'application/json',
-                'response_schema': LessonComplete,  # Assuming this schema is correct
-               }
-    )
+    response = generate(client, "lesson", build_lesson_prompt(lesson_title, lesson_summary, learning_objectives), LESSON_CONFIG)
+    return parse_lesson_response(response, lesson_title, lesson_summary, learning_objectives, unit_title)
+
+async def generate_lesson_content_async(lesson_title: str, lesson_summary: str, learning_objectives: List[str], unit_title: str) -> dict:
+    """
+    Same as generate_lesson_content, using the async Gemini client.
+    """
+    print(f"gemini call (async): {lesson_title}")
+
+    response = await generate_async(client, "lesson", build_lesson_prompt(lesson_title, lesson_summary, learning_objectives), LESSON_CONFIG)
+    return parse_lesson_response(response, lesson_title, lesson_summary, learning_objectives, unit_title)
 
+def parse_lesson_response(response, lesson_title: str, lesson_summary: str, learning_objectives: List[str], unit_title: str) -> dict:
+    """
+    Turn a Gemini lesson response into a lesson dict (or an error dict).
+    """
     # Handle the response from Gemini API
     try:
         # Extract the content properly based on the response structure
@@ -327,7 +482,7 @@ def generate_lesson_content(lesson_title: str, lesson_summary: str, learning_obj
     lesson_data['additional_resources'] = extract_and_validate_additional_resources(lesson_data.get('additional_resources', []), unit_title)
     return lesson_data
 
-def extract_and_validate_additional_resources(resources, unit_title: str) -> List[Resource]:
+def extract_and_validate_additional_resources(resources, unit_title: str) -> List[ResourceRecord]:
     valid_resources = []
     
     # If resources is None or empty, return empty list
@@ -348,16 +503,15 @@ def extract_and_validate_additional_resources(resources, unit_title: str) -> Lis
         if isinstance(resource, dict):
             # If it already has the right structure, use it directly
             if 'url' in resource and 'text' in resource:
-                try:
-                    valid_resources.append(Resource(
-                        unit_title=unit_title,
-                        text=resource['text'],
-                        url=resource['url']
-                    ))
+                if isinstance(resource['text'], str) and isinstance(resource['url'], str):
+                    valid_resources.append({
+                        "unit_title": unit_title,
+                        "text": resource['text'],
+                        "url": resource['url']
+                    })
                     continue
-                except Exception:
-                    # If there's an error, fall back to string conversion
-                    resource = str(resource)
+                # If the fields aren't strings, fall back to string conversion
+                resource = str(resource)
             else:
                 # Convert dict to string
                 resource = str(resource)
@@ -375,11 +529,11 @@ def extract_and_validate_additional_resources(resources, unit_title: str) -> Lis
                 if url[-1] in ['.', ',', ')', ']', '}', ';', ':', '"', "'"]:
                     url = url[:-1]
                     
-                valid_resources.append(Resource(
-                    unit_title=unit_title,
-                    text=resource_str,
-                    url=url
-                ))
+                valid_resources.append({
+                    "unit_title": unit_title,
+                    "text": resource_str,
+                    "url": url
+                })
         except Exception as e:
             print(f"Error processing resource: {e}")
             continue
@@ -0,0 +1,178 @@
+import copy
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Optional
+from utils.json_provider import dumps_bytes
+from utils.singleflight import flight_key
+
+'''
+Precomputed course library.
+
+scripts/build_course_library.py generates syllabi and full courses offline for the
+topics in data/library_topics.json. It writes them to COURSE_LIBRARY_DIR (default
+data/library): one JSON file per topic/difficulty/depth, plus index.json, which maps
+
+- the normalized (topic, difficulty, depth) key to an entry, for /generate_syllabus
+- the syllabus fingerprint to an entry, for /generate_course
+
+The fingerprint hashes exactly what course generation reads from a syllabus (titles,
+summaries, objectives). A syllabus the user edited no longer matches, so it falls
+back to live generation. A match is cloned into the user's own courses row.
+
+The index is re-read when its mtime changes, so a rebuilt library is picked up
+without a restart.
+'''
+
+LIBRARY_DIR = os.getenv("COURSE_LIBRARY_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "library"))
+INDEX_FILE = "index.json"
+
+def library_key(topic: str, difficulty: str, depth: str) -> str:
+    return flight_key("library", topic, difficulty, depth).split(":", 1)[1]
+
+def _norm(value) -> str:
+    return " ".join(str(value or "").split())
+
+def syllabus_fingerprint(syllabus: dict) -> str:
+    """Hash of the parts of a syllabus that lesson generation depends on."""
+    course = syllabus.get("course", syllabus)
+    canonical = [
+        _norm(course.get("title")),
+        _norm(course.get("description")),
+        # The frontend overwrites these with the user's selections, case as typed
+        _norm(course.get("level")).casefold(),
+        _norm(course.get("depth")).casefold(),
+        [
+            [
+                unit.get("unit_number"),
+                _norm(unit.get("title")),
+                _norm(unit.get("unit_description")),
+                [
+                    [_norm(lesson.get("lesson")), _norm(lesson.get("lesson_summary")),
+                     [_norm(o) for o in lesson.get("learning_objectives") or []]]
+                    for lesson in unit.get("lesson_outline", [])
+                ],
+            ]
+            for unit in course.get("units", [])
+        ],
+    ]
+    return hashlib.sha1(dumps_bytes(canonical)).hexdigest()
+
+class CourseLibrary:
+    def __init__(self, directory: str = LIBRARY_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._index = {"topics": {}, "syllabi": {}}
+        self._index_mtime = None
+        self._entries = {}
+
+    def _refresh(self) -> None:
+        path = os.path.join(self.directory, INDEX_FILE)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return
+        if mtime == self._index_mtime:
+            return
+        try:
+            with open(path) as f:
+                index = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[course library] Could not read {path}: {e}")
+            return
+        self._index = {"topics": index.get("topics", {}), "syllabi": index.get("syllabi", {})}
+        self._index_mtime = mtime
+        self._entries.clear()
+
+    def _entry(self, filename: Optional[str]) -> Optional[dict]:
+        if not filename:
+            return None
+        entry = self._entries.get(filename)
+        if entry is None:
+            try:
+                with open(os.path.join(self.directory, filename)) as f:
+                    entry = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"[course library] Could not read entry {filename}: {e}")
+                return None
+            self._entries[filename] = entry
+        return entry
+
+    def find_syllabus(self, topic: str, difficulty: str, depth: str) -> Optional[str]:
+        """The stored syllabus JSON for a topic/difficulty/depth, or None."""
+        with self._lock:
+            self._refresh()
+            entry = self._entry(self._index["topics"].get(library_key(topic, difficulty, depth)))
+        return entry["syllabus"] if entry else None
+
+    def find_course(self, syllabus: dict) -> Optional[dict]:
+        """A private copy of the stored course generated from this exact syllabus, or None."""
+        with self._lock:
+            self._refresh()
+            if not self._index["syllabi"]:
+                return None
+            entry = self._entry(self._index["syllabi"].get(syllabus_fingerprint(syllabus)))
+        return copy.deepcopy(entry["course"]) if entry else None
+
+    def has(self, topic: str, difficulty: str, depth: str) -> bool:
+        with self._lock:
+            self._refresh()
+            return library_key(topic, difficulty, depth) in self._index["topics"]
+
+    def store(self, topic: str, difficulty: str, depth: str, syllabus_json: str, course: dict) -> str:
+        """Write an entry and add it to the index. Used by the offline build job."""
+        key = library_key(topic, difficulty, depth)
+        filename = f"{key}.json"
+        # Store the syllabus the way the frontend will send it back
+        syllabus = json.loads(syllabus_json)
+        syllabus.setdefault("course", {}).update(level=difficulty, depth=depth)
+        syllabus_json = dumps_bytes(syllabus).decode()
+        fingerprint = syllabus_fingerprint(syllabus)
+        entry = {
+            "topic": topic,
+            "difficulty": difficulty,
+            "depth": depth,
+            "fingerprint": fingerprint,
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "syllabus": syllabus_json,
+            "course": course,
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            _write_atomic(os.path.join(self.directory, filename), dumps_bytes(entry))
+            self._refresh()
+            index = {"topics": dict(self._index["topics"]), "syllabi": dict(self._index["syllabi"])}
+            stale = [fp for fp, name in index["syllabi"].items() if name == filename]
+            for fp in stale:
+                del index["syllabi"][fp]
+            index["topics"][key] = filename
+            index["syllabi"][fingerprint] = filename
+            _write_atomic(os.path.join(self.directory, INDEX_FILE), dumps_bytes(index, sort_keys=True, indent=True))
+            self._index_mtime = None
+            self._refresh()
+        return filename
+
+def _write_atomic(path: str, data: bytes) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+# Course fields the syllabus fingerprint ignores (or normalizes) that the user sets
+# in the syllabus editor: a clone takes them from the request, not the library
+REQUEST_FIELDS = ("estimated_duration_hours_per_week", "estimated_number_of_weeks", "level", "depth", "is_draft", "last_accessed")
+
+def clone_course(course: dict, request_data: Optional[dict] = None) -> dict:
+    """Library course ready to be saved as a new draft for a user, with the request's own settings."""
+    for field in ("id", "user_id", "created_at", "last_accessed"):
+        course.pop(field, None)
+    course["completed"] = 0
+    requested = (request_data or {}).get("course", request_data or {})
+    for field in REQUEST_FIELDS:
+        if requested.get(field) is not None:
+            course[field] = requested[field]
+    return course
+
+course_library = CourseLibrary()
@@ -1,16 +1,28 @@
 from utils.token_verification import supabase
-from utils.token_verification import verify_token_and_get_user_id
+from utils.token_verification import verify_token_and_get_user_id, get_async_supabase
+from utils.source_resolution import invalidate_source
+from utils.row_cache import invalidate_row
+from utils.document_patching import if_unchanged, select_columns, versioned
+from utils.search_index import note_inserted
 
 import json
-from typing import Dict, Any, Tuple, Union
+import threading
+from typing import Dict, Any, Optional, Tuple, Union
 
-def save_course_draft(data: dict, token) -> Union[Dict[str, Any], Tuple[Dict[str, Any], int]]:
-    """Create a new course draft in the database"""
-    user_id = verify_token_and_get_user_id(token)
-    if not user_id:
-        return {"error": "Invalid token or user not authenticated"}, 401
-    
-    course_data = {
+# Serializes read-modify-write of a course's unit_lessons within this worker
+_course_locks = [threading.Lock() for _ in range(64)]
+
+# "generation" of a lazy lesson placeholder (utils/lazy_lessons.py). Kept apart from
+# "status", which is the learner's progress.
+PENDING = "pending"
+
+def is_pending_lesson(lesson: dict) -> bool:
+    """Whether a unit_lessons entry is a placeholder that still has to be generated."""
+    return lesson.get("generation") == PENDING
+
+def build_course_row(data: dict, user_id: str) -> Dict[str, Any]:
+    """Pick the persisted course columns out of a course document"""
+    return {
         "title": data.get("title"),
         "description": data.get("description"),
         "estimated_duration_hours_per_week": data.get("estimated_duration_hours_per_week"),
@@ -27,8 +39,75 @@ def save_course_draft(data: dict, token) -> Union[Dict[str, Any], Tuple[Dict[str
         "completed": data.get("completed", 0),
     }
 
+def save_course_draft(data: dict, token) -> Union[Dict[str, Any], Tuple[Dict[str, Any], int]]:
+    """Create a new course draft in the database"""
+    user_id = verify_token_and_get_user_id(token)
+    if not user_id:
+        return {"error": "Invalid token or user not authenticated"}, 401
+
+    course_data = build_course_row(data, user_id)
+
     try:
         result = (supabase.table("courses").insert(course_data).execute())
+        note_inserted("courses", result.data)
+        return result.data
+    except Exception as e:
+        print(f"[ERROR] Supabase insert failed: {e}")
+        return {"error": str(e)}, 500
+
+def load_course_lessons(user_id: str, course_id: str) -> Optional[Dict[str, Any]]:
+    """Fresh (uncached) id, version, units and unit_lessons of a course owned by user_id, or None"""
+    result = supabase.table("courses").select(select_columns("courses", "id", "units", "unit_lessons")).eq("id", course_id).eq("user_id", user_id).limit(1).execute()
+    return result.data[0] if result.data else None
+
+def replace_course_lessons(user_id: str, course_id: str, replacements: Dict[int, Tuple[str, dict]], only_pending: bool = False) -> Dict[int, dict]:
+    """
+    Write new lessons into their unit_lessons slots: {position: (expected lesson title, lesson)}.
+    The row is re-read under a per-course lock, and a slot is only replaced if it still
+    holds that lesson (and, with only_pending, is still pending). Everything else in
+    the course is written back unchanged, with a compare-and-set on the row version so
+    a concurrent patch from another worker isn't lost. Returns each slot's lesson afterwards.
+    """
+    with _course_locks[hash(course_id) % len(_course_locks)]:
+        for _ in range(3):
+            course = load_course_lessons(user_id, course_id)
+            lessons = (course or {}).get("unit_lessons") or []
+            stored, changed = {}, False
+            for position, (title, lesson) in replacements.items():
+                if position >= len(lessons):
+                    continue
+                current = lessons[position]
+                if current.get("lesson") != title or (only_pending and not is_pending_lesson(current)):
+                    # Edited or filled elsewhere in the meantime
+                    stored[position] = current
+                    continue
+                lessons[position] = stored[position] = lesson
+                changed = True
+            if not changed:
+                break
+            updated = if_unchanged(supabase.table("courses").update(versioned("courses", {"unit_lessons": lessons}, course)), "courses", course) \
+                .eq("id", course_id).eq("user_id", user_id).execute()
+            if updated.data:
+                break
+        else:
+            raise RuntimeError(f"Course {course_id} kept changing while its lessons were being stored")
+    if changed:
+        invalidate_source(course_id)
+        invalidate_row("courses", course_id)
+    return stored
+
+async def save_course_draft_async(data: dict, token) -> Union[Dict[str, Any], Tuple[Dict[str, Any], int]]:
+    """Same as save_course_draft, using the async Supabase client"""
+    user_id = verify_token_and_get_user_id(token)
+    if not user_id:
+        return {"error": "Invalid token or user not authenticated"}, 401
+
+    course_data = build_course_row(data, user_id)
+
+    try:
+        client = await get_async_supabase()
+        result = await client.table("courses").insert(course_data).execute()
+        note_inserted("courses", result.data)
         return result.data
     except Exception as e:
         print(f"[ERROR] Supabase insert failed: {e}")
@@ -52,7 +131,9 @@ def update_course_draft(course_id: str, data: dict, token) -> Union[Dict[str, An
 
     try:
         # Only update the fields provided
-        result = supabase.table("courses").update(data).eq("id", course_id).execute()
+        result = supabase.table("courses").update(versioned("courses", data, course.data[0])).eq("id", course_id).execute()
+        invalidate_source(course_id)
+        invalidate_row("courses", course_id)
         return result.data
     except Exception as e:
         print(f"[ERROR] Supabase update failed: {e}")
@@ -76,6 +157,8 @@ def delete_course(course_id: str, token) -> Union[Dict[str, Any], Tuple[Dict[str
     
     try:
         result = supabase.table("courses").delete().eq("id", course_id).execute()
+        invalidate_source(course_id)
+        invalidate_row("courses", course_id)
         return {"message": "Course successfully deleted", "id": course_id}
     except Exception as e:
         print(f"[ERROR] Supabase delete failed: {e}")
@@ -0,0 +1,152 @@
+import re
+import zlib
+from typing import Dict, List, Optional, Set, Tuple
+
+'''
+Near-duplicate detection for flashcards (character shingles + MinHash + LSH).
+
+Each card's front and back are normalized and cut into overlapping character
+shingles. A MinHash signature of NUM_PERM values approximates the Jaccard similarity
+of two shingle sets (one-permutation hashing), and LSH banding puts cards that agree on a whole band into the
+same bucket, so only cards sharing a bucket are compared. Candidates are then
+confirmed with the exact Jaccard similarity of their shingle sets. Cost grows roughly
+linearly with the number of cards instead of quadratically.
+'''
+
+DEFAULT_THRESHOLD = 0.7
+SHINGLE_SIZE = 5
+NUM_PERM = 64
+
+_MASK32 = (1 << 32) - 1
+_MIX = 0x9E3779B1  # odd multiplier (golden ratio) to spread crc32 values over the bins
+_OFFSET = 1 << 32  # keeps borrowed values distinct from real ones
+_NON_WORD = re.compile(r"[^a-z0-9 ]+")
+
+def normalize(text: str) -> str:
+    return " ".join(_NON_WORD.sub(" ", str(text).lower()).split())
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[int]:
+    """Hashed character shingles of the normalized text."""
+    text = normalize(text)
+    if len(text) <= size:
+        return {zlib.crc32(text.encode())} if text else set()
+    encoded = text.encode()
+    return {zlib.crc32(encoded[i:i + size]) for i in range(len(encoded) - size + 1)}
+
+def minhash(shingle_set: Set[int]) -> Tuple[int, ...]:
+    """
+    One-permutation MinHash: each shingle is hashed once and dropped into one of NUM_PERM
+    bins, keeping the minimum per bin. Empty bins borrow the value of the next non-empty
+    bin (rotation densification). One multiply per shingle instead of one per
+    shingle per permutation.
+    """
+    bins: List[Optional[int]] = [None] * NUM_PERM
+    for h in shingle_set:
+        h = (h * _MIX) & _MASK32
+        slot, value = h % NUM_PERM, h // NUM_PERM
+        current = bins[slot]
+        if current is None or value < current:
+            bins[slot] = value
+
+    filled = [i for i, value in enumerate(bins) if value is not None]
+    if len(filled) == NUM_PERM:
+        return tuple(bins)
+    signature = list(bins)
+    for i in range(NUM_PERM):
+        if signature[i] is None:
+            # distance to the next filled bin, wrapping around
+            j = next((f for f in filled if f > i), filled[0] + NUM_PERM)
+            signature[i] = bins[j % NUM_PERM] + (j - i) * _OFFSET
+    return tuple(signature)
+
+def jaccard(a: Set[int], b: Set[int]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def choose_bands(threshold: float, num_perm: int = NUM_PERM) -> Tuple[int, int]:
+    """
+    Pick (bands, rows) with bands * rows == num_perm so the LSH S-curve's midpoint,
+    (1 / bands) ** (1 / rows), sits just below the threshold (favouring recall; false
+    candidates are removed by the exact check).
+    """
+    best = (num_perm, 1)
+    best_gap = float("inf")
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        midpoint = (1 / bands) ** (1 / rows)
+        gap = threshold - midpoint
+        if 0 <= gap < best_gap:
+            best, best_gap = (bands, rows), gap
+    return best
+
+def card_text(card: dict) -> str:
+    return f"{card.get('front', '')} {card.get('back', '')}"
+
+class NearDuplicateIndex:
+    """Incremental LSH index: add texts one at a time and ask whether each is new."""
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self.bands, self.rows = choose_bands(threshold)
+        self.buckets: List[Dict[Tuple[int, ...], List[int]]] = [{} for _ in range(self.bands)]
+        self.shingle_sets: List[Set[int]] = []
+
+    def find(self, shingle_set: Set[int], signature: Tuple[int, ...]) -> Optional[int]:
+        """Index of an already added item similar to this one, or None."""
+        checked = set()
+        for band, buckets in enumerate(self.buckets):
+            key = signature[band * self.rows:(band + 1) * self.rows]
+            for candidate in buckets.get(key, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                if jaccard(shingle_set, self.shingle_sets[candidate]) >= self.threshold:
+                    return candidate
+        return None
+
+    def insert(self, shingle_set: Set[int], signature: Tuple[int, ...]) -> int:
+        index = len(self.shingle_sets)
+        self.shingle_sets.append(shingle_set)
+        for band, buckets in enumerate(self.buckets):
+            key = signature[band * self.rows:(band + 1) * self.rows]
+            buckets.setdefault(key, []).append(index)
+        return index
+
+    def add(self, text: str) -> Optional[int]:
+        """
+        Add text unless it is a near-duplicate of something already added.
+        Returns the index of the existing duplicate, or None if the text was added.
+        """
+        shingle_set = shingles(text)
+        if not shingle_set:
+            # Nothing to compare, but keep indexes aligned with the caller's list
+            self.shingle_sets.append(shingle_set)
+            return None
+        signature = minhash(shingle_set)
+        match = self.find(shingle_set, signature)
+        if match is None:
+            self.insert(shingle_set, signature)
+        return match
+
+def dedupe_cards(cards: List[dict], threshold: float = DEFAULT_THRESHOLD) -> Tuple[List[dict], int]:
+    """
+    Drop near-duplicate cards, keeping the first of each group in order. If a later
+    duplicate has more study history (correct + incorrect), its progress is kept on the
+    surviving card. Returns (kept_cards, removed_count).
+    """
+    index = NearDuplicateIndex(threshold)
+    kept: List[dict] = []
+    for card in cards:
+        match = index.add(card_text(card))
+        if match is None:
+            kept.append(card)
+            continue
+        survivor = kept[match]
+        attempts = card.get('correct', 0) + card.get('incorrect', 0)
+        if attempts > survivor.get('correct', 0) + survivor.get('incorrect', 0):
+            survivor['correct'] = card.get('correct', 0)
+            survivor['incorrect'] = card.get('incorrect', 0)
+    return kept, len(cards) - len(kept)
@@ -0,0 +1,109 @@
+import re
+from typing import Iterable, List
+
+'''
+Compact study digests.
+
+A digest is a short key-concepts extract of one course lesson or quick learn section:
+its title, summary, learning objectives, section headings, and the sentences that
+define bolded terms, capped at DIGEST_MAX_CHARS. Digests are computed locally (no
+Gemini call) when a course or quick learn is created and stored on the lesson/section
+under "digest", so flashcard generation can send them instead of the full readings.
+'''
+
+DIGEST_MAX_CHARS = 1200
+
+# The fields each kind of digest is built from
+LESSON_DIGEST_FIELDS = ("lesson", "lesson_summary", "learning_objectives", "readings", "examples", "exercises")
+SECTION_DIGEST_FIELDS = ("title", "readings", "examples")
+
+_HEADING = re.compile(r"^\s{0,3}#{1,6}\s+(.+?)\s*#*\s*$", re.MULTILINE)
+_BOLD = re.compile(r"\*\*(.+?)\*\*|__(.+?)__")
+_CODE_BLOCK = re.compile(r"```.*?```", re.DOTALL)
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+def _clean(text: str) -> str:
+    return " ".join(text.replace("**", "").replace("__", "").split())
+
+def key_sentences(text: str) -> List[str]:
+    """Sentences that introduce a bolded term, in document order, without duplicates."""
+    text = _CODE_BLOCK.sub(" ", text or "")
+    sentences, seen = [], set()
+    for paragraph in text.split("\n"):
+        if not _BOLD.search(paragraph) or paragraph.lstrip().startswith("#"):
+            continue
+        for sentence in _SENTENCE_END.split(paragraph):
+            # Skip bare labels like "**Solution:**" with nothing after the term
+            if _BOLD.search(sentence) and len(_BOLD.sub("", sentence).strip(" :-*.")) > 15:
+                cleaned = _clean(sentence.lstrip("-*0123456789. "))
+                if len(cleaned) > 3 and cleaned.lower() not in seen:
+                    seen.add(cleaned.lower())
+                    sentences.append(cleaned)
+    return sentences
+
+def headings(text: str) -> List[str]:
+    skip = {"readings", "examples", "exercises", "assessments", "additional resources"}
+    return [_clean(h) for h in _HEADING.findall(text or "") if _clean(h).lower() not in skip]
+
+def build_digest(title: str, summary: str, objectives: Iterable[str], texts: Iterable[str], max_chars: int = DIGEST_MAX_CHARS) -> str:
+    lines = [f"Lesson: {title}"]
+    if summary:
+        lines.append(summary)
+    objectives = [o for o in objectives or [] if o]
+    if objectives:
+        lines.append("Objectives: " + "; ".join(objectives))
+
+    topics, concepts = [], []
+    for text in texts:
+        topics.extend(headings(text))
+        concepts.extend(key_sentences(text))
+    if topics:
+        lines.append("Topics: " + "; ".join(dict.fromkeys(topics)))
+
+    digest = "\n".join(lines)
+    for concept in concepts:
+        if len(digest) + len(concept) + 3 > max_chars:
+            break
+        digest += f"\n- {concept}"
+    return digest[:max_chars]
+
+def lesson_digest(lesson: dict) -> str:
+    """Stored digest of a course lesson, computed on the fly for courses created before digests."""
+    if lesson.get("digest"):
+        return lesson["digest"]
+    return build_digest(
+        lesson.get("lesson", ""),
+        lesson.get("lesson_summary", ""),
+        lesson.get("learning_objectives") or [],
+        [lesson.get("readings", ""), lesson.get("examples", ""), lesson.get("exercises", "")],
+    )
+
+def section_digest(section: dict) -> str:
+    """Stored digest of a quick learn section, computed on the fly if missing."""
+    if section.get("digest"):
+        return section["digest"]
+    return build_digest(
+        section.get("title", ""),
+        "",
+        [],
+        [section.get("readings", ""), section.get("examples", "")],
+    )
+
+def refresh_digests(before: List[dict], after: List[dict], fields: Iterable[str], digest_fn) -> List[dict]:
+    """
+    Recompute the stored digest (in place) of every lesson/section in `after` whose
+    digested fields differ from the one at the same position in `before`.
+    """
+    fields = tuple(fields)
+    for position, item in enumerate(after):
+        old = before[position] if position < len(before) and isinstance(before[position], dict) else {}
+        if isinstance(item, dict) and any(item.get(f) != old.get(f) for f in fields):
+            item.pop("digest", None)
+            item["digest"] = digest_fn(item)
+    return after
+
+def attach_digests(lessons: List[dict], digest_fn) -> List[dict]:
+    """Store a digest on every lesson/section dict (in place) and return the list."""
+    for lesson in lessons:
+        lesson["digest"] = digest_fn(lesson)
+    return lessons
@@ -0,0 +1,242 @@
+from typing import Any, Dict, List, Optional, Tuple, Union
+from pydantic import TypeAdapter, ValidationError
+from typing_extensions import NotRequired, TypedDict
+from utils.token_verification import supabase, verify_token_and_get_user_id
+from utils.course_generation import GradedQuestionRecord, ResourceRecord
+from utils.digests import LESSON_DIGEST_FIELDS, SECTION_DIGEST_FIELDS, lesson_digest, refresh_digests, section_digest
+from utils.json_patch import JSONPatchError, JSONPatchTestFailed, apply_patch, parse_pointer, validate_patch
+from utils.source_resolution import invalidate_source
+from utils.row_cache import invalidate_row
+
+'''
+JSON Patch (RFC 6902) updates for courses and quick learns.
+
+PATCH /api/patch_course/<id> and /api/patch_quick_learn/<id> take an array of patch
+operations, e.g.
+
+    [{"op": "replace", "path": "/unit_lessons/3/status", "value": "completed"},
+     {"op": "replace", "path": "/completed", "value": 4}]
+
+The first token of every path (and "from") must be one of the table's PATCHABLE
+columns. Only the columns a patch touches are read and written back, and the patched
+columns are validated against their schema before anything is stored. Lessons and
+sections whose content a patch changes get their stored digest (utils/digests.py)
+recomputed. The response is the new row version, not the document.
+
+Optimistic concurrency uses an integer `version` column on both tables, added by
+backend/migrations/001_document_versions.sql. Every write through the API bumps it,
+and a patch is stored with a compare-and-set on the version it was applied to. A
+client that sends If-Match: "<version>" (the version of the row it last read) gets 412
+with the current version if the row has changed since. Without If-Match, a patch that
+loses a race is re-applied to the fresh row, up to PATCH_RETRIES times, which is safe
+because its "test" operations are re-checked.
+
+On a database without the migration, has_version_column() is False and writes fall
+back to plain, unconditional updates (every row reads as version 0), so lazy lessons,
+regeneration and the older update endpoints keep working.
+'''
+
+PATCH_RETRIES = 3
+MIGRATION_FILE = "backend/migrations/001_document_versions.sql"
+
+_version_columns: Dict[str, bool] = {}
+
+class LessonOutlineRecord(TypedDict):
+    lesson: str
+    lesson_summary: str
+    learning_objectives: List[str]
+
+class UnitRecord(TypedDict):
+    unit_number: int
+    title: str
+    unit_description: str
+    lesson_outline: List[LessonOutlineRecord]
+
+class StoredLessonRecord(TypedDict):
+    # LessonRecord as stored: lazy (pending) lessons have no assessment yet
+    unit_number: int
+    lesson: str
+    lesson_summary: str
+    learning_objectives: List[str]
+    readings: str
+    examples: str
+    exercises: str
+    assessments: Optional[GradedQuestionRecord]
+    additional_resources: List[ResourceRecord]
+    duration_in_min: str
+    status: str
+    generation: NotRequired[str]
+    digest: NotRequired[str]
+
+class SectionRecord(TypedDict):
+    id: str
+    title: str
+    readings: str
+    examples: str
+    additional_resources: List[ResourceRecord]
+    status: NotRequired[str]
+    digest: NotRequired[str]
+
+class QuickLearnQuestionRecord(TypedDict):
+    question: str
+    options: List[str]
+    correctAnswer: int
+
+class QuickLearnAssessmentRecord(TypedDict):
+    title: str
+    instructions: Optional[str]
+    questions: List[QuickLearnQuestionRecord]
+
+# Lesson / section lists whose stored digests must follow content edits
+DIGESTED = {
+    "courses": {"unit_lessons": (LESSON_DIGEST_FIELDS, lesson_digest)},
+    "quick_learns": {"sections": (SECTION_DIGEST_FIELDS, section_digest)},
+}
+
+# Patchable columns and the schema each must still satisfy after the patch
+PATCHABLE: Dict[str, Dict[str, TypeAdapter]] = {
+    "courses": {
+        "title": TypeAdapter(str),
+        "description": TypeAdapter(str),
+        "estimated_duration_hours_per_week": TypeAdapter(int),
+        "estimated_number_of_weeks": TypeAdapter(int),
+        "prerequisites": TypeAdapter(List[str]),
+        "final_exam_description": TypeAdapter(str),
+        "level": TypeAdapter(str),
+        "depth": TypeAdapter(str),
+        "units": TypeAdapter(List[UnitRecord]),
+        "unit_lessons": TypeAdapter(List[StoredLessonRecord]),
+        "is_draft": TypeAdapter(bool),
+        "completed": TypeAdapter(int),
+    },
+    "quick_learns": {
+        "title": TypeAdapter(str),
+        "description": TypeAdapter(str),
+        "topic": TypeAdapter(str),
+        "difficulty": TypeAdapter(str),
+        "estimated_duration_minutes": TypeAdapter(int),
+        "sections": TypeAdapter(List[SectionRecord]),
+        "assessment": TypeAdapter(QuickLearnAssessmentRecord),
+        "resources": TypeAdapter(List[Any]),
+        "completed": TypeAdapter(int),
+    },
+}
+
+def patched_columns(table: str, operations: List[dict]) -> List[str]:
+    """Top-level columns a patch reads or writes; raises JSONPatchError for any other path."""
+    columns = []
+    for operation in validate_patch(operations):
+        for pointer in (operation["path"], operation.get("from")):
+            if pointer is None:
+                continue
+            tokens = parse_pointer(pointer)
+            if not tokens:
+                raise JSONPatchError("Operations on the whole document are not supported")
+            if tokens[0] not in PATCHABLE[table]:
+                raise JSONPatchError(f"Path {pointer!r} is not patchable")
+            if tokens[0] not in columns:
+                columns.append(tokens[0])
+    return columns
+
+def if_match_version(header: Optional[str]) -> Optional[int]:
+    """The row version in an If-Match header ('"3"', 'W/"3"' or '3'), None if absent or '*'."""
+    value = (header or "").strip()
+    if not value or value == "*":
+        return None
+    value = value[2:] if value.startswith("W/") else value
+    try:
+        return int(value.strip('"'))
+    except ValueError:
+        raise JSONPatchError(f"Invalid If-Match header: {header!r}")
+
+def next_version(row: Optional[dict]) -> int:
+    """Version to store with a write of row (the value it was read with plus one)."""
+    return ((row or {}).get("version") or 0) + 1
+
+def _missing_column(e: Exception) -> bool:
+    # 42703: undefined_column from Postgres; PGRST204: column not in PostgREST's schema cache
+    return getattr(e, "code", None) in ("42703", "PGRST204") or "does not exist" in str(e)
+
+def has_version_column(table: str) -> bool:
+    """Whether table has the version column (checked once per process)."""
+    if table not in _version_columns:
+        try:
+            supabase.table(table).select("version").limit(1).execute()
+            _version_columns[table] = True
+        except Exception as e:
+            if not _missing_column(e):
+                raise
+            print(f"[patch] {table}.version is missing, writes are not version-checked (run {MIGRATION_FILE})")
+            _version_columns[table] = False
+    return _version_columns[table]
+
+def select_columns(table: str, *columns: str) -> str:
+    """select() list for columns, plus version if the table has it."""
+    return ", ".join([*columns, "version"] if has_version_column(table) else columns)
+
+def versioned(table: str, values: dict, row: Optional[dict]) -> dict:
+    """Update values for a write of row, with the bumped version if the table has one."""
+    return {**values, "version": next_version(row)} if has_version_column(table) else values
+
+def if_unchanged(query, table: str, row: Optional[dict]):
+    """Restrict an update to the version row was read at (no-op without the column)."""
+    return query.eq("version", (row or {}).get("version") or 0) if has_version_column(table) else query
+
+def patch_document(table: str, row_id: str, operations: Any, token: str, expected_version: Optional[int] = None) -> Union[Dict[str, Any], Tuple[Dict[str, Any], int]]:
+    """Apply a JSON Patch to one of the user's courses / quick learns; returns the new version."""
+    user_id = verify_token_and_get_user_id(token)
+    if not user_id:
+        return {"error": "Invalid token or user not authenticated"}, 401
+
+    try:
+        columns = patched_columns(table, operations)
+    except JSONPatchError as e:
+        return {"error": str(e)}, 400
+    if not columns:
+        return {"error": "Empty patch"}, 400
+
+    try:
+        for _ in range(PATCH_RETRIES):
+            result = supabase.table(table).select(select_columns(table, "id", *columns)).eq("id", row_id).eq("user_id", user_id).limit(1).execute()
+            if not result.data:
+                return {"error": "Not found"}, 404
+            row = result.data[0]
+            version = row.get("version") or 0
+            if expected_version is not None and expected_version != version:
+                return {"error": "The document has changed since it was read", "version": version}, 412
+
+            before = {column: row.get(column) for column in columns}
+            try:
+                after = apply_patch(before, operations)
+                for column in columns:
+                    PATCHABLE[table][column].validate_python(after.get(column))
+            except JSONPatchTestFailed as e:
+                return {"error": str(e), "version": version}, 409
+            except JSONPatchError as e:
+                return {"error": str(e)}, 400
+            except ValidationError as e:
+                return {"error": f"Patched document is invalid: {e.errors(include_url=False)}"}, 422
+
+            # Flashcard generation reads the stored digest, so it must match edited content
+            for column, (fields, digest_fn) in DIGESTED[table].items():
+                if column in columns:
+                    refresh_digests(before[column] or [], after[column], fields, digest_fn)
+
+            changes = {column: after.get(column) for column in columns if after.get(column) != before[column]}
+            if not changes:
+                return {"id": row_id, "version": version}
+
+            # Compare-and-set: only lands if nobody wrote the row since it was read
+            updated = if_unchanged(supabase.table(table).update(versioned(table, changes, row)), table, row) \
+                .eq("id", row_id).eq("user_id", user_id).execute()
+            if updated.data:
+                invalidate_source(row_id)
+                invalidate_row(table, row_id)
+                return {"id": row_id, "version": updated.data[0].get("version") or 0}
+            if expected_version is not None:
+                return {"error": "The document has changed since it was read"}, 412
+            print(f"[patch] {table} {row_id} changed while patching, retrying")
+        return {"error": "The document is being modified concurrently, try again"}, 409
+    except Exception as e:
+        print(f"[ERROR] Patching {table} {row_id} failed: {e}")
+        return {"error": str(e)}, 500
@@ -1,10 +1,19 @@
-from typing import List
+from typing import Iterator, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
 from pydantic import BaseModel
 from dotenv import load_dotenv
 from google import genai
 import os
 import json
+import base64
+import uuid
 from utils.token_verification import supabase
+from utils.digests import lesson_digest, section_digest
+from utils.dedup import DEFAULT_THRESHOLD, NearDuplicateIndex, card_text
+from utils.source_resolution import fetch_source
+from utils.model_routing import generate
+from utils.search_index import note_inserted
 
 load_dotenv()
 
@@ -34,45 +43,87 @@ class Flashcard(BaseModel):
 class FlashcardSet(BaseModel):
     flashcards: List[Flashcard]
 
-def get_single_course_or_quicklearn(source_id):
-    try:
-        result = supabase.table("courses").select("*").eq("id", source_id).single().execute()
-        if result.data:
-            return result.data, "course"
-        result = supabase.table("quick_learns").select("*").eq("id", source_id).single().execute()
-        if result.data:
-            return result.data, "quick-learn"
-        return None, None
-    except Exception as e:
-        print(f"[ERROR fetching source]: {e}")
-        return None, None
-
-def generate_flashcards(source_id, source_type, contentInput, num_cards, learning_goal):
-    # Fetch course or quick learn based on source_type
-    if source_type == "course":
-        result = supabase.table("courses").select("*").eq("id", source_id).single().execute()
-    else:
-        result = supabase.table("quick_learns").select("*").eq("id", source_id).single().execute()
-
-    if not result.data:
-        raise ValueError(f"Source not found for source_id={source_id} and source_type={source_type}")
+# --- Map-reduce generation ---
+# Source content is split into chunks of study digests (a course unit or a quick learn section,
+# further split if a chunk is too long; see utils/digests.py), each chunk gets a card quota proportional to its size, and the
+# chunks are sent to Gemini in parallel. Batches are merged and deduplicated as they arrive,
+# so the first cards can be streamed before the whole deck is done.
 
-    course_data = result.data
+MAX_CHUNK_CHARS = 24000
+MAX_CARDS_PER_CALL = 25
+MAX_PARALLEL_CALLS = 8
 
-    # Handle "completed lessons" scope for courses only
-    if source_type == "course" and contentInput.lower() == "completed" and course_data.get('completed') is not None:
-        course_data['unit_lessons'] = course_data['unit_lessons'][:course_data['completed']]
+def split_text(text: str, max_chars: int = MAX_CHUNK_CHARS) -> List[str]:
+    """Split text into pieces of at most max_chars, preferring paragraph boundaries."""
+    if len(text) <= max_chars:
+        return [text]
+    pieces, current = [], ""
+    for paragraph in text.split("\n\n"):
+        while len(paragraph) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(paragraph[:max_chars])
+            paragraph = paragraph[max_chars:]
+        if current and len(current) + len(paragraph) + 2 > max_chars:
+            pieces.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        pieces.append(current)
+    return pieces
 
-    # Determine what content to feed into the LLM
+def build_content_chunks(course_data: dict, source_type: str) -> List[str]:
+    """Split a course (per unit) or quick learn (per section) into prompt-sized chunks."""
     if source_type == "course":
-        content = course_data.get('unit_lessons')
-        if not content:
-            raise ValueError("Course is missing 'unit_lessons' content.")
+        units = {}
+        for lesson in course_data.get('unit_lessons') or []:
+            units.setdefault(lesson.get('unit_number'), []).append(lesson_digest(lesson))
+        texts = ["\n\n".join(lessons) for lessons in units.values()]
     else:
-        # For quick-learn, fallback options
-        content = str(course_data)
+        texts = [section_digest(section) for section in course_data.get('sections') or []]
+        if not texts:
+            texts = [f"{course_data.get('title', '')}\n\n{course_data.get('description', '')}"]
+
+    chunks = []
+    for text in texts:
+        chunks.extend(split_text(text))
+    return [chunk for chunk in chunks if chunk.strip()]
+
+def allocate_card_quotas(chunk_sizes: List[int], num_cards: int) -> List[int]:
+    """
+    Split num_cards across chunks proportionally to their size (largest remainder method),
+    so the quotas always add up to exactly num_cards.
+    """
+    total = sum(chunk_sizes)
+    if total == 0 or num_cards <= 0:
+        return [0] * len(chunk_sizes)
+    exact = [num_cards * size / total for size in chunk_sizes]
+    quotas = [int(x) for x in exact]
+    remaining = num_cards - sum(quotas)
+    by_remainder = sorted(range(len(exact)), key=lambda i: exact[i] - quotas[i], reverse=True)
+    for i in by_remainder[:remaining]:
+        quotas[i] += 1
+    return quotas
 
-    # Create the prompt for the LLM
+def plan_flashcard_jobs(chunks: List[str], num_cards: int) -> List[Tuple[str, int]]:
+    """
+    (content, card_count) pairs. A chunk whose quota is more than one call may ask for is
+    split into that many pieces, with the quota shared between them, so every call
+    sees different material instead of the same text asked for twice.
+    """
+    jobs = []
+    for chunk, quota in zip(chunks, allocate_card_quotas([len(c) for c in chunks], num_cards)):
+        calls = -(-quota // MAX_CARDS_PER_CALL)
+        pieces = split_text(chunk, -(-len(chunk) // calls)) if calls > 1 else [chunk]
+        for piece, piece_quota in zip(pieces, allocate_card_quotas([len(p) for p in pieces], quota)):
+            while piece_quota > 0:
+                count = min(piece_quota, MAX_CARDS_PER_CALL)
+                jobs.append((piece, count))
+                piece_quota -= count
+    return jobs
+
+def generate_cards_for_chunk(content: str, num_cards: int, learning_goal: str) -> List[dict]:
     prompt = [
         "You are an expert flashcard generator.",
         f"Generate {num_cards} flashcards for the following content: {content}",
@@ -81,23 +132,162 @@ def generate_flashcards(source_id, source_type, contentInput, num_cards, learnin
         "Return a clean structured JSON following the provided schema without any empty fields."
     ]
 
-    # Send prompt to Gemini
-    response = client.models.generate_content(
-        model="gemini-2.0-flash",
-        contents=prompt,
-        config={
-            'response_mime_type': 'application/json',
-            'response_schema': FlashcardSet,
-        },
-    )
-
-    # Parse the JSON response
-    parsed = json.loads(response.text)
-
-    # Add additional metadata to each flashcard
-    for idx, card in enumerate(parsed['flashcards'], start=1):
-        card['id'] = idx
-        card['correct'] = 0
-        card['incorrect'] = 0
-
-    return parsed, course_data, source_type
\ No newline at end of file
+    response = generate(client, "flashcards", prompt, {
+        'response_mime_type': 'application/json',
+        'response_schema': FlashcardSet,
+    })
+
+    return json.loads(response.text).get('flashcards', [])
+
+def iter_flashcard_batches(course_data: dict, source_type: str, num_cards: int, learning_goal: str) -> Iterator[List[dict]]:
+    """Yield raw card batches in completion order, one per Gemini call."""
+    chunks = build_content_chunks(course_data, source_type)
+    if not chunks:
+        raise ValueError("Source has no content to generate flashcards from.")
+
+    jobs = plan_flashcard_jobs(chunks, int(num_cards))
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_CALLS) as executor:
+        futures = [executor.submit(generate_cards_for_chunk, chunk, count, learning_goal) for chunk, count in jobs]
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:
+                print(f"[ERROR generating flashcard batch]: {e}")
+
+class FlashcardMerger:
+    """
+    Reduce step: collects batches, drops exact and near-duplicate cards (see utils/dedup.py)
+    and assigns card ids.
+    """
+
+    def __init__(self, dedupe_threshold: float = DEFAULT_THRESHOLD):
+        self.cards = []
+        self.index = NearDuplicateIndex(dedupe_threshold)
+
+    def add(self, batch: List[dict]) -> List[dict]:
+        """Merge a batch and return the cards from it that were kept."""
+        added = []
+        for card in batch:
+            if not str(card.get('front', '')).strip():
+                continue
+            if self.index.add(card_text(card)) is not None:
+                continue
+            card['id'] = len(self.cards) + 1
+            card['correct'] = 0
+            card['incorrect'] = 0
+            self.cards.append(card)
+            added.append(card)
+        return added
+
+def load_flashcard_source(source_id, source_type, contentInput, user_id=None) -> Tuple[dict, str]:
+    """
+    Fetch the course or quick learn to build flashcards from (only the fields generation
+    needs), applying the content scope. Returns (source_data, resolved_source_type).
+    """
+    ref, course_data = fetch_source(source_id, source_type)
+
+    if not ref or (user_id and ref.owner_id != user_id):
+        raise ValueError(f"Source not found for source_id={source_id} and source_type={source_type}")
+
+    source_type = ref.source_type
+
+    # Handle "completed lessons" scope for courses only
+    if source_type == "course" and contentInput.lower() == "completed" and course_data.get('completed') is not None:
+        course_data['unit_lessons'] = course_data['unit_lessons'][:course_data['completed']]
+
+    if source_type == "course" and not course_data.get('unit_lessons'):
+        raise ValueError("Course is missing 'unit_lessons' content.")
+
+    return course_data, source_type
+
+def save_flashcard_set(user_id: str, course_data: dict, flashcards_data: dict, source_id, source_type: str):
+    """Insert a new flashcard set and return its id."""
+    now = datetime.now(timezone.utc).isoformat()
+    insert_data = {
+        "user_id": user_id,
+        "title": course_data.get('title', 'Untitled'),
+        "topic": course_data.get('topic', 'General'),
+        "flashcards": flashcards_data,
+        "sessions_completed": 0,
+        "last_test_score": 0,
+        "still_learning_count": 0,
+        "still_studying_count": 0,
+        "mastered_count": 0,
+        "source_id": source_id,
+        "source_type": source_type,
+        "created_at": now,
+        "last_accessed": now,
+    }
+    result = supabase.table('flashcard_sets').insert(insert_data).execute()
+    note_inserted("flashcard_sets", result.data)
+    return result.data[0]['id']
+
+def generate_flashcards(source_id, source_type, contentInput, num_cards, learning_goal, dedupe_threshold=DEFAULT_THRESHOLD, user_id=None):
+    course_data, source_type = load_flashcard_source(source_id, source_type, contentInput, user_id)
+
+    merger = FlashcardMerger(dedupe_threshold)
+    for batch in iter_flashcard_batches(course_data, source_type, num_cards, learning_goal):
+        merger.add(batch)
+
+    if not merger.cards:
+        raise ValueError("Flashcard generation failed for every content chunk.")
+
+    return {"flashcards": merger.cards}, course_data, source_type
+
+# --- Library listing ---
+# The flashcards page only shows titles, counters and scores, so /flashcard_sets?view=summary
+# skips the flashcards column (every card's front, back and three questions) and pages
+# through the sets newest first. Cards are loaded when a set is opened
+# (/flashcards/<source_type>/<id>). card_count is a PostgREST computed column, created
+# (with the index the pagination uses) by backend/migrations/003_flashcard_set_summaries.sql.
+
+FLASHCARD_SUMMARY_COLUMNS = (
+    "id, title, topic, description, source_id, source_type, card_count, sessions_completed, "
+    "last_test_score, still_learning_count, still_studying_count, mastered_count, created_at, last_accessed"
+)
+FLASHCARD_SETS_PAGE_SIZE = int(os.getenv("FLASHCARD_SETS_PAGE_SIZE", 50))
+FLASHCARD_SETS_PAGE_SIZE_MAX = 100
+
+def encode_cursor(row: dict) -> str:
+    raw = json.dumps([row.get("last_accessed"), str(row["id"])]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[Optional[str], str]:
+    """(last_accessed, id) of the last set on the previous page; ValueError if malformed."""
+    try:
+        last_accessed, row_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        # Both values end up in a PostgREST filter string, so only accept well-formed ones
+        row_id = str(uuid.UUID(row_id))
+        if last_accessed is not None:
+            last_accessed = datetime.fromisoformat(last_accessed).isoformat()
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return last_accessed, row_id
+
+def list_flashcard_set_summaries(user_id: str, source_type: Optional[str] = None, limit: int = FLASHCARD_SETS_PAGE_SIZE, cursor: Optional[str] = None) -> dict:
+    """
+    One page of the user's flashcard sets without their cards, most recently accessed
+    first (keyset pagination on last_accessed, id). Raises ValueError for a bad cursor.
+    """
+    limit = min(max(limit, 1), FLASHCARD_SETS_PAGE_SIZE_MAX)
+    query = supabase.table("flashcard_sets").select(FLASHCARD_SUMMARY_COLUMNS).eq("user_id", user_id)
+    if source_type:
+        query = query.eq("source_type", source_type)
+    if cursor:
+        last_accessed, row_id = decode_cursor(cursor)
+        if last_accessed is None:
+            # Sets never accessed sort last, by id
+            query = query.is_("last_accessed", "null").lt("id", row_id)
+        else:
+            query = query.or_(
+                f'last_accessed.lt."{last_accessed}",'
+                f'and(last_accessed.eq."{last_accessed}",id.lt.{row_id}),'
+                f'last_accessed.is.null'
+            )
+    rows = query.order("last_accessed", desc=True, nullsfirst=False).order("id", desc=True) \
+        .limit(limit + 1).execute().data or []
+    page = rows[:limit]
+    return {
+        "flashcard_sets": page,
+        "next_cursor": encode_cursor(page[-1]) if len(rows) > limit else None,
+    }
@@ -0,0 +1,234 @@
+import re
+from typing import Any, Iterable, List, Optional, Tuple
+import orjson
+
+'''
+Incremental JSON parsing for streamed structured generations.
+
+Gemini streams a structured response as arbitrary text fragments. IncrementalJSONParser
+is fed those fragments and returns every value at a watched path as soon as that
+value's subtree is syntactically complete, instead of waiting for the whole document.
+
+Paths are tuples of object keys and array indexes, and "*" matches any one key or
+index. For example, ("course", "units", "*") yields each unit of a syllabus, and
+("course", "title") yields the title.
+
+The parser only tracks structure (nesting, keys, string and escape state). A watched
+value is decoded by slicing its text out of the buffer and handing it to orjson, so
+the per-character work stays small. Tokens split across fragments are picked up again
+on the next feed(). Long strings are resumed where scanning stopped rather than
+rescanned from the start. The working buffer only keeps the unscanned tail and any
+watched value still open, so feeding a large document stays linear.
+'''
+
+WILDCARD = "*"
+
+Path = Tuple[Any, ...]
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# String body up to (not including) the closing quote. Stops before a trailing lone
+# backslash, so a resumed scan never starts in the middle of an escape.
+_STRING_BODY = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*', re.S)
+_NUMBER = re.compile(r"-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?")
+_NUMBER_CHARS = re.compile(r"[-+0-9.eE]+")
+_LITERALS = {"t": "true", "f": "false", "n": "null"}
+
+# What the parser expects next inside a container
+_VALUE, _VALUE_OR_END, _KEY, _KEY_OR_END, _COLON, _COMMA_OR_END, _DONE = range(7)
+
+class IncrementalJSONError(ValueError):
+    pass
+
+class _Frame:
+    __slots__ = ("is_object", "path", "start", "watched", "key", "index", "state")
+
+    def __init__(self, is_object: bool, path: Path, start: int, watched: bool):
+        self.is_object = is_object
+        self.path = path
+        self.start = start
+        self.watched = watched
+        self.key = None
+        self.index = 0
+        self.state = _KEY_OR_END if is_object else _VALUE_OR_END
+
+    def child_path(self) -> Path:
+        return self.path + ((self.key,) if self.is_object else (self.index,))
+
+class IncrementalJSONParser:
+    def __init__(self, watch: Iterable[Path]):
+        self._watch = [tuple(pattern) for pattern in watch]
+        self._watch_lengths = {len(pattern) for pattern in self._watch}
+        self._chunks: List[str] = []
+        self._buf = ""  # working buffer; starts at absolute offset self._offset
+        self._offset = 0
+        self._pos = 0
+        self._stack: List[_Frame] = []
+        self._root_state = _VALUE
+        self._string_resume: Optional[int] = None
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far."""
+        return "".join(self._chunks)
+
+    @property
+    def complete(self) -> bool:
+        return self._root_state == _DONE
+
+    def _watched(self, path: Path) -> bool:
+        if len(path) not in self._watch_lengths:
+            return False
+        return any(
+            len(pattern) == len(path) and all(p == WILDCARD or p == part for p, part in zip(pattern, path))
+            for pattern in self._watch
+        )
+
+    def _scan_string(self, pos: int) -> int:
+        """End offset of the string token starting at pos, or -1 if it isn't complete yet."""
+        start = self._string_resume if self._string_resume is not None else pos + 1
+        end = _STRING_BODY.match(self._buf, start).end()
+        if end < len(self._buf) and self._buf[end] == '"':
+            self._string_resume = None
+            return end + 1
+        self._string_resume = end
+        return -1
+
+    def _error(self, message: str, pos: int) -> IncrementalJSONError:
+        snippet = self._buf[max(0, pos - 20):pos + 20]
+        return IncrementalJSONError(f"{message} at offset {self._offset + pos}: {snippet!r}")
+
+    def feed(self, chunk: str) -> List[Tuple[Path, Any]]:
+        """Add a fragment; returns (path, value) for each watched value it completed."""
+        self._chunks.append(chunk)
+        self._buf += chunk
+        events = []
+        buf = self._buf
+        n = len(buf)
+        pos = self._pos
+
+        while True:
+            pos = _WHITESPACE.match(buf, pos).end()
+            if pos >= n:
+                break
+            ch = buf[pos]
+            frame = self._stack[-1] if self._stack else None
+            state = frame.state if frame else self._root_state
+
+            if state == _DONE:
+                raise self._error("Unexpected data after the document", pos)
+
+            if state == _COLON:
+                if ch != ":":
+                    raise self._error("Expected ':'", pos)
+                frame.state = _VALUE
+                pos += 1
+                continue
+
+            if state == _COMMA_OR_END:
+                if ch == ",":
+                    if frame.is_object:
+                        frame.state = _KEY
+                    else:
+                        frame.index += 1
+                        frame.state = _VALUE
+                    pos += 1
+                    continue
+                if ch != ("}" if frame.is_object else "]"):
+                    raise self._error("Expected ',' or the end of the container", pos)
+                pos = self._close_container(pos + 1, events)
+                continue
+
+            if state in (_KEY, _KEY_OR_END):
+                if ch == "}" and state == _KEY_OR_END:
+                    pos = self._close_container(pos + 1, events)
+                    continue
+                if ch != '"':
+                    raise self._error("Expected an object key", pos)
+                end = self._scan_string(pos)
+                if end < 0:
+                    break
+                raw = buf[pos + 1:end - 1]
+                frame.key = orjson.loads(buf[pos:end]) if "\\" in raw else raw
+                frame.state = _COLON
+                pos = end
+                continue
+
+            # A value (or the end of an empty array)
+            if ch == "]" and state == _VALUE_OR_END:
+                pos = self._close_container(pos + 1, events)
+                continue
+
+            path = frame.child_path() if frame else ()
+            if ch == "{" or ch == "[":
+                self._stack.append(_Frame(ch == "{", path, pos, self._watched(path)))
+                pos += 1
+                continue
+
+            if ch == '"':
+                end = self._scan_string(pos)
+                if end < 0:
+                    break
+            elif ch in _LITERALS:
+                literal = _LITERALS[ch]
+                if buf.startswith(literal, pos):
+                    end = pos + len(literal)
+                elif literal.startswith(buf[pos:]):
+                    break
+                else:
+                    raise self._error("Invalid literal", pos)
+            else:
+                match = _NUMBER_CHARS.match(buf, pos)
+                if not match:
+                    raise self._error("Unexpected character", pos)
+                end = match.end()
+                if end == n:
+                    break  # more digits may follow
+                if not _NUMBER.fullmatch(buf, pos, end):
+                    raise self._error("Invalid number", pos)
+            self._value_done(path, pos, end, events)
+            pos = end
+
+        self._pos = pos
+        self._compact()
+        return events
+
+    def _compact(self) -> None:
+        """Drop the scanned prefix that no open watched value still needs."""
+        cut = self._pos
+        for frame in self._stack:
+            if frame.watched:
+                cut = min(cut, frame.start)
+                break
+        if cut < 4096:
+            return
+        self._buf = self._buf[cut:]
+        self._offset += cut
+        self._pos -= cut
+        for frame in self._stack:
+            frame.start -= cut
+        if self._string_resume is not None:
+            self._string_resume -= cut
+
+    def _close_container(self, end: int, events: list) -> int:
+        frame = self._stack.pop()
+        self._value_done(frame.path, frame.start, end, events, frame.watched)
+        return end
+
+    def _value_done(self, path: Path, start: int, end: int, events: list, watched: Optional[bool] = None) -> None:
+        if watched if watched is not None else self._watched(path):
+            events.append((path, orjson.loads(self._buf[start:end])))
+        if self._stack:
+            self._stack[-1].state = _COMMA_OR_END
+        else:
+            self._root_state = _DONE
+
+    def close(self) -> Any:
+        """Finish the stream and return the whole document, raising if it is incomplete."""
+        if not self.complete:
+            # A bare top-level number is only known to be finished at the end of input
+            tail = self._buf[self._pos:].strip()
+            if not self._stack and tail and _NUMBER.fullmatch(tail):
+                self._root_state = _DONE
+            else:
+                raise self._error("Incomplete JSON document", len(self._buf))
+        return orjson.loads("".join(self._chunks))
@@ -0,0 +1,137 @@
+import copy
+from typing import Any, List, Tuple
+
+'''
+RFC 6902 JSON Patch (add, remove, replace, move, copy, test) over plain dicts and lists,
+with RFC 6901 JSON Pointers ("/unit_lessons/3/status", "~0" for "~", "~1" for "/").
+
+apply_patch works on a deep copy and returns it, so a patch that fails halfway leaves
+the caller's document untouched (patches are atomic). Malformed operations and paths
+that don't resolve raise JSONPatchError; a failed "test" raises JSONPatchTestFailed.
+'''
+
+OPERATIONS = ("add", "remove", "replace", "move", "copy", "test")
+
+class JSONPatchError(ValueError):
+    pass
+
+class JSONPatchTestFailed(JSONPatchError):
+    pass
+
+def parse_pointer(pointer: Any) -> List[str]:
+    """Reference tokens of a JSON Pointer ("" is the whole document)."""
+    if not isinstance(pointer, str):
+        raise JSONPatchError(f"Invalid JSON pointer: {pointer!r}")
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise JSONPatchError(f"JSON pointer must start with '/': {pointer!r}")
+    return [token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")]
+
+def _index(container: list, token: str, pointer: str, allow_end: bool = False) -> int:
+    if allow_end and token == "-":
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token[0] == "0"):
+        raise JSONPatchError(f"Invalid array index {token!r} in {pointer!r}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise JSONPatchError(f"Array index {index} out of range in {pointer!r}")
+    return index
+
+def _resolve(doc: Any, tokens: List[str], pointer: str) -> Any:
+    for token in tokens:
+        if isinstance(doc, dict):
+            if token not in doc:
+                raise JSONPatchError(f"Path not found: {pointer!r}")
+            doc = doc[token]
+        elif isinstance(doc, list):
+            doc = doc[_index(doc, token, pointer)]
+        else:
+            raise JSONPatchError(f"Path not found: {pointer!r}")
+    return doc
+
+def _parent(doc: Any, pointer: str) -> Tuple[Any, str]:
+    tokens = parse_pointer(pointer)
+    if not tokens:
+        raise JSONPatchError("Operations on the whole document are not supported")
+    return _resolve(doc, tokens[:-1], pointer), tokens[-1]
+
+def _add(doc: Any, pointer: str, value: Any) -> None:
+    parent, token = _parent(doc, pointer)
+    if isinstance(parent, dict):
+        parent[token] = value
+    elif isinstance(parent, list):
+        parent.insert(_index(parent, token, pointer, allow_end=True), value)
+    else:
+        raise JSONPatchError(f"Path not found: {pointer!r}")
+
+def _remove(doc: Any, pointer: str) -> Any:
+    parent, token = _parent(doc, pointer)
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise JSONPatchError(f"Path not found: {pointer!r}")
+        return parent.pop(token)
+    if isinstance(parent, list):
+        return parent.pop(_index(parent, token, pointer))
+    raise JSONPatchError(f"Path not found: {pointer!r}")
+
+def _operation_fields(operation: Any) -> Tuple[str, str]:
+    if not isinstance(operation, dict):
+        raise JSONPatchError(f"Patch operation must be an object: {operation!r}")
+    op = operation.get("op")
+    if op not in OPERATIONS:
+        raise JSONPatchError(f"Unknown patch operation: {op!r}")
+    if "path" not in operation:
+        raise JSONPatchError(f"'{op}' operation is missing 'path'")
+    if op in ("add", "replace", "test") and "value" not in operation:
+        raise JSONPatchError(f"'{op}' operation is missing 'value'")
+    if op in ("move", "copy") and "from" not in operation:
+        raise JSONPatchError(f"'{op}' operation is missing 'from'")
+    return op, operation["path"]
+
+def validate_patch(operations: Any) -> List[dict]:
+    """Check the shape of a patch document (not whether its paths exist)."""
+    if not isinstance(operations, list):
+        raise JSONPatchError("A JSON Patch must be an array of operations")
+    for operation in operations:
+        op, path = _operation_fields(operation)
+        parse_pointer(path)
+        if op in ("move", "copy"):
+            parse_pointer(operation["from"])
+    return operations
+
+def apply_patch(doc: Any, operations: List[dict]) -> Any:
+    """Apply a JSON Patch to a copy of doc and return the patched copy."""
+    doc = copy.deepcopy(doc)
+    for operation in validate_patch(operations):
+        op, path = _operation_fields(operation)
+        if op == "add":
+            _add(doc, path, copy.deepcopy(operation["value"]))
+        elif op == "remove":
+            _remove(doc, path)
+        elif op == "replace":
+            _remove(doc, path)
+            _add(doc, path, copy.deepcopy(operation["value"]))
+        elif op == "move":
+            source = operation["from"]
+            if path != source and path.startswith(source + "/"):
+                raise JSONPatchError(f"Cannot move {source!r} into its own child {path!r}")
+            _add(doc, path, _remove(doc, source))
+        elif op == "copy":
+            source = operation["from"]
+            _add(doc, path, copy.deepcopy(_resolve(doc, parse_pointer(source), source)))
+        else:  # test
+            actual = _resolve(doc, parse_pointer(path), path)
+            if not _equal(actual, operation["value"]):
+                raise JSONPatchTestFailed(f"Test failed at {path!r}")
+    return doc
+
+def _equal(a: Any, b: Any) -> bool:
+    # JSON equality: 1 == 1.0, but true != 1
+    if isinstance(a, bool) or isinstance(b, bool):
+        return type(a) is type(b) and a == b
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_equal(a[k], b[k]) for k in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(_equal(x, y) for x, y in zip(a, b))
+    return a == b
@@ -0,0 +1,113 @@
+import dataclasses
+import datetime
+import decimal
+import enum
+import uuid
+import orjson
+from flask.json.provider import JSONProvider
+from typing import Any
+
+'''
+Fast JSON encoding for API responses and database payloads, backed by orjson.
+
+orjson natively serializes dicts, lists, str/int/float/bool/None, datetime/date/time,
+UUID, enums and dataclasses in C. Anything else (Pydantic models, supabase/postgrest
+objects, sets, Decimals) goes through `_default`, which orjson calls only for the
+nodes it can't handle itself, so plain documents are encoded in a single native pass.
+'''
+
+def _default(obj: Any) -> Any:
+    # Pydantic models (e.g. Resource inside quick learn sections)
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if isinstance(obj, (dict, list)):
+        # Subclasses of the JSON containers
+        return dict(obj) if isinstance(obj, dict) else list(obj)
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    # Fall back to the same probes make_json_serializable used
+    if callable(getattr(obj, "dict", None)):
+        return obj.dict()
+    if callable(getattr(obj, "to_dict", None)):
+        return obj.to_dict()
+    if hasattr(obj, "__dict__"):
+        return vars(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps_bytes(obj: Any, sort_keys: bool = False, indent: bool = False) -> bytes:
+    """Serialize obj to UTF-8 JSON bytes."""
+    option = orjson.OPT_NON_STR_KEYS
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    return orjson.dumps(obj, default=_default, option=option)
+
+_JSON_SCALARS = (str, int, float, bool, type(None))
+
+def to_json_compatible(obj: Any) -> Any:
+    """
+    Return obj made only of JSON types (dict/list/str/number/bool/None), for payloads
+    handed to the supabase client. Replaces the old make_json_serializable walk:
+    dispatch is on exact type, so plain values cost one check and no attribute probes,
+    and a dict or list is only copied if something inside it actually had to change.
+    The input is never mutated.
+    """
+    t = type(obj)
+    if t in _JSON_SCALARS:
+        return obj
+    if t is dict:
+        out = None
+        for key, value in obj.items():
+            converted = to_json_compatible(value)
+            if converted is not value:
+                if out is None:
+                    out = dict(obj)
+                out[key] = converted
+        return obj if out is None else out
+    if t is list:
+        out = None
+        for i, value in enumerate(obj):
+            converted = to_json_compatible(value)
+            if converted is not value:
+                if out is None:
+                    out = list(obj)
+                out[i] = converted
+        return obj if out is None else out
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, enum.Enum):
+        return to_json_compatible(obj.value)
+    if isinstance(obj, _JSON_SCALARS):
+        return obj
+    return to_json_compatible(_default(obj))
+
+class OrjsonProvider(JSONProvider):
+    """
+    Flask JSON provider using orjson. Install with `app.json = OrjsonProvider(app)`;
+    jsonify() and request.get_json() then go through orjson.
+    """
+    sort_keys = False
+    compact = None
+    mimetype = "application/json"
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return dumps_bytes(obj, sort_keys=kwargs.get("sort_keys", self.sort_keys), indent=bool(kwargs.get("indent"))).decode()
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        # Hand the encoded bytes straight to the response, skipping the str round-trip
+        return self._app.response_class(
+            dumps_bytes(obj, sort_keys=self.sort_keys, indent=indent),
+            mimetype=self.mimetype,
+        )
@@ -0,0 +1,167 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from utils.token_verification import supabase, verify_token_and_get_user_id
+from utils.course_generation import Lesson, build_course_document, generate_lesson, parse_syllabus, take_speculative, adopt_speculative
+from utils.course_updating import PENDING, is_pending_lesson, load_course_lessons, replace_course_lessons
+from utils.row_cache import cached_row
+from utils.progress import apply_progress
+from utils.singleflight import singleflight, flight_key
+
+'''
+Lazy courses: POST /generate_course?lazy=1 saves the outline right away, with every
+lesson in unit_lessons as a placeholder marked "generation": "pending". A lesson's content
+is generated the first time it is opened (GET /course_lesson/<course_id>/<unit>/<index>)
+and written back into its slot. The next LAZY_PREFETCH pending lessons are then
+generated in the background, so moving on through the course doesn't wait. The
+first lessons are prefetched as soon as the course is saved.
+
+Concurrent opens and prefetches of the same lesson share one Gemini call
+(singleflight). The write back (replace_course_lessons) only replaces the slot if it is
+still the same pending lesson, so lessons generated at the same time don't overwrite
+each other.
+
+A placeholder's "status" is the learner's progress like any other lesson's, so marking
+a lesson done before it has been generated doesn't stop it from being generated. The
+generated lesson keeps that status and has no "generation" key.
+'''
+
+LAZY_PREFETCH = int(os.getenv("LAZY_PREFETCH", 2))
+LAZY_PREFETCH_WORKERS = int(os.getenv("LAZY_PREFETCH_WORKERS", 4))
+
+_prefetch_pool = ThreadPoolExecutor(max_workers=LAZY_PREFETCH_WORKERS, thread_name_prefix="lazy-lesson")
+
+def pending_lesson(lesson, unit_number: int) -> dict:
+    """unit_lessons placeholder for a lesson that hasn't been generated yet."""
+    return {
+        "unit_number": unit_number,
+        "lesson": lesson.lesson,
+        "lesson_summary": lesson.lesson_summary,
+        "learning_objectives": list(lesson.learning_objectives),
+        "readings": "",
+        "examples": "",
+        "exercises": "",
+        "assessments": None,
+        "additional_resources": [],
+        "duration_in_min": "",
+        "status": "not started",
+        "generation": PENDING,
+    }
+
+def build_lazy_course(syllabus_json, speculative: Optional[dict] = None) -> dict:
+    """
+    The course document for a syllabus with every lesson pending. Speculative lessons
+    (utils/speculation.py) that have already finished fill their slots.
+    """
+    course_from_syllabus = parse_syllabus(syllabus_json).course
+    outline = [
+        (lesson, f"UNIT {unit.unit_number}: {unit.title}", unit.unit_number)
+        for unit in course_from_syllabus.units
+        for lesson in unit.lesson_outline
+    ]
+    speculative = speculative or {}
+    for future in speculative.values():
+        future.cancel()  # only lessons that are already finished are worth keeping
+    finished = {key: future for key, future in speculative.items() if future.done() and not future.cancelled()}
+    reused = take_speculative(finished, [lesson for lesson, _, _ in outline])
+    lessons = []
+    for (lesson, unit_title, unit_number), future in zip(outline, reused):
+        done = None
+        if future is not None and not future.exception():
+            done = adopt_speculative(future.result(), unit_title, unit_number)
+        lessons.append(done or pending_lesson(lesson, unit_number))
+
+    document = build_course_document(course_from_syllabus, [])
+    document["unit_lessons"] = lessons
+    return {"course": document}
+
+def unit_title_for(course: dict, unit_number: int) -> str:
+    for unit in course.get("units") or []:
+        if unit.get("unit_number") == unit_number:
+            return f"UNIT {unit_number}: {unit.get('title', '')}"
+    return f"UNIT {unit_number}"
+
+def outline_of(lesson: dict) -> Lesson:
+    """The outline entry a stored lesson was (or will be) generated from."""
+    return Lesson(
+        lesson=lesson.get("lesson", ""),
+        lesson_summary=lesson.get("lesson_summary", ""),
+        learning_objectives=lesson.get("learning_objectives") or [],
+    )
+
+def fill_lesson(user_id: str, course_id: str, position: int) -> dict:
+    """Generate the pending lesson at unit_lessons[position] and store it; returns the lesson."""
+    def run():
+        course = load_course_lessons(user_id, course_id)
+        if not course or position >= len(course.get("unit_lessons") or []):
+            raise LookupError("Lesson not found")
+        placeholder = course["unit_lessons"][position]
+        if not is_pending_lesson(placeholder):
+            return placeholder
+
+        unit_number = placeholder.get("unit_number")
+        generated = generate_lesson(outline_of(placeholder), unit_title_for(course, unit_number), unit_number)
+        if "error" in generated:
+            raise ValueError(generated["error"])
+        if placeholder.get("status"):
+            generated["status"] = placeholder["status"]
+
+        stored = replace_course_lessons(user_id, course_id, {position: (placeholder.get("lesson"), generated)}, only_pending=True)
+        return stored.get(position, generated)
+
+    return singleflight.do(flight_key("lazy_lesson", course_id, position), run)
+
+def _fill_quietly(user_id: str, course_id: str, position: int) -> None:
+    try:
+        fill_lesson(user_id, course_id, position)
+    except Exception as e:
+        print(f"[lazy lessons] Prefetch of lesson {position} in course {course_id} failed: {e}")
+
+def prefetch_lessons(user_id: str, course_id: str, lessons: List[dict], after: int = -1, count: int = LAZY_PREFETCH) -> None:
+    """Queue generation of the next `count` pending lessons after position `after`."""
+    queued = 0
+    for position in range(after + 1, len(lessons)):
+        if queued >= count:
+            break
+        if is_pending_lesson(lessons[position]):
+            _prefetch_pool.submit(_fill_quietly, user_id, course_id, position)
+            queued += 1
+
+def prefetch_new_course(save_response) -> None:
+    """Start on the first lessons of a course save_course_draft just inserted."""
+    if isinstance(save_response, list) and save_response:
+        row = save_response[0]
+        prefetch_lessons(row["user_id"], row["id"], row.get("unit_lessons") or [])
+
+def get_course_lesson(token: str, course_id: str, unit_number: int, lesson_index: int):
+    """
+    Lesson `lesson_index` of unit `unit_number` (the frontend's /lesson/<unit>/<index>),
+    generated first if it is still pending. Prefetches the lessons that follow it.
+    """
+    user_id = verify_token_and_get_user_id(token)
+    if not user_id:
+        return {"error": "Invalid token or user not authenticated"}, 401
+
+    try:
+        def load():
+            result = supabase.table("courses").select("*").eq("user_id", user_id).eq("id", course_id).limit(1).execute()
+            return result.data[0] if result.data else None
+
+        course = cached_row("courses", user_id, course_id, load)
+        if not course:
+            return {"error": "Course not found"}, 404
+
+        lessons = course.get("unit_lessons") or []
+        positions = [i for i, lesson in enumerate(lessons) if lesson.get("unit_number") == unit_number]
+        if not 0 <= lesson_index < len(positions):
+            return {"error": "Lesson not found"}, 404
+        position = positions[lesson_index]
+
+        if is_pending_lesson(lessons[position]):
+            lessons[position] = fill_lesson(user_id, course_id, position)
+        apply_progress(user_id, "course", course)
+        prefetch_lessons(user_id, course_id, lessons, after=position)
+        return lessons[position]
+    except Exception as e:
+        print(f"[ERROR] Failed to open lesson: {e}")
+        return {"error": str(e)}, 500
@@ -0,0 +1,92 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from utils.token_verification import verify_token_and_get_user_id
+from utils.course_generation import generate_lesson
+from utils.course_updating import load_course_lessons, replace_course_lessons
+from utils.lazy_lessons import outline_of, unit_title_for
+from utils.singleflight import singleflight, flight_key
+
+'''
+Regenerate one lesson, or every lesson of one unit, of a saved course in place.
+
+Only the targeted unit_lessons slots are generated again (generate_lesson, the same
+per-lesson call a full course generation makes) and only those slots are written
+back. The rest of the course, including its other lessons, is left untouched, so the
+cost and latency grow with the size of the edit, not the size of the course.
+
+A regenerated lesson keeps the progress status of the lesson it replaces. Lessons
+whose generation fails keep their old content and are listed under "failed". A slot
+whose lesson was renamed while it was being regenerated is not overwritten.
+Regenerating a lesson that is already being regenerated joins that call.
+'''
+
+REGENERATE_WORKERS = int(os.getenv("REGENERATE_WORKERS", 8))
+
+def _regenerate(user_id: str, course: dict, position: int) -> dict:
+    current = course["unit_lessons"][position]
+    unit_number = current.get("unit_number")
+
+    def run():
+        generated = generate_lesson(outline_of(current), unit_title_for(course, unit_number), unit_number)
+        if "error" in generated:
+            raise ValueError(generated["error"])
+        if current.get("status"):
+            generated["status"] = current["status"]
+        return generated
+
+    return singleflight.do(flight_key("regenerate_lesson", course["id"], position, current.get("lesson")), run)
+
+def regenerate_lessons(token: str, course_id: str, unit_number: int, lesson_index: Optional[int] = None):
+    """
+    Regenerate lesson `lesson_index` of unit `unit_number`, or the whole unit when
+    lesson_index is None. Returns the stored lessons and any that failed.
+    """
+    user_id = verify_token_and_get_user_id(token)
+    if not user_id:
+        return {"error": "Invalid token or user not authenticated"}, 401
+
+    try:
+        course = load_course_lessons(user_id, course_id)
+        if not course:
+            return {"error": "Course not found"}, 404
+
+        lessons = course.get("unit_lessons") or []
+        positions = [i for i, lesson in enumerate(lessons) if lesson.get("unit_number") == unit_number]
+        if lesson_index is not None:
+            if not 0 <= lesson_index < len(positions):
+                return {"error": "Lesson not found"}, 404
+            targets = [(lesson_index, positions[lesson_index])]
+        else:
+            if not positions:
+                return {"error": "Unit not found"}, 404
+            targets = list(enumerate(positions))
+
+        print(f"Regenerating {len(targets)} lesson(s) of unit {unit_number} in course {course_id}")
+        with ThreadPoolExecutor(max_workers=min(REGENERATE_WORKERS, len(targets))) as executor:
+            futures = [(index, position, executor.submit(_regenerate, user_id, course, position)) for index, position in targets]
+
+        replacements, failed = {}, []
+        for index, position, future in futures:
+            if future.exception():
+                print(f"[ERROR] Failed to regenerate lesson {index} of unit {unit_number}: {future.exception()}")
+                failed.append({"lesson_index": index, "lesson": lessons[position].get("lesson"), "error": str(future.exception())})
+            else:
+                replacements[position] = (lessons[position].get("lesson"), future.result())
+
+        if not replacements:
+            return {"error": "Failed to regenerate lessons", "failed": failed}, 502
+
+        stored = replace_course_lessons(user_id, course_id, replacements)
+        return {
+            "course_id": course_id,
+            "unit_number": unit_number,
+            "lessons": [
+                {"lesson_index": index, "lesson": stored[position]}
+                for index, position, _ in futures if position in stored
+            ],
+            "failed": failed,
+        }
+    except Exception as e:
+        print(f"[ERROR] Failed to regenerate lessons: {e}")
+        return {"error": str(e)}, 500
@@ -0,0 +1,218 @@
+import io
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, IO, Iterable, Iterator, List, Optional
+import orjson
+from utils.token_verification import supabase
+from utils.json_provider import dumps_bytes
+from utils.search_index import note_inserted
+
+'''
+Streaming NDJSON export / import of a user's learning library.
+
+An export is one JSON object per line:
+
+    {"type": "header", "format": "luminous-library", "version": 1, "exported_at": ...}
+    {"type": "course", "data": {...}}            one per course
+    {"type": "quick_learn", "data": {...}}       one per quick learn
+    {"type": "flashcard_set", "data": {...}}     one per flashcard set
+    {"type": "progress", "data": {...}}          one per lesson_progress row
+    {"type": "end", "counts": {...}}
+
+Rows are read a page at a time (keyset pagination on id) and serialized as they
+arrive, so an export only ever holds one page in memory. Import reads the stream
+line by line and inserts rows in batches of IMPORT_BATCH_SIZE. Imported rows get new
+ids; flashcard sets and progress rows that point at an exported course / quick learn
+are re-pointed at its new id. That id map is the only state import keeps, and it holds
+ids, not content.
+
+With zstd (the optional `zstandard` package) the same stream is compressed on the
+fly, chunk by chunk, for ".ndjson.zst" backups.
+'''
+
+LIBRARY_FORMAT = "luminous-library"
+LIBRARY_FORMAT_VERSION = 1
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", 25))
+PROGRESS_PAGE_SIZE = 1000
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 50))
+IMPORT_BATCH_BYTES = 4 * 1024 * 1024
+IMPORT_MAX_ERRORS = 20
+
+# (line type, table) in export order: sources before the rows that refer to them
+EXPORT_TABLES = (
+    ("course", "courses"),
+    ("quick_learn", "quick_learns"),
+    ("flashcard_set", "flashcard_sets"),
+    ("progress", "lesson_progress"),
+)
+TABLE_FOR_TYPE = dict(EXPORT_TABLES)
+
+# Columns that belong to the account or the database, not the content
+_DROPPED_COLUMNS = ("user_id", "version")
+
+class LibraryFormatError(ValueError):
+    pass
+
+def zstd_module():
+    """The zstandard module, or LibraryFormatError if it isn't installed."""
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        raise LibraryFormatError("zstd compression needs the 'zstandard' package")
+
+def iter_rows(table: str, user_id: str, page_size: int = EXPORT_PAGE_SIZE) -> Iterator[dict]:
+    """All of the user's rows in a table, fetched page by page."""
+    if table == "lesson_progress":
+        # No single-column key to page on, but the rows are tiny: offset pages
+        offset = 0
+        while True:
+            rows = supabase.table(table).select("*").eq("user_id", user_id) \
+                .order("source_id").order("lesson").range(offset, offset + PROGRESS_PAGE_SIZE - 1).execute().data or []
+            yield from rows
+            if len(rows) < PROGRESS_PAGE_SIZE:
+                return
+            offset += PROGRESS_PAGE_SIZE
+
+    last_id = None
+    while True:
+        query = supabase.table(table).select("*").eq("user_id", user_id)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        rows = query.order("id").limit(page_size).execute().data or []
+        yield from rows
+        if len(rows) < page_size:
+            return
+        last_id = rows[-1]["id"]
+
+def export_lines(user_id: str) -> Iterator[bytes]:
+    """The user's library as NDJSON lines."""
+    yield dumps_bytes({
+        "type": "header",
+        "format": LIBRARY_FORMAT,
+        "version": LIBRARY_FORMAT_VERSION,
+        "exported_at": datetime.now(timezone.utc).isoformat(),
+    }) + b"\n"
+    counts = {}
+    for line_type, table in EXPORT_TABLES:
+        counts[line_type] = 0
+        for row in iter_rows(table, user_id):
+            data = {k: v for k, v in row.items() if k not in _DROPPED_COLUMNS}
+            yield dumps_bytes({"type": line_type, "data": data}) + b"\n"
+            counts[line_type] += 1
+    yield dumps_bytes({"type": "end", "counts": counts}) + b"\n"
+
+def zstd_compress(chunks: Iterable[bytes], level: int = 3) -> Iterator[bytes]:
+    """Compress a byte stream into a single zstd frame, chunk by chunk."""
+    compressor = zstd_module().ZstdCompressor(level=level).compressobj()
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+def open_lines(stream: IO[bytes], compression: Optional[str] = None) -> Iterator[bytes]:
+    """Lines of an (optionally zstd compressed) NDJSON byte stream."""
+    if compression == "zstd":
+        reader = zstd_module().ZstdDecompressor().stream_reader(stream, read_across_frames=True)
+        stream = io.BufferedReader(reader, buffer_size=256 * 1024)
+    for line in stream:
+        if line.strip():
+            yield line
+
+class LibraryImporter:
+    """Batched inserts of exported rows into a user's account."""
+
+    def __init__(self, user_id: str, batch_size: int = IMPORT_BATCH_SIZE):
+        self.user_id = user_id
+        self.batch_size = batch_size
+        self.id_map: Dict[str, str] = {}
+        self.counts = {line_type: 0 for line_type, _ in EXPORT_TABLES}
+        self.skipped = 0
+        self.errors: List[str] = []
+        self._batch_type: Optional[str] = None
+        self._batch: List[dict] = []
+        self._old_ids: List[Any] = []
+        self._batch_bytes = 0
+
+    def reject(self, message: str) -> None:
+        self.skipped += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append(message)
+
+    def add(self, line_type: str, data: Any, size: int = 0) -> None:
+        if line_type not in TABLE_FOR_TYPE or not isinstance(data, dict):
+            self.reject(f"Unsupported line of type {line_type!r}")
+            return
+        if line_type != self._batch_type:
+            # Sources must be stored (and their new ids known) before what refers to them
+            self.flush()
+            self._batch_type = line_type
+        row = {k: v for k, v in data.items() if k not in _DROPPED_COLUMNS and k != "id"}
+        row["user_id"] = self.user_id
+        if line_type in ("flashcard_set", "progress") and row.get("source_id") is not None:
+            old_source = str(row["source_id"])
+            if line_type == "progress" and old_source not in self.id_map:
+                self.reject(f"Progress for unknown source {old_source}")
+                return
+            row["source_id"] = self.id_map.get(old_source, row["source_id"])
+        self._batch.append(row)
+        self._old_ids.append(data.get("id"))
+        self._batch_bytes += size
+        if len(self._batch) >= self.batch_size or self._batch_bytes >= IMPORT_BATCH_BYTES:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._batch:
+            return
+        line_type, table = self._batch_type, TABLE_FOR_TYPE[self._batch_type]
+        batch, old_ids = self._batch, self._old_ids
+        self._batch, self._old_ids, self._batch_bytes = [], [], 0
+        try:
+            if line_type == "progress":
+                result = supabase.table(table).upsert(batch, on_conflict="user_id,source_id,lesson").execute()
+            else:
+                result = supabase.table(table).insert(batch).execute()
+        except Exception as e:
+            print(f"[import] Inserting {len(batch)} {table} rows failed: {e}")
+            for _ in batch:
+                self.reject(f"{line_type}: {e}")
+            return
+        inserted = result.data or []
+        self.counts[line_type] += len(batch)
+        if line_type != "progress":
+            # PostgREST returns inserted rows in request order
+            for old_id, row in zip(old_ids, inserted):
+                if old_id is not None and row.get("id") is not None:
+                    self.id_map[str(old_id)] = str(row["id"])
+            note_inserted(table, inserted)
+
+    def summary(self) -> dict:
+        return {"imported": self.counts, "skipped": self.skipped, "errors": self.errors}
+
+def import_lines(user_id: str, lines: Iterable[bytes]) -> dict:
+    """Import an exported library into user_id's account; returns counts and errors."""
+    importer = LibraryImporter(user_id)
+    header_seen = False
+    for number, line in enumerate(lines, 1):
+        try:
+            record = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            importer.reject(f"Line {number}: invalid JSON")
+            continue
+        if not isinstance(record, dict):
+            importer.reject(f"Line {number}: expected an object")
+            continue
+        line_type = record.get("type")
+        if line_type == "header":
+            if record.get("format") != LIBRARY_FORMAT or record.get("version", 0) > LIBRARY_FORMAT_VERSION:
+                raise LibraryFormatError(f"Not a {LIBRARY_FORMAT} v{LIBRARY_FORMAT_VERSION} export")
+            header_seen = True
+            continue
+        if not header_seen:
+            raise LibraryFormatError("The export must start with its header line")
+        if line_type == "end":
+            continue
+        importer.add(line_type, record.get("data"), len(line))
+    importer.flush()
+    return importer.summary()
@@ -0,0 +1,271 @@
+import asyncio
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Dict, NamedTuple, Optional
+from utils.usage import record_usage
+
+'''
+Per-stage Gemini model routing.
+
+Every generation call names its stage ("syllabus", "lesson", "flashcards", ...) and goes
+through generate() / generate_async() / generate_stream(). The router picks that stage's
+model and max_output_tokens from ROUTES.
+
+A stage with a fallback model also has a latency budget (slo_seconds). If the primary
+call hasn't answered within it, the same request is sent to the fallback model and
+whichever answers first wins. The loser is cancelled where possible (async). Sync
+calls can't be interrupted, so the loser finishes in the background and its result
+is dropped. A primary that fails outright also goes straight to the fallback.
+
+Override routes with MODEL_ROUTES, a JSON object of per-stage fields, e.g.
+    MODEL_ROUTES='{"lesson": {"model": "gemini-2.5-flash", "slo_seconds": 45}}'
+
+Every call's decision and outcome (stage, model, hedged or not, latency, tokens, error)
+is added to routing_stats, which prints a per-stage/model summary every
+ROUTING_STATS_EVERY calls. When MODEL_ROUTING_LOG names a file, each call is also
+appended to it as a JSON line for offline cost/latency tuning.
+'''
+
+class StageRoute(NamedTuple):
+    model: str
+    max_output_tokens: int
+    slo_seconds: Optional[float] = None
+    fallback_model: Optional[str] = None
+
+PRIMARY_MODEL = "gemini-2.0-flash"
+LIGHT_MODEL = "gemini-2.0-flash-lite"
+
+DEFAULT_ROUTES: Dict[str, StageRoute] = {
+    # Outlines and objectives are short and structured: the light (and fastest) model is enough
+    "syllabus": StageRoute(LIGHT_MODEL, 8192),
+    "lesson_objectives": StageRoute(LIGHT_MODEL, 512),
+    "quick_learn_outline": StageRoute(LIGHT_MODEL, 2048),
+    # Readings, examples and assessments get the stronger model
+    "lesson": StageRoute(PRIMARY_MODEL, 8192, 60, LIGHT_MODEL),
+    "quick_learn_section": StageRoute(PRIMARY_MODEL, 4096, 30, LIGHT_MODEL),
+    "quick_learn_assessment": StageRoute(PRIMARY_MODEL, 4096, 30, LIGHT_MODEL),
+    "flashcards": StageRoute(PRIMARY_MODEL, 4096, 30, LIGHT_MODEL),
+    "final_exam": StageRoute(PRIMARY_MODEL, 8192),
+}
+
+def load_routes() -> Dict[str, StageRoute]:
+    routes = dict(DEFAULT_ROUTES)
+    overrides = os.getenv("MODEL_ROUTES")
+    if not overrides:
+        return routes
+    try:
+        for stage, fields in json.loads(overrides).items():
+            base = routes.get(stage, StageRoute(PRIMARY_MODEL, 8192))
+            routes[stage] = base._replace(**fields)
+    except (ValueError, TypeError, AttributeError) as e:
+        print(f"[model routing] Ignoring invalid MODEL_ROUTES: {e}")
+        return dict(DEFAULT_ROUTES)
+    return routes
+
+ROUTES = load_routes()
+ROUTING_STATS_EVERY = int(os.getenv("ROUTING_STATS_EVERY", 500))
+MODEL_ROUTING_LOG = os.getenv("MODEL_ROUTING_LOG")
+
+def route_for(stage: str) -> StageRoute:
+    return ROUTES.get(stage) or StageRoute(PRIMARY_MODEL, 8192)
+
+def _config(route: StageRoute, config: Optional[dict]) -> dict:
+    return {**(config or {}), "max_output_tokens": route.max_output_tokens}
+
+class RoutingStats:
+    """Per (stage, model) call counts, outcomes, hedged calls, tokens and recent latencies."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._calls = 0
+
+    def record(self, stage: str, model: str, outcome: str, seconds: float, hedged: bool, response=None, error: str = "") -> None:
+        usage = getattr(response, "usage_metadata", None)
+        tokens = (getattr(usage, "total_token_count", None) or 0) if usage else 0
+        with self._lock:
+            entry = self._stats.setdefault((stage, model), {
+                "calls": 0, "ok": 0, "errors": 0, "abandoned": 0, "hedged": 0,
+                "total_tokens": 0, "latencies": deque(maxlen=500),
+            })
+            entry["calls"] += 1
+            entry[outcome] += 1
+            entry["hedged"] += hedged
+            entry["total_tokens"] += tokens
+            if outcome == "ok":
+                entry["latencies"].append(seconds)
+            self._calls += 1
+            report = self._calls % ROUTING_STATS_EVERY == 0
+        if MODEL_ROUTING_LOG:
+            _append_log({
+                "ts": time.time(), "stage": stage, "model": model, "outcome": outcome,
+                "seconds": round(seconds, 3), "hedged": hedged, "total_tokens": tokens, "error": error,
+            })
+        if report:
+            print(f"[model routing] {self.summary()}")
+
+    def summary(self) -> dict:
+        with self._lock:
+            result = {}
+            for (stage, model), entry in self._stats.items():
+                latencies = sorted(entry["latencies"])
+                row = {k: v for k, v in entry.items() if k != "latencies"}
+                if latencies:
+                    row["p50_seconds"] = round(latencies[len(latencies) // 2], 2)
+                    row["p95_seconds"] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2)
+                result[f"{stage}/{model}"] = row
+            return result
+
+routing_stats = RoutingStats()
+_log_lock = threading.Lock()
+
+def _append_log(record: dict) -> None:
+    try:
+        with _log_lock, open(MODEL_ROUTING_LOG, "a") as f:
+            f.write(json.dumps(record) + "\n")
+    except OSError as e:
+        print(f"[model routing] Could not write {MODEL_ROUTING_LOG}: {e}")
+
+def _call(client, stage: str, model: str, contents, config: dict, hedged: bool, settled: Optional[threading.Event] = None):
+    start = time.perf_counter()
+    try:
+        response = client.models.generate_content(model=model, contents=contents, config=config)
+    except Exception as e:
+        routing_stats.record(stage, model, "errors", time.perf_counter() - start, hedged, error=str(e))
+        raise
+    # A call that loses the race still ran (and is billed), but its result is dropped
+    outcome = "abandoned" if settled is not None and settled.is_set() else "ok"
+    routing_stats.record(stage, model, outcome, time.perf_counter() - start, hedged, response)
+    return response
+
+def _start(fn, *args) -> Future:
+    """Run fn in a daemon thread with the caller's context (so usage tracking still applies)."""
+    future = Future()
+    context = contextvars.copy_context()
+
+    def run():
+        try:
+            future.set_result(context.run(fn, *args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+def generate(client, stage: str, contents, config: Optional[dict] = None):
+    """client.models.generate_content routed by stage, with SLO fallback."""
+    route = route_for(stage)
+    config = _config(route, config)
+    if not route.fallback_model or not route.slo_seconds:
+        response = _call(client, stage, route.model, contents, config, False)
+        record_usage(stage, response)
+        return response
+
+    settled = threading.Event()
+    primary = _start(_call, client, stage, route.model, contents, config, False, settled)
+    done, _ = wait([primary], timeout=route.slo_seconds)
+    if done and not primary.exception():
+        response = primary.result()
+        record_usage(stage, response)
+        return response
+
+    if done:
+        print(f"[model routing] {stage}: {route.model} failed, retrying on {route.fallback_model}")
+    else:
+        print(f"[model routing] {stage}: {route.model} exceeded {route.slo_seconds}s, hedging with {route.fallback_model}")
+    fallback = _start(_call, client, stage, route.fallback_model, contents, config, True, settled)
+    pending = [fallback] if done else [primary, fallback]
+    while pending:
+        done, rest = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if not future.exception():
+                settled.set()
+                response = future.result()
+                record_usage(stage, response)
+                return response
+        pending = list(rest)
+    # Both failed: surface the fallback's error
+    raise fallback.exception()
+
+async def _call_async(client, stage: str, model: str, contents, config: dict, hedged: bool):
+    start = time.perf_counter()
+    try:
+        response = await client.aio.models.generate_content(model=model, contents=contents, config=config)
+    except asyncio.CancelledError:
+        routing_stats.record(stage, model, "abandoned", time.perf_counter() - start, hedged)
+        raise
+    except Exception as e:
+        routing_stats.record(stage, model, "errors", time.perf_counter() - start, hedged, error=str(e))
+        raise
+    routing_stats.record(stage, model, "ok", time.perf_counter() - start, hedged, response)
+    return response
+
+async def generate_async(client, stage: str, contents, config: Optional[dict] = None):
+    """generate() for the async Gemini client; the losing call is cancelled."""
+    route = route_for(stage)
+    config = _config(route, config)
+    if not route.fallback_model or not route.slo_seconds:
+        response = await _call_async(client, stage, route.model, contents, config, False)
+        record_usage(stage, response)
+        return response
+
+    primary = asyncio.ensure_future(_call_async(client, stage, route.model, contents, config, False))
+    done, _ = await asyncio.wait([primary], timeout=route.slo_seconds)
+    if done and not primary.exception():
+        response = primary.result()
+        record_usage(stage, response)
+        return response
+
+    if done:
+        print(f"[model routing] {stage}: {route.model} failed, retrying on {route.fallback_model}")
+    else:
+        print(f"[model routing] {stage}: {route.model} exceeded {route.slo_seconds}s, hedging with {route.fallback_model}")
+    fallback = asyncio.ensure_future(_call_async(client, stage, route.fallback_model, contents, config, True))
+    pending = {fallback} if done else {primary, fallback}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.exception():
+                    response = task.result()
+                    record_usage(stage, response)
+                    return response
+        raise fallback.exception()
+    finally:
+        for task in pending:
+            task.cancel()
+
+def generate_stream(client, stage: str, contents, config: Optional[dict] = None):
+    """client.models.generate_content_stream on the stage's model. Streams aren't hedged."""
+    route = route_for(stage)
+    start = time.perf_counter()
+    last_chunk = None
+    try:
+        for chunk in client.models.generate_content_stream(model=route.model, contents=contents, config=_config(route, config)):
+            last_chunk = chunk
+            yield chunk
+    except Exception as e:
+        routing_stats.record(stage, route.model, "errors", time.perf_counter() - start, False, error=str(e))
+        raise
+    routing_stats.record(stage, route.model, "ok", time.perf_counter() - start, False, last_chunk)
+    # The usage totals arrive with the final chunk
+    record_usage(stage, last_chunk)
+
+async def generate_stream_async(client, stage: str, contents, config: Optional[dict] = None):
+    route = route_for(stage)
+    start = time.perf_counter()
+    last_chunk = None
+    try:
+        async for chunk in await client.aio.models.generate_content_stream(model=route.model, contents=contents, config=_config(route, config)):
+            last_chunk = chunk
+            yield chunk
+    except Exception as e:
+        routing_stats.record(stage, route.model, "errors", time.perf_counter() - start, False, error=str(e))
+        raise
+    routing_stats.record(stage, route.model, "ok", time.perf_counter() - start, False, last_chunk)
+    record_usage(stage, last_chunk)
@@ -0,0 +1,170 @@
+from typing import Any, Dict, Iterator, List, Tuple, Union
+from utils.token_verification import supabase, verify_token_and_get_user_id
+from utils.source_resolution import SOURCE_TABLES, fetch_source, invalidate_source, resolve_source
+from utils.row_cache import invalidate_row
+
+'''
+Per-lesson progress, stored apart from the course / quick learn documents.
+
+Marking a lesson done used to re-upload the whole unit_lessons / sections array
+through /update_draft or /update_quick_learn. Progress now lives in its own narrow table,
+one row per user per lesson (backend/migrations/002_lesson_progress.sql).
+
+A lesson is identified within its source by a key (lesson_items()): "<unit_number>/<index in
+unit>" for a course lesson (the frontend's /lesson/<unit>/<index>) and the section id
+for a quick learn section. A sync is one call to the sync_lesson_progress() Postgres
+function, which locks the touched sources, upserts the statuses and recomputes each
+source's `completed` counter from the progress rows in a single transaction. Repeating
+a write (a double click, a retried sync) is harmless, and concurrent syncs of a source
+(two tabs) can't overwrite each other's count. `completed` and `version` are the only
+columns of the source row a progress write touches. Lesson content is never read or
+written, except once per source: the first progress write for a source seeds its rows
+from the statuses already stored in the document.
+
+Reads (apply_progress) overlay the stored statuses onto the document and recount
+`completed`, so the document's own copies of the statuses may be stale.
+'''
+
+PROGRESS_TABLE = "lesson_progress"
+STATUSES = ("not started", "in progress", "completed")
+COMPLETED = "completed"
+PROGRESS_SYNC_MAX = 500
+
+def lesson_items(source_type: str, row: dict) -> Iterator[Tuple[str, dict]]:
+    """(lesson_key, lesson dict) for each lesson of a course / section of a quick learn."""
+    if source_type == "course":
+        seen: Dict[Any, int] = {}
+        for lesson in row.get("unit_lessons") or []:
+            unit_number = lesson.get("unit_number")
+            index = seen.get(unit_number, 0)
+            seen[unit_number] = index + 1
+            yield f"{unit_number}/{index}", lesson
+    else:
+        for section in row.get("sections") or []:
+            if section.get("id"):
+                yield str(section["id"]), section
+
+def apply_progress(user_id: str, source_type: str, row: dict) -> dict:
+    """Overlay the user's stored progress onto a course / quick learn row (in place)."""
+    try:
+        result = supabase.table(PROGRESS_TABLE).select("lesson, status").eq("user_id", user_id).eq("source_id", row["id"]).execute()
+    except Exception as e:
+        print(f"[progress] Could not load progress for {row.get('id')}: {e}")
+        return row
+    if not result.data:
+        return row
+    statuses = {r["lesson"]: r["status"] for r in result.data}
+    completed = 0
+    for key, item in lesson_items(source_type, row):
+        if key in statuses:
+            item["status"] = statuses[key]
+        completed += item.get("status") == COMPLETED
+    row["completed"] = completed
+    return row
+
+def _seed_rows(source_id: str, source_type: str) -> List[dict]:
+    """Progress rows for the statuses already stored in a source's document."""
+    columns = "id, user_id, unit_lessons" if source_type == "course" else "id, user_id, sections"
+    _, row = fetch_source(source_id, source_type, columns=columns)
+    return [
+        {"source_id": source_id, "lesson": key, "status": item["status"]}
+        for key, item in lesson_items(source_type, row or {})
+        if item.get("status") in STATUSES and item.get("status") != "not started"
+    ]
+
+def _invalid(update: Any) -> str:
+    if not isinstance(update, dict):
+        return "Update must be an object"
+    if not isinstance(update.get("source_id"), str) or not update["source_id"]:
+        return "Missing source_id"
+    if not isinstance(update.get("lesson"), str) or not 0 < len(update["lesson"]) <= 200:
+        return "Missing or invalid lesson"
+    if update.get("status") not in STATUSES:
+        return f"status must be one of {', '.join(STATUSES)}"
+    return ""
+
+def sync_progress(token: str, updates: Any) -> Union[Dict[str, Any], Tuple[Dict[str, Any], int]]:
+    """
+    Record a batch of {"source_id", "lesson", "status"} updates (later entries win).
+    Returns each touched source's completed count and the updates that were rejected.
+    """
+    user_id = verify_token_and_get_user_id(token)
+    if not user_id:
+        return {"error": "Invalid token or user not authenticated"}, 401
+    if not isinstance(updates, list) or not updates:
+        return {"error": "Expected a non-empty list of updates"}, 400
+    if len(updates) > PROGRESS_SYNC_MAX:
+        return {"error": f"At most {PROGRESS_SYNC_MAX} updates per sync"}, 400
+
+    try:
+        latest: Dict[Tuple[str, str], str] = {}
+        rejected = []
+        for update in updates:
+            error = _invalid(update)
+            if error:
+                rejected.append({"update": update, "error": error})
+            else:
+                latest[(update["source_id"], update["lesson"])] = update["status"]
+
+        source_types = {}
+        for source_id in dict.fromkeys(source_id for source_id, _ in latest):
+            ref = resolve_source(source_id)
+            if ref and ref.owner_id == user_id:
+                source_types[source_id] = ref.source_type
+        for (source_id, lesson), status in list(latest.items()):
+            if source_id not in source_types:
+                rejected.append({"update": {"source_id": source_id, "lesson": lesson, "status": status}, "error": "Source not found"})
+                del latest[(source_id, lesson)]
+        if not latest:
+            return {"sources": {}, "rejected": rejected}
+
+        # Sources without any progress rows yet get seeded from their documents
+        existing = supabase.table(PROGRESS_TABLE).select("source_id") \
+            .eq("user_id", user_id).in_("source_id", list(source_types)).execute()
+        tracked = {r["source_id"] for r in existing.data or []}
+        seeds = [
+            seed
+            for source_id, source_type in source_types.items() if source_id not in tracked
+            for seed in _seed_rows(source_id, source_type)
+            if (source_id, seed["lesson"]) not in latest
+        ]
+        updates = [{"source_id": source_id, "lesson": lesson, "status": status} for (source_id, lesson), status in latest.items()]
+
+        # Upsert and recount in one transaction (see the migration)
+        result = supabase.rpc("sync_lesson_progress", {"p_user_id": user_id, "p_updates": updates, "p_seeds": seeds}).execute()
+
+        sources = {}
+        for r in result.data or []:
+            source_id = str(r["source_id"])
+            invalidate_source(source_id)
+            invalidate_row(SOURCE_TABLES[source_types[source_id]], source_id)
+            sources[source_id] = {"completed": r["completed"], "version": r["version"]}
+        return {"sources": sources, "rejected": rejected}
+    except Exception as e:
+        print(f"[ERROR] Progress sync failed: {e}")
+        return {"error": str(e)}, 500
+
+def get_progress(token: str, source_id: str) -> Union[Dict[str, Any], Tuple[Dict[str, Any], int]]:
+    """The user's lesson statuses for one course / quick learn."""
+    user_id = verify_token_and_get_user_id(token)
+    if not user_id:
+        return {"error": "Invalid token or user not authenticated"}, 401
+
+    try:
+        ref = resolve_source(source_id)
+        if not ref or ref.owner_id != user_id:
+            return {"error": "Source not found"}, 404
+        result = supabase.table(PROGRESS_TABLE).select("lesson, status").eq("user_id", user_id).eq("source_id", source_id).execute()
+        lessons = {r["lesson"]: r["status"] for r in result.data or []}
+        if not lessons:
+            # Nothing recorded here yet: report what the document itself says
+            lessons = {r["lesson"]: r["status"] for r in _seed_rows(source_id, ref.source_type)}
+        return {
+            "source_id": source_id,
+            "source_type": ref.source_type,
+            "completed": sum(1 for status in lessons.values() if status == COMPLETED),
+            "lessons": lessons,
+        }
+    except Exception as e:
+        print(f"[ERROR] Fetching progress failed: {e}")
+        return {"error": str(e)}, 500
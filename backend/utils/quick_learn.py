@@ -1,10 +1,13 @@
 import os
-import json
 import uuid
+import asyncio
+import threading
 from typing import List, Optional
 from dotenv import load_dotenv
 from pydantic import BaseModel
 from google import genai
+from utils.digests import attach_digests, section_digest
+from utils.model_routing import generate, generate_async
 
 # Load environment variables
 load_dotenv()
@@ -37,13 +40,67 @@ class QAssessment(BaseModel):
     instructions: Optional[str] = None
     questions: List[QGradedQuestion]
 
-class QuickLesson(BaseModel):
+class QuickLessonOutline(BaseModel):
     title: str
     description: str
     estimated_duration_minutes: int
     lessons: List[QLesson]
-    lesson_content: List[QLessonContent]
-    assessment: QAssessment
+
+# --- Prompts ---
+# Generation runs in two phases: a short outline call, then one call per section plus
+# one for the assessment, all in parallel. Latency tracks the slowest section rather
+# than the length of the whole quick learn.
+
+def build_outline_prompt(topic: str, difficulty: str) -> List[str]:
+    return [
+        f"Plan a quick learning course for {topic} at {difficulty} level.",
+        "If difficulty is beginner plan 3 lessons, if intermediate plan 5 lessons, and if advanced plan 7 lessons.",
+        "The beginner course should be about 1 hour long, intermediate about 2 hours, and advanced about 4 hours.",
+        "Give the course a title and description, and give each lesson a title, estimated duration in minutes, and the topics it covers.",
+        "Only return the outline; the lesson content is written separately.",
+        "Return the output as JSON according to the given schema.",
+    ]
+
+def build_section_prompt(topic: str, difficulty: str, outline: QuickLessonOutline, index: int) -> List[str]:
+    lesson = outline.lessons[index]
+    other_lessons = [l.title for i, l in enumerate(outline.lessons) if i != index]
+    return [
+        f"Write lesson {index + 1} of {len(outline.lessons)} of the quick learning course '{outline.title}' on {topic} at {difficulty} level.",
+        f"Lesson title: {lesson.title}. Topics to cover: {', '.join(lesson.topics)}.",
+        f"The lesson should take about {lesson.duration_minutes} minutes to study.",
+        f"The other lessons in the course cover: {'; '.join(other_lessons)}. Don't repeat their material.",
+        "Provide detailed original 'readings' — do NOT quote from other sources.",
+        "Include practical examples and additional resources with links (no other courses).",
+        f"Use '{lesson.title}' as the unit_title of each resource.",
+        "Return the output as JSON according to the given schema.",
+    ]
+
+def build_assessment_prompt(topic: str, difficulty: str, outline: QuickLessonOutline) -> List[str]:
+    lessons = [f"{l.title} ({', '.join(l.topics)})" for l in outline.lessons]
+    return [
+        f"Write a course-wide assessment for the quick learning course '{outline.title}' on {topic} at {difficulty} level.",
+        f"The course covers these lessons: {'; '.join(lessons)}.",
+        "Use multiple choice, true/false, and fill-in-the-blank questions.",
+        "Return the output as JSON according to the given schema.",
+    ]
+
+# Bump when any quick learn prompt, schema or model changes (part of the singleflight key)
+QUICK_LEARN_PROMPT_VERSION = "2"
+
+OUTLINE_CONFIG = {
+    'response_mime_type': 'application/json',
+    'response_schema': QuickLessonOutline.model_json_schema(),
+}
+
+SECTION_CONFIG = {
+    'response_mime_type': 'application/json',
+    'response_schema': QLessonContent.model_json_schema(),
+}
+
+ASSESSMENT_CONFIG = {
+    'response_mime_type': 'application/json',
+    'response_schema': QAssessment.model_json_schema(),
+}
 
 # --- Main generation function ---
 
@@ -55,74 +112,118 @@ def generate_quick_learn(topic: str, difficulty: str) -> dict:
     try:
         print(f"Generating quick learn for topic: {topic}, difficulty: {difficulty}")
 
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=[
-                f"Generate a quick learning course for {topic} at {difficulty} level.",
-                "If difficulty is beginner generate 3 lessons, if intermediate generate 5 lessons, and if advanced generate 7 lessons.",
-                "The beginner course should be about 1 hour long, intermediate about 2 hours, and advanced about 4 hours.",
-                "Each lesson should have a title, estimated duration, and topics covered.",
-                "Provide detailed original 'readings' for each lesson — do NOT quote from other sources.",
-                "Include practical examples, exercises, and additional resources with links (no other courses).",
-                "Also provide a course-wide assessment: multiple choice, true/false, and fill-in-the-blank questions.",
-                "Return the output as JSON according to the given schema.",
-            ],
-            config={
-                'response_mime_type': 'application/json',
-                'response_schema': QuickLesson.model_json_schema(),
-            },
-        )
+        # Phase 1: outline
+        response = generate(client, "quick_learn_outline", build_outline_prompt(topic, difficulty), OUTLINE_CONFIG)
+        outline = QuickLessonOutline.model_validate_json(response.text)
+
+        # Phase 2: every section and the assessment in parallel
+        lesson_content = [None] * len(outline.lessons)
+        errors = []
+        assessment_holder = [None]
 
-        content = response.text
-        parsed_content = json.loads(content)
-        validated_content = QuickLesson.model_validate(parsed_content)
-
-        # --- Transform into frontend-ready schema ---
-
-        # Create sections from lessons + lesson_content
-        sections = []
-        for idx, (lesson, lesson_detail) in enumerate(zip(validated_content.lessons, validated_content.lesson_content)):
-            section_id = str(uuid.uuid4())  # or slugify(lesson.title)
-            sections.append({
-                "id": section_id,
-                "title": lesson.title,
-                "readings": lesson_detail.readings,
-                "examples": lesson_detail.examples,
-                "additional_resources": lesson_detail.additional_resources
-            })
-
-        # Transform assessment questions
-        questions = []
-        for q in validated_content.assessment.questions:
+        def generate_section(index):
             try:
-                correct_index = q.answer_choices.index(q.answer)
-            except ValueError:
-                correct_index = 0  # fallback if the correct answer is missing in choices
-            questions.append({
-                "question": q.question,
-                "options": q.answer_choices,
-                "correctAnswer": correct_index
-            })
-
-        # Assemble final cleaned quick learn object
-        cleaned_quick_learn = {
-            "title": validated_content.title,
-            "topic": topic,
-            "difficulty": difficulty,
-            "description": validated_content.description,
-            "estimated_duration_minutes": validated_content.estimated_duration_minutes,
-            "sections": sections,
-            "assessment": {
-                "title": validated_content.assessment.title,
-                "instructions": validated_content.assessment.instructions,
-                "questions": questions
-            },
-            "resources": [],  # No generated resources yet (you can later add optional ones)
-            "completed": 0  # Initialize completed lessons count to 0
-        }
-
-        return cleaned_quick_learn
+                response = generate(client, "quick_learn_section", build_section_prompt(topic, difficulty, outline, index), SECTION_CONFIG)
+                lesson_content[index] = QLessonContent.model_validate_json(response.text)
+            except Exception as e:
+                errors.append(f"section {index + 1}: {e}")
+
+        def generate_assessment():
+            try:
+                response = generate(client, "quick_learn_assessment", build_assessment_prompt(topic, difficulty, outline), ASSESSMENT_CONFIG)
+                assessment_holder[0] = QAssessment.model_validate_json(response.text)
+            except Exception as e:
+                errors.append(f"assessment: {e}")
+
+        threads = [threading.Thread(target=generate_section, args=(i,)) for i in range(len(outline.lessons))]
+        threads.append(threading.Thread(target=generate_assessment))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            raise ValueError(f"Quick learn generation failed: {'; '.join(errors)}")
+
+        return assemble_quick_learn(outline, lesson_content, assessment_holder[0], topic, difficulty)
+
+    except Exception as e:
+        print(f"[ERROR] Failed to generate quick learn: {str(e)}")
+        raise e
+
+async def generate_quick_learn_async(topic: str, difficulty: str) -> dict:
+    """
+    Same as generate_quick_learn, using the async Gemini client.
+    """
+    try:
+        print(f"Generating quick learn (async) for topic: {topic}, difficulty: {difficulty}")
+
+        response = await generate_async(client, "quick_learn_outline", build_outline_prompt(topic, difficulty), OUTLINE_CONFIG)
+        outline = QuickLessonOutline.model_validate_json(response.text)
+
+        async def generate_section(index):
+            response = await generate_async(client, "quick_learn_section", build_section_prompt(topic, difficulty, outline, index), SECTION_CONFIG)
+            return QLessonContent.model_validate_json(response.text)
+
+        async def generate_assessment():
+            response = await generate_async(client, "quick_learn_assessment", build_assessment_prompt(topic, difficulty, outline), ASSESSMENT_CONFIG)
+            return QAssessment.model_validate_json(response.text)
+
+        *lesson_content, assessment = await asyncio.gather(
+            *[generate_section(i) for i in range(len(outline.lessons))],
+            generate_assessment(),
+        )
+
+        return assemble_quick_learn(outline, lesson_content, assessment, topic, difficulty)
 
     except Exception as e:
         print(f"[ERROR] Failed to generate quick learn: {str(e)}")
-        raise e
\ No newline at end of file
+        raise e
+
+def assemble_quick_learn(outline: QuickLessonOutline, lesson_content: List[QLessonContent], assessment: QAssessment, topic: str, difficulty: str) -> dict:
+    """
+    Transform the outline, per-section content and assessment into the frontend-ready schema.
+    """
+    # Create sections from lessons + lesson_content
+    sections = []
+    for lesson, lesson_detail in zip(outline.lessons, lesson_content):
+        section_id = str(uuid.uuid4())  # or slugify(lesson.title)
+        sections.append({
+            "id": section_id,
+            "title": lesson.title,
+            "readings": lesson_detail.readings,
+            "examples": lesson_detail.examples,
+            "additional_resources": lesson_detail.additional_resources
+        })
+
+    # Transform assessment questions
+    questions = []
+    for q in assessment.questions:
+        try:
+            correct_index = q.answer_choices.index(q.answer)
+        except ValueError:
+            correct_index = 0  # fallback if the correct answer is missing in choices
+        questions.append({
+            "question": q.question,
+            "options": q.answer_choices,
+            "correctAnswer": correct_index
+        })
+
+    # Assemble final cleaned quick learn object
+    cleaned_quick_learn = {
+        "title": outline.title,
+        "topic": topic,
+        "difficulty": difficulty,
+        "description": outline.description,
+        "estimated_duration_minutes": outline.estimated_duration_minutes,
+        "sections": attach_digests(sections, section_digest),
+        "assessment": {
+            "title": assessment.title,
+            "instructions": assessment.instructions,
+            "questions": questions
+        },
+        "resources": [],  # No generated resources yet (you can later add optional ones)
+        "completed": 0  # Initialize completed lessons count to 0
+    }
+
+    return cleaned_quick_learn
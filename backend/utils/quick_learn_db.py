@@ -1,33 +1,15 @@
-from utils.token_verification import supabase, verify_token_and_get_user_id
+from utils.token_verification import supabase, verify_token_and_get_user_id, get_async_supabase
 import datetime
-import json
+from utils.json_provider import to_json_compatible
+from utils.source_resolution import invalidate_source
+from utils.row_cache import cached_row, invalidate_row
+from utils.touch_buffer import touch, touch_buffer
+from utils.progress import apply_progress
+from utils.search_index import note_inserted
 from typing import Dict, Any, Tuple, Union
 
-def make_json_serializable(obj):
-    # If obj is a list or tuple, process recursively
-    if isinstance(obj, (list, tuple)):
-        return [make_json_serializable(item) for item in obj]
-    # If obj is a dict, process values recursively
-    elif isinstance(obj, dict):
-        return {k: make_json_serializable(v) for k, v in obj.items()}
-    # If obj has a .dict() or .to_dict() method, use it
-    elif hasattr(obj, "dict") and callable(getattr(obj, "dict")):
-        return make_json_serializable(obj.dict())
-    elif hasattr(obj, "to_dict") and callable(getattr(obj, "to_dict")):
-        return make_json_serializable(obj.to_dict())
-    # If obj is a custom object, fallback to vars()
-    elif hasattr(obj, "__dict__"):
-        return make_json_serializable(vars(obj))
-    # Otherwise, return as is (should be JSON serializable)
-    else:
-        return obj
-
-def save_quick_learn(quick_learn_data: dict, token: str) -> Union[Dict[str, Any], Tuple[Dict[str, Any], int]]:
-    """Create and save a new quick learn session into Supabase."""
-    user_id = verify_token_and_get_user_id(token)
-    if not user_id:
-        return {"error": "Invalid token or user not authenticated"}, 401
-
+def build_quick_learn_row(quick_learn_data: dict, user_id: str) -> Dict[str, Any]:
+    """Fill in the mandatory fields and make the quick learn JSON serializable."""
     now = datetime.datetime.utcnow().isoformat()
 
     # Fill in mandatory fields
@@ -37,13 +19,22 @@ def save_quick_learn(quick_learn_data: dict, token: str) -> Union[Dict[str, Any]
     quick_learn_data["completed"] = quick_learn_data.get("completed", 0)  # Initialize to 0 if missing
 
     # Ensure everything is JSON serializable (especially additional_resources)
-    serializable_data = make_json_serializable(quick_learn_data)
+    serializable_data = to_json_compatible(quick_learn_data)
+
+    print(f"[DEBUG] Inserting quick learn: {serializable_data.get('title')} ({len(serializable_data.get('sections', []))} sections)")
+    return serializable_data
+
+def save_quick_learn(quick_learn_data: dict, token: str) -> Union[Dict[str, Any], Tuple[Dict[str, Any], int]]:
+    """Create and save a new quick learn session into Supabase."""
+    user_id = verify_token_and_get_user_id(token)
+    if not user_id:
+        return {"error": "Invalid token or user not authenticated"}, 401
 
-    # Print for debugging
-    print(f"[DEBUG] Inserting quick learn: {json.dumps(serializable_data, default=str)}...")
+    serializable_data = build_quick_learn_row(quick_learn_data, user_id)
 
     try:
         result = supabase.table("quick_learns").insert(serializable_data).execute()
+        note_inserted("quick_learns", result.data)
         return result.data
     except Exception as e:
         import traceback
@@ -51,6 +42,23 @@ def save_quick_learn(quick_learn_data: dict, token: str) -> Union[Dict[str, Any]
         print(traceback.format_exc())
         return {"error": f"Database error: {str(e)}"}, 500
 
+async def save_quick_learn_async(quick_learn_data: dict, token: str) -> Union[Dict[str, Any], Tuple[Dict[str, Any], int]]:
+    """Same as save_quick_learn, using the async Supabase client."""
+    user_id = verify_token_and_get_user_id(token)
+    if not user_id:
+        return {"error": "Invalid token or user not authenticated"}, 401
+
+    serializable_data = build_quick_learn_row(quick_learn_data, user_id)
+
+    try:
+        client = await get_async_supabase()
+        result = await client.table("quick_learns").insert(serializable_data).execute()
+        note_inserted("quick_learns", result.data)
+        return result.data
+    except Exception as e:
+        print(f"[ERROR] Supabase insert failed: {e}")
+        return {"error": f"Database error: {str(e)}"}, 500
+
 def get_quick_learns_for_user(token: str) -> Union[Dict[str, Any], Tuple[Dict[str, Any], int]]:
     """Get all quick learns for a user"""
     user_id = verify_token_and_get_user_id(token)
@@ -64,7 +72,7 @@ def get_quick_learns_for_user(token: str) -> Union[Dict[str, Any], Tuple[Dict[st
             .eq("user_id", user_id) \
             .order("last_accessed", desc=True) \
             .execute()
-        return result.data
+        return touch_buffer.apply_pending("quick_learns", result.data)
     except Exception as e:
         print(f"[ERROR] Supabase fetch failed for quick learns: {e}")
         return {"error": str(e)}, 500
@@ -76,27 +84,26 @@ def get_quick_learn_by_id(token: str, quick_learn_id: str) -> Union[Dict[str, An
         return {"error": "Invalid token or user not authenticated"}, 401
 
     try:
-        # Update last accessed timestamp
-        supabase \
-            .table("quick_learns") \
-            .update({"last_accessed": datetime.datetime.utcnow().isoformat()}) \
-            .eq("id", quick_learn_id) \
-            .eq("user_id", user_id) \
-            .execute()
-
-        # Fetch full session
-        result = supabase \
-            .table("quick_learns") \
-            .select("*") \
-            .eq("id", quick_learn_id) \
-            .eq("user_id", user_id) \
-            .single() \
-            .execute()
-
-        if not result.data:
+        # Fetch full session (served from the row cache when warm)
+        def load():
+            result = supabase \
+                .table("quick_learns") \
+                .select("*") \
+                .eq("id", quick_learn_id) \
+                .eq("user_id", user_id) \
+                .single() \
+                .execute()
+            return result.data
+
+        quick_learn = cached_row("quick_learns", user_id, quick_learn_id, load)
+
+        if not quick_learn:
             return {"error": "Quick learn not found"}, 404
 
-        return result.data
+        # Update last accessed timestamp (written behind, see utils/touch_buffer.py)
+        quick_learn["last_accessed"] = touch("quick_learns", quick_learn_id)
+
+        return apply_progress(user_id, "quick-learn", quick_learn)
     except Exception as e:
         print(f"[ERROR] Fetching quick learn by ID failed: {e}")
         return {"error": str(e)}, 500
@@ -114,6 +121,8 @@ def delete_quick_learn(token: str, quick_learn_id: str) -> Union[Dict[str, Any],
             .eq("id", quick_learn_id) \
             .eq("user_id", user_id) \
             .execute()
+        invalidate_source(quick_learn_id)
+        invalidate_row("quick_learns", quick_learn_id)
 
         return {"success": True, "message": "Quick learn deleted successfully"}
     except Exception as e:
@@ -0,0 +1,156 @@
+import os
+import threading
+import orjson
+from typing import Callable, Optional
+from cachetools import TTLCache
+from utils.json_provider import dumps_bytes
+
+'''
+Read-through cache for hot single-row reads (a course, a quick learn, a flashcard set).
+
+Rows are stored JSON-encoded, so the LRU is bounded by the bytes actually held and
+every hit hands out a fresh dict (callers can mutate it freely). Entries expire after
+ROW_CACHE_TTL_SECONDS, which bounds staleness from writes made outside this process.
+Writes made through the API call invalidate_row(), which drops the entry here and,
+if ROW_CACHE_REDIS_URL is set and redis is installed, publishes the invalidation to
+the other workers.
+
+Entries are keyed by (table, row id) and remember the owner, so a lookup by another
+user misses just like the `.eq("user_id", ...)` query would.
+'''
+
+ROW_CACHE_MAX_BYTES = int(os.getenv("ROW_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+ROW_CACHE_TTL_SECONDS = float(os.getenv("ROW_CACHE_TTL_SECONDS", 300))
+ROW_CACHE_REDIS_URL = os.getenv("ROW_CACHE_REDIS_URL")
+INVALIDATION_CHANNEL = "row_cache:invalidate"
+STATS_LOG_EVERY = 1000
+
+class RowCache:
+    def __init__(self, max_bytes: int = ROW_CACHE_MAX_BYTES, ttl: float = ROW_CACHE_TTL_SECONDS):
+        self.max_bytes = max_bytes
+        self._rows = TTLCache(maxsize=max_bytes, ttl=ttl, getsizeof=lambda entry: len(entry[1]))
+        self._lock = threading.Lock()
+        # Bumped on every invalidation, so a load that raced with a write isn't cached
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    def get(self, table: str, user_id: str, row_id: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._rows.get((table, str(row_id)))
+            if entry is None or entry[0] != user_id:
+                self.misses += 1
+                encoded = None
+            else:
+                self.hits += 1
+                self.bytes_saved += len(entry[1])
+                encoded = entry[1]
+            lookups = self.hits + self.misses
+        if lookups % STATS_LOG_EVERY == 0:
+            print(f"[row cache] {self.stats()}")
+        return orjson.loads(encoded) if encoded is not None else None
+
+    def put(self, table: str, user_id: str, row_id: str, row: dict, generation: Optional[int] = None) -> None:
+        encoded = dumps_bytes(row)
+        if len(encoded) > self.max_bytes:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._rows[(table, str(row_id))] = (user_id, encoded)
+
+    def get_or_load(self, table: str, user_id: str, row_id: str, loader: Callable[[], Optional[dict]]) -> Optional[dict]:
+        """Return the cached row, or call loader() and cache what it returns (if not None)."""
+        row = self.get(table, user_id, row_id)
+        if row is not None:
+            return row
+        with self._lock:
+            generation = self._generation
+        row = loader()
+        if row is not None:
+            self.put(table, user_id, row_id, row, generation)
+        return row
+
+    def invalidate(self, table: str, row_id: str) -> None:
+        with self._lock:
+            self._rows.pop((table, str(row_id)), None)
+            self._generation += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._rows.clear()
+            self._generation += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "bytes_saved": self.bytes_saved,
+                "entries": len(self._rows),
+                "bytes_cached": self._rows.currsize,
+            }
+
+row_cache = RowCache()
+
+# --- Optional cross-worker invalidation (Redis pub/sub) ---
+
+_redis = None
+_listener_started = False
+_listener_lock = threading.Lock()
+
+def _listen(pubsub) -> None:
+    for message in pubsub.listen():
+        if message.get("type") != "message":
+            continue
+        data = message["data"]
+        table, _, row_id = (data.decode() if isinstance(data, bytes) else data).partition(":")
+        row_cache.invalidate(table, row_id)
+
+def _get_redis():
+    """Connect and start the listener thread on first use; None if not configured."""
+    global _redis, _listener_started
+    if not ROW_CACHE_REDIS_URL:
+        return None
+    with _listener_lock:
+        if not _listener_started:
+            _listener_started = True
+            try:
+                import redis
+                _redis = redis.Redis.from_url(ROW_CACHE_REDIS_URL)
+                pubsub = _redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                threading.Thread(target=_listen, args=(pubsub,), daemon=True).start()
+            except Exception as e:
+                print(f"[row cache] Cross-worker invalidation disabled: {e}")
+                _redis = None
+    return _redis
+
+_invalidation_listeners = []
+
+def on_invalidate(listener: Callable[[str, str], None]) -> None:
+    """Also call listener(table, row_id) whenever this worker invalidates a row."""
+    _invalidation_listeners.append(listener)
+
+def invalidate_row(table: str, row_id: str) -> None:
+    """Drop a row from this worker's cache and tell the other workers to do the same."""
+    row_cache.invalidate(table, row_id)
+    for listener in _invalidation_listeners:
+        try:
+            listener(table, str(row_id))
+        except Exception as e:
+            print(f"[row cache] Invalidation listener failed: {e}")
+    client = _get_redis()
+    if client is not None:
+        try:
+            client.publish(INVALIDATION_CHANNEL, f"{table}:{row_id}")
+        except Exception as e:
+            print(f"[row cache] Failed to publish invalidation: {e}")
+
+def cached_row(table: str, user_id: str, row_id: str, loader: Callable[[], Optional[dict]]) -> Optional[dict]:
+    # Make sure this worker is subscribed before it starts serving cached rows
+    _get_redis()
+    return row_cache.get_or_load(table, user_id, row_id, loader)
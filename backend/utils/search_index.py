@@ -0,0 +1,275 @@
+import html
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from utils.token_verification import supabase, verify_token_and_get_user_id
+from utils.row_cache import on_invalidate
+
+'''
+Full-text search over a user's courses, quick learns and flashcard sets.
+
+The index is an embedded SQLite FTS5 table (porter stemming, unicode61 tokens) at
+SEARCH_INDEX_PATH, shared by the workers on a host. Each searchable piece is one entry:
+a course (title, description), each of its lessons (title, summary, readings,
+examples, exercises), a quick learn, each section, a flashcard set, and each card
+(front, back). Results are ranked by BM25 with titles weighted above bodies, and
+come with a highlighted snippet: HTML-escaped text with the matches in <mark> tags.
+
+The index is a cache of Supabase, kept in sync lazily:
+
+- A user's entries are built from Supabase on their first search, and rebuilt after
+  SEARCH_REBUILD_SECONDS (which also picks up writes made outside this host).
+- Every API write already calls invalidate_row(); that marks the row stale here. New
+  rows are recorded by note_inserted(). A search first re-reads just the user's stale
+  rows (one query per table) and re-indexes them, or drops them if they are gone.
+
+Writes therefore only cost a tiny local update, and searches never download
+everything the user owns.
+'''
+
+SEARCH_INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", os.path.join(tempfile.gettempdir(), "luminous_search_index.db"))
+SEARCH_REBUILD_SECONDS = float(os.getenv("SEARCH_REBUILD_SECONDS", 6 * 3600))
+SEARCH_PAGE_SIZE_MAX = 50
+SEARCH_MAX_TERMS = 12
+
+# Columns each table is indexed from
+SEARCH_COLUMNS = {
+    "courses": "id, user_id, title, description, unit_lessons",
+    "quick_learns": "id, user_id, title, description, topic, sections",
+    "flashcard_sets": "id, user_id, title, topic, source_type, flashcards",
+}
+
+_MARKDOWN = re.compile(r"[#*_`>|~]+|!?\[([^\]]*)\]\([^)]*\)")
+_TERM = re.compile(r"\w+", re.UNICODE)
+# highlight() / snippet() wrap matches in these private-use characters; the text is
+# escaped before they become <mark> tags, since it is user and model content
+_MARK_OPEN, _MARK_CLOSE = "\ue000", "\ue001"
+
+def _text(*parts) -> str:
+    text = "\n".join(str(p) for p in parts if p)
+    text = text.replace(_MARK_OPEN, "").replace(_MARK_CLOSE, "")
+    return " ".join(_MARKDOWN.sub(lambda m: m.group(1) or " ", text).split())
+
+def _marked(text: Optional[str]) -> str:
+    return html.escape(text or "").replace(_MARK_OPEN, "<mark>").replace(_MARK_CLOSE, "</mark>")
+
+def entries_for(table: str, row: dict) -> Iterator[Tuple[str, str, str, str]]:
+    """(kind, ref, title, body) for every searchable piece of a row."""
+    if table == "courses":
+        yield "course", "", row.get("title") or "", _text(row.get("description"))
+        seen: Dict[object, int] = {}
+        for lesson in row.get("unit_lessons") or []:
+            unit_number = lesson.get("unit_number")
+            index = seen.get(unit_number, 0)
+            seen[unit_number] = index + 1
+            yield "lesson", f"{unit_number}/{index}", lesson.get("lesson") or "", _text(
+                lesson.get("lesson_summary"), lesson.get("readings"), lesson.get("examples"), lesson.get("exercises"))
+    elif table == "quick_learns":
+        yield "quick_learn", "", row.get("title") or "", _text(row.get("topic"), row.get("description"))
+        for section in row.get("sections") or []:
+            yield "section", str(section.get("id") or ""), section.get("title") or "", _text(section.get("readings"), section.get("examples"))
+    elif table == "flashcard_sets":
+        yield "flashcard_set", row.get("source_type") or "", row.get("title") or "", _text(row.get("topic"))
+        cards = (row.get("flashcards") or {}).get("flashcards") or []
+        for i, card in enumerate(cards):
+            yield "card", str(card.get("id", i)), _text(card.get("front")), _text(card.get("back"))
+
+def match_expression(user_id: str, query: str) -> Optional[str]:
+    """FTS5 MATCH for the user's entries containing every query term (the last one as a prefix)."""
+    terms = _TERM.findall((query or "").lower())[:SEARCH_MAX_TERMS]
+    if not terms:
+        return None
+    phrase = " ".join(f'"{t}"' for t in terms[:-1])
+    phrase = f'{phrase} "{terms[-1]}"*'.strip()
+    return f'user_id:"{user_id.replace(chr(34), "")}" AND {{title body}}: ({phrase})'
+
+class SearchIndex:
+    def __init__(self, path: str = SEARCH_INDEX_PATH):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS search_entries USING fts5("
+            " title, body, user_id, doc_id, kind UNINDEXED, ref UNINDEXED,"
+            " tokenize='porter unicode61')"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS search_docs ("
+            " doc_id TEXT PRIMARY KEY, table_name TEXT NOT NULL, user_id TEXT NOT NULL,"
+            " stale INTEGER NOT NULL DEFAULT 0)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS search_docs_stale ON search_docs (user_id, stale)")
+        conn.execute("CREATE TABLE IF NOT EXISTS search_users (user_id TEXT PRIMARY KEY, built_at REAL NOT NULL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def mark_stale(self, table: str, row_id: str, user_id: Optional[str] = None) -> None:
+        """Re-index this row on its owner's next search. user_id is needed for rows not indexed yet."""
+        if table not in SEARCH_COLUMNS:
+            return
+        conn = self._connect()
+        updated = conn.execute("UPDATE search_docs SET stale = 1 WHERE doc_id = ?", (row_id,)).rowcount
+        if not updated and user_id:
+            # Only worth tracking if the user's index exists; a first build reads everything
+            conn.execute(
+                "INSERT OR IGNORE INTO search_docs (doc_id, table_name, user_id, stale)"
+                " SELECT ?, ?, ?, 1 WHERE EXISTS (SELECT 1 FROM search_users WHERE user_id = ?)",
+                (row_id, table, user_id, user_id),
+            )
+
+    def _replace(self, conn: sqlite3.Connection, table: str, user_id: str, row_id: str, row: Optional[dict]) -> None:
+        conn.execute(
+            "DELETE FROM search_entries WHERE rowid IN"
+            " (SELECT rowid FROM search_entries WHERE search_entries MATCH ?)",
+            (f'doc_id:"{row_id}"',),
+        )
+        if row is None:
+            conn.execute("DELETE FROM search_docs WHERE doc_id = ?", (row_id,))
+            return
+        conn.executemany(
+            "INSERT INTO search_entries (title, body, user_id, doc_id, kind, ref) VALUES (?, ?, ?, ?, ?, ?)",
+            [(title, body, user_id, row_id, kind, ref) for kind, ref, title, body in entries_for(table, row)],
+        )
+        # A write that landed while this row was being re-read marked it stale (1) again: keep that
+        conn.execute(
+            "INSERT INTO search_docs (doc_id, table_name, user_id, stale) VALUES (?, ?, ?, 0)"
+            " ON CONFLICT (doc_id) DO UPDATE SET stale = CASE WHEN stale = 1 THEN 1 ELSE 0 END",
+            (row_id, table, user_id),
+        )
+
+    def _fetch(self, table: str, user_id: str, ids: Optional[List[str]] = None) -> List[dict]:
+        query = supabase.table(table).select(SEARCH_COLUMNS[table]).eq("user_id", user_id)
+        if ids is not None:
+            query = query.in_("id", ids)
+        return query.execute().data or []
+
+    def refresh(self, user_id: str) -> None:
+        """Build the user's entries if missing or old, otherwise re-index their stale rows."""
+        conn = self._connect()
+        built = conn.execute("SELECT built_at FROM search_users WHERE user_id = ?", (user_id,)).fetchone()
+        if built is None or time.time() - built[0] > SEARCH_REBUILD_SECONDS:
+            self._build(user_id)
+            return
+
+        # Claim the stale rows (2 = being re-read) before fetching them
+        conn.execute("UPDATE search_docs SET stale = 2 WHERE user_id = ? AND stale = 1", (user_id,))
+        stale: Dict[str, List[str]] = {}
+        for row_id, table in conn.execute("SELECT doc_id, table_name FROM search_docs WHERE user_id = ? AND stale = 2", (user_id,)).fetchall():
+            stale.setdefault(table, []).append(row_id)
+        for table, ids in stale.items():
+            rows = {str(row["id"]): row for row in self._fetch(table, user_id, ids)}
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for row_id in ids:
+                    self._replace(conn, table, user_id, row_id, rows.get(row_id))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _build(self, user_id: str) -> None:
+        start = time.perf_counter()
+        conn = self._connect()
+        # Registered before reading, so rows inserted meanwhile are tracked by mark_stale
+        conn.execute("INSERT OR REPLACE INTO search_users (user_id, built_at) VALUES (?, ?)", (user_id, time.time()))
+        conn.execute("UPDATE search_docs SET stale = 2 WHERE user_id = ?", (user_id,))
+        try:
+            fetched = {table: self._fetch(table, user_id) for table in SEARCH_COLUMNS}
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                present = {str(row["id"]) for rows in fetched.values() for row in rows}
+                for (row_id,) in conn.execute("SELECT doc_id FROM search_docs WHERE user_id = ?", (user_id,)).fetchall():
+                    if row_id not in present:
+                        self._replace(conn, "", user_id, row_id, None)
+                for table, rows in fetched.items():
+                    for row in rows:
+                        self._replace(conn, table, user_id, str(row["id"]), row)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        except Exception:
+            conn.execute("DELETE FROM search_users WHERE user_id = ?", (user_id,))
+            raise
+        print(f"[search] Indexed {sum(len(rows) for rows in fetched.values())} documents for {user_id} in {time.perf_counter() - start:.2f}s")
+
+    def search(self, user_id: str, query: str, limit: int, offset: int) -> List[dict]:
+        expression = match_expression(user_id, query)
+        if expression is None:
+            return []
+        rows = self._connect().execute(
+            "SELECT doc_id, kind, ref, title,"
+            " highlight(search_entries, 0, ?, ?),"
+            " snippet(search_entries, 1, ?, ?, '…', 24),"
+            " bm25(search_entries, 8.0, 1.0, 0.0, 0.0)"
+            " FROM search_entries WHERE search_entries MATCH ?"
+            " ORDER BY bm25(search_entries, 8.0, 1.0, 0.0, 0.0) LIMIT ? OFFSET ?",
+            (_MARK_OPEN, _MARK_CLOSE, _MARK_OPEN, _MARK_CLOSE, expression, limit, offset),
+        ).fetchall()
+        return [
+            {"id": doc_id, "kind": kind, "ref": ref, "title": title, "title_highlighted": _marked(highlighted),
+             "snippet": _marked(snippet), "score": round(-rank, 4)}
+            for doc_id, kind, ref, title, highlighted, snippet, rank in rows
+        ]
+
+_index: Optional[SearchIndex] = None
+_index_lock = threading.Lock()
+
+def search_index() -> SearchIndex:
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SearchIndex()
+        return _index
+
+def _on_invalidate(table: str, row_id: str) -> None:
+    if table in SEARCH_COLUMNS:
+        search_index().mark_stale(table, row_id)
+
+on_invalidate(_on_invalidate)
+
+def note_inserted(table: str, rows: Iterable[dict]) -> None:
+    """Record rows an insert just created so they show up in their owner's next search."""
+    try:
+        for row in rows or []:
+            if isinstance(row, dict) and row.get("id") and row.get("user_id"):
+                search_index().mark_stale(table, str(row["id"]), row["user_id"])
+    except Exception as e:
+        print(f"[search] Could not record new {table} rows: {e}")
+
+def search_content(token: str, query: str, page: int = 1, page_size: int = 20):
+    """Ranked matches across the user's courses, quick learns and flashcard sets."""
+    user_id = verify_token_and_get_user_id(token)
+    if not user_id:
+        return {"error": "Invalid token or user not authenticated"}, 401
+    if not _TERM.search(query or ""):
+        return {"error": "Missing search query"}, 400
+    page = max(page, 1)
+    page_size = min(max(page_size, 1), SEARCH_PAGE_SIZE_MAX)
+
+    try:
+        start = time.perf_counter()
+        index = search_index()
+        index.refresh(user_id)
+        results = index.search(user_id, query, page_size + 1, (page - 1) * page_size)
+        return {
+            "query": query,
+            "page": page,
+            "page_size": page_size,
+            "has_more": len(results) > page_size,
+            "results": results[:page_size],
+            "took_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+    except Exception as e:
+        print(f"[ERROR] Search failed: {e}")
+        return {"error": str(e)}, 500
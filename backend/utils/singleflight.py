@@ -0,0 +1,224 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+import uuid
+import orjson
+from typing import Any, Awaitable, Callable, Optional
+from utils.json_provider import dumps_bytes
+
+'''
+Singleflight: identical generation requests that arrive while one is already running
+share its result instead of each calling Gemini.
+
+Requests are keyed by flight_key(endpoint, ...), built from the normalized
+parameters plus the prompt version. Within a worker, the first caller for a key runs
+the generation and the others wait for it. Threads use do() and coroutines use
+do_async(). Every caller gets its own copy of the result, so each can persist it
+under its own user.
+
+Across workers, SINGLEFLIGHT_REDIS_URL (or REDIS_URL) turns on a Redis handoff, when
+redis is installed. The leader holds a short-lived lock key and publishes the result
+under a result key with a TTL. Followers in other workers poll for the result. If the
+lock disappears without a result (the leader failed), followers generate on their own.
+Without Redis, only callers in the same worker are coalesced.
+'''
+
+SINGLEFLIGHT_REDIS_URL = os.getenv("SINGLEFLIGHT_REDIS_URL", os.getenv("REDIS_URL"))
+LOCK_TTL_SECONDS = 180       # longer than any single generation
+RESULT_TTL_SECONDS = 30      # only needs to outlive the followers' next poll
+POLL_INTERVAL_SECONDS = 0.25
+
+def _normalize(value: Any) -> str:
+    return "" if value is None else " ".join(str(value).casefold().split())
+
+def flight_key(endpoint: str, *params: Any) -> str:
+    """Stable key for a request: the endpoint plus a hash of its normalized parameters."""
+    digest = hashlib.sha1("\x1f".join(_normalize(p) for p in params).encode()).hexdigest()
+    return f"{endpoint}:{digest}"
+
+def _private_copy(result: Any) -> Any:
+    # Strings are immutable; documents are copied so callers can't affect each other
+    if isinstance(result, (str, bytes)) or result is None:
+        return result
+    return orjson.loads(dumps_bytes(result))
+
+# --- Cross-worker handoff ---
+
+class _RedisHandoff:
+    def __init__(self, url: Optional[str]):
+        self.url = url
+        self._client = None
+        self._connected = False
+        self._lock = threading.Lock()
+
+    def client(self):
+        if not self.url:
+            return None
+        with self._lock:
+            if not self._connected:
+                self._connected = True
+                try:
+                    import redis
+                    self._client = redis.Redis.from_url(self.url)
+                except Exception as e:
+                    print(f"[singleflight] Cross-worker coalescing disabled: {e}")
+        return self._client
+
+    def result(self, key: str):
+        raw = self._client.get(f"singleflight:result:{key}")
+        return orjson.loads(raw) if raw is not None else None
+
+    def acquire(self, key: str) -> Optional[str]:
+        token = uuid.uuid4().hex
+        if self._client.set(f"singleflight:lock:{key}", token, nx=True, ex=LOCK_TTL_SECONDS):
+            return token
+        return None
+
+    def publish(self, key: str, result: Any) -> None:
+        self._client.set(f"singleflight:result:{key}", dumps_bytes(result), ex=RESULT_TTL_SECONDS)
+
+    def release(self, key: str, token: str) -> None:
+        lock_key = f"singleflight:lock:{key}"
+        if self._client.get(lock_key) == token.encode():
+            self._client.delete(lock_key)
+
+    def leader_running(self, key: str) -> bool:
+        return bool(self._client.exists(f"singleflight:lock:{key}"))
+
+_handoff = _RedisHandoff(SINGLEFLIGHT_REDIS_URL)
+
+def _run_shared(key: str, fn: Callable[[], Any]) -> Any:
+    if _handoff.client() is None:
+        return fn()
+    try:
+        cached = _handoff.result(key)
+        if cached is not None:
+            return cached
+        token = _handoff.acquire(key)
+    except Exception as e:
+        print(f"[singleflight] Redis unavailable, generating locally: {e}")
+        return fn()
+
+    if token:
+        try:
+            result = fn()
+            _handoff.publish(key, result)
+            return result
+        finally:
+            try:
+                _handoff.release(key, token)
+            except Exception as e:
+                print(f"[singleflight] Failed to release lock {key}: {e}")
+
+    # Another worker is generating: wait for its result
+    try:
+        while True:
+            time.sleep(POLL_INTERVAL_SECONDS)
+            cached = _handoff.result(key)
+            if cached is not None:
+                return cached
+            if not _handoff.leader_running(key):
+                break
+    except Exception as e:
+        print(f"[singleflight] Lost Redis while waiting on {key}: {e}")
+    return fn()
+
+async def _run_shared_async(key: str, coro_fn: Callable[[], Awaitable[Any]]) -> Any:
+    if _handoff.client() is None:
+        return await coro_fn()
+    try:
+        cached = await asyncio.to_thread(_handoff.result, key)
+        if cached is not None:
+            return cached
+        token = await asyncio.to_thread(_handoff.acquire, key)
+    except Exception as e:
+        print(f"[singleflight] Redis unavailable, generating locally: {e}")
+        return await coro_fn()
+
+    if token:
+        try:
+            result = await coro_fn()
+            await asyncio.to_thread(_handoff.publish, key, result)
+            return result
+        finally:
+            try:
+                await asyncio.to_thread(_handoff.release, key, token)
+            except Exception as e:
+                print(f"[singleflight] Failed to release lock {key}: {e}")
+
+    try:
+        while True:
+            await asyncio.sleep(POLL_INTERVAL_SECONDS)
+            cached = await asyncio.to_thread(_handoff.result, key)
+            if cached is not None:
+                return cached
+            if not await asyncio.to_thread(_handoff.leader_running, key):
+                break
+    except Exception as e:
+        print(f"[singleflight] Lost Redis while waiting on {key}: {e}")
+    return await coro_fn()
+
+# --- In-process coalescing ---
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self._tasks = {}
+        self._lock = threading.Lock()
+        self.led = 0
+        self.shared = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Run fn() once per key among concurrent callers; each gets a private copy."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.led += 1
+            else:
+                call.waiters += 1
+                self.shared += 1
+
+        if leader:
+            try:
+                call.result = _run_shared(key, fn)
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+            if call.waiters:
+                print(f"[singleflight] {key} shared with {call.waiters} waiting request(s)")
+        else:
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+        return _private_copy(call.result)
+
+    async def do_async(self, key: str, coro_fn: Callable[[], Awaitable[Any]]) -> Any:
+        """do() for coroutines: concurrent callers on this event loop await one task."""
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(_run_shared_async(key, coro_fn))
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+            self.led += 1
+        else:
+            self.shared += 1
+        # Shielded so one client disconnecting doesn't cancel everyone's generation
+        result = await asyncio.shield(task)
+        return _private_copy(result)
+
+singleflight = SingleFlight()
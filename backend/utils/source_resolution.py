@@ -0,0 +1,85 @@
+import threading
+from typing import NamedTuple, Optional, Tuple
+from cachetools import LRUCache
+from utils.token_verification import supabase
+
+'''
+Source resolution for flashcard sets: source_id -> (type, owner).
+
+A source id is a course or quick learn primary key. Its type and owner never change,
+so resolved ids are kept in a small in-process LRU. Write paths still call
+invalidate_source() so a deleted source isn't resolved from the cache.
+
+fetch_source() reads the body in the same round-trip that resolves the id: it queries
+the hinted table first, by primary key, without .single() (which raises on a miss),
+and only falls back to the other table if the hint was wrong.
+'''
+
+SOURCE_TABLES = {"course": "courses", "quick-learn": "quick_learns"}
+
+# Columns flashcard generation needs from each source
+FLASHCARD_FIELDS = {
+    "course": "id, user_id, title, completed, unit_lessons",
+    "quick-learn": "id, user_id, title, topic, description, sections",
+}
+
+SOURCE_INDEX_SIZE = 4096
+
+class SourceRef(NamedTuple):
+    source_type: str
+    owner_id: str
+
+_index = LRUCache(maxsize=SOURCE_INDEX_SIZE)
+_lock = threading.Lock()
+
+def _lookup_order(type_hint: Optional[str]):
+    if type_hint in SOURCE_TABLES:
+        return [type_hint] + [t for t in SOURCE_TABLES if t != type_hint]
+    return list(SOURCE_TABLES)
+
+def _remember(source_id: str, source_type: str, owner_id: str) -> SourceRef:
+    with _lock:
+        ref = SourceRef(source_type, owner_id)
+        _index[source_id] = ref
+    return ref
+
+def cached_source(source_id: str) -> Optional[SourceRef]:
+    with _lock:
+        return _index.get(source_id)
+
+def fetch_source(source_id: str, type_hint: Optional[str] = None, columns: Optional[str] = None) -> Tuple[Optional[SourceRef], Optional[dict]]:
+    """
+    Resolve source_id and fetch its row in one go. columns maps to a select() list and
+    defaults to FLASHCARD_FIELDS for the source's type; it must include user_id.
+    Returns (None, None) if the id is in neither table.
+    """
+    ref = cached_source(source_id)
+    order = [ref.source_type] if ref else _lookup_order(type_hint)
+
+    for source_type in order:
+        result = supabase.table(SOURCE_TABLES[source_type]) \
+            .select(columns or FLASHCARD_FIELDS[source_type]) \
+            .eq("id", source_id) \
+            .limit(1) \
+            .execute()
+        if result.data:
+            row = result.data[0]
+            return ref or _remember(source_id, source_type, row.get("user_id")), row
+
+    if ref:
+        # Cached id no longer exists (deleted elsewhere)
+        invalidate_source(source_id)
+    return None, None
+
+def resolve_source(source_id: str, type_hint: Optional[str] = None) -> Optional[SourceRef]:
+    """Resolve source_id to its type and owner, from the cache or an id-only lookup."""
+    ref = cached_source(source_id)
+    if ref:
+        return ref
+    ref, _ = fetch_source(source_id, type_hint, columns="id, user_id")
+    return ref
+
+def invalidate_source(source_id: str) -> None:
+    """Drop a source from the index. Call after writes and deletes."""
+    with _lock:
+        _index.pop(source_id, None)
@@ -0,0 +1,94 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from cachetools import TTLCache
+from utils.course_generation import generate_lesson, lesson_key, parse_syllabus
+
+'''
+Speculative lesson pre-generation (opt-in: SPECULATIVE_LESSONS=1).
+
+While the user reviews a freshly generated syllabus, the lessons of its first
+SPECULATIVE_UNITS unit(s) are generated in the background. Results are keyed by
+lesson_key alone (a hash of the lesson's title, summary and objectives), not by who
+asked: /generate_syllabus is called without a token while /generate_course has one,
+and requests coalesced onto one syllabus would otherwise speculate the same lessons
+once per user. /generate_course claims the speculative lessons whose key matches a
+lesson of the submitted syllabus, and generate_course_from_syllabus reuses them.
+Edited lessons simply don't match.
+
+Only lessons that already have learning objectives are speculated, because filling
+them in later would change the key. Unclaimed lessons expire after
+SPECULATION_TTL_SECONDS. Work is capped by a small thread pool and a global queue
+limit, so speculation can't crowd out requests that were actually made.
+
+Speculative lessons live in the worker that generated the syllabus, so with several
+workers a /generate_course request that lands elsewhere just generates everything as
+before.
+'''
+
+SPECULATIVE_LESSONS = os.getenv("SPECULATIVE_LESSONS", "").lower() in ("1", "true", "yes")
+SPECULATIVE_UNITS = int(os.getenv("SPECULATIVE_UNITS", 1))
+SPECULATIVE_MAX_LESSONS = int(os.getenv("SPECULATIVE_MAX_LESSONS", 6))
+SPECULATIVE_WORKERS = int(os.getenv("SPECULATIVE_WORKERS", 4))
+SPECULATIVE_MAX_QUEUED = int(os.getenv("SPECULATIVE_MAX_QUEUED", 24))
+SPECULATION_TTL_SECONDS = float(os.getenv("SPECULATION_TTL_SECONDS", 1800))
+
+class LessonSpeculator:
+    def __init__(self, enabled: bool = SPECULATIVE_LESSONS, ttl: float = SPECULATION_TTL_SECONDS):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._lessons = TTLCache(maxsize=4096, ttl=ttl)  # lesson_key -> Future
+        self._pool = None
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=SPECULATIVE_WORKERS, thread_name_prefix="speculate")
+        return self._pool
+
+    def _queued(self) -> int:
+        return sum(1 for future in self._lessons.values() if not future.done())
+
+    def start(self, syllabus_json) -> int:
+        """Begin generating the first unit(s) of a syllabus; returns the number of lessons queued."""
+        if not self.enabled:
+            return 0
+        try:
+            course = parse_syllabus(syllabus_json).course
+        except ValueError as e:
+            print(f"[speculation] Not speculating on an invalid syllabus: {e}")
+            return 0
+
+        lessons = [
+            (lesson, f"UNIT {unit.unit_number}: {unit.title}", unit.unit_number)
+            for unit in course.units[:SPECULATIVE_UNITS]
+            for lesson in unit.lesson_outline
+            if lesson.learning_objectives
+        ][:SPECULATIVE_MAX_LESSONS]
+
+        with self._lock:
+            # Lessons already speculated (the same syllabus served to someone else) aren't redone
+            new = {}
+            for lesson, unit_title, unit_number in lessons:
+                key = lesson_key(lesson)
+                if key not in self._lessons and key not in new:
+                    new[key] = (lesson, unit_title, unit_number)
+            if not new or self._queued() + len(new) > SPECULATIVE_MAX_QUEUED:
+                return 0
+            for key, args in new.items():
+                self._lessons[key] = self._executor().submit(generate_lesson, *args)
+        print(f"[speculation] Pre-generating {len(new)} lessons")
+        return len(new)
+
+    def claim(self, syllabus_json) -> dict:
+        """Take the speculative lessons (lesson_key -> Future) matching a submitted syllabus."""
+        if not self.enabled:
+            return {}
+        try:
+            course = parse_syllabus(syllabus_json).course
+        except ValueError:
+            return {}
+        keys = {lesson_key(lesson) for unit in course.units for lesson in unit.lesson_outline}
+        with self._lock:
+            return {key: self._lessons.pop(key) for key in keys if key in self._lessons}
+
+lesson_speculator = LessonSpeculator()
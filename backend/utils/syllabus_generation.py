@@ -1,7 +1,11 @@
+import asyncio
 import json
+from concurrent.futures import ThreadPoolExecutor
 from google import genai
 import os
 from dotenv import load_dotenv
+from utils.model_routing import generate, generate_async, generate_stream, generate_stream_async
+from utils.incremental_json import IncrementalJSONParser, WILDCARD
 
 '''
 1. Setup
@@ -44,36 +48,185 @@ class Course(BaseModel):
 class Syllabus(BaseModel):
     course: Course
 
+class LessonObjectives(BaseModel):
+    learning_objectives: List[str]
+
+def needs_learning_objectives(course_data: dict) -> bool:
+    """True if any lesson in the syllabus is missing its learning objectives."""
+    units = course_data.get("units", [])
+    for unit in units:
+        for lesson in unit.get("lesson_outline", []):
+            if not lesson.get("learning_objectives"):
+                return True
+    return False
+
+def build_syllabus_prompt(topic: str, difficulty: str, depth: str) -> list:
+    return [f"Generate a detailed syllabus in JSON format for a course on '{topic}'.",
+            f"The course should be at a '{difficulty}' difficulty level with a '{depth}' depth.",
+            "The response must include:",
+            "- Course title and description",
+            "- Estimated number of weeks and hours per week to complete the course",
+            "- A list of units, each with a title, description, and an ordered list of lessons",
+            "- Each lesson must include:",
+            "  - Lesson title",
+            "  - Lesson summary",
+            "  - Learning objectives (a list of 3–5 goals students should achieve after the lesson)"]
+
+def build_lesson_objectives_prompt(course: dict, unit: dict, lesson: dict) -> list:
+    siblings = [l.get("lesson", "") for l in unit.get("lesson_outline", [])]
+    return [f"Write 3–5 learning objectives (goals students should achieve) for one lesson of the course '{course.get('title', '')}'.",
+            f"Unit {unit.get('unit_number')}: {unit.get('title', '')} — {unit.get('unit_description', '')}",
+            f"Lessons in this unit: {'; '.join(siblings)}",
+            f"Lesson: {lesson.get('lesson', '')}",
+            f"Lesson summary: {lesson.get('lesson_summary', '')}"]
+
+OBJECTIVES_CONFIG = {'response_mime_type': 'application/json',
+                     'response_schema': LessonObjectives,
+                    }
+
+# Bump when the syllabus prompt, schema or model changes (part of the singleflight key)
+SYLLABUS_PROMPT_VERSION = "2"
+
+MAX_OBJECTIVE_CALLS = 8
+
+SYLLABUS_CONFIG = {'response_mime_type': 'application/json',
+                   'response_schema': Syllabus,
+                  }
+
 def get_syllabus(topic: str, difficulty: str, depth: str) -> str:
     print(f"Generating syllabus for topic: {topic}, difficulty: {difficulty}, depth: {depth}")
-    response = client.models.generate_content(
-        model="gemini-2.0-flash",
-        contents=[f"Generate a detailed syllabus in JSON format for a course on '{topic}'.",
-                  f"The course should be at a '{difficulty}' difficulty level with a '{depth}' depth.",
-                  "The response must include:",
-                  "- Course title and description",
-                  "- Estimated number of weeks and hours per week to complete the course",
-                  "- A list of units, each with a title, description, and an ordered list of lessons",
-                  "- Each lesson must include:",
-                  "  - Lesson title",
-                  "  - Lesson summary",
-                  "  - Learning objectives (a list of 3–5 goals students should achieve after the lesson)"],
-        config={'response_mime_type': 'application/json',
-                'response_schema': Syllabus,
-               }
-    )
+    response = generate(client, "syllabus", build_syllabus_prompt(topic, difficulty, depth), SYLLABUS_CONFIG)
     return response.text
 
-def regenerate_learning_objectives(course_json: dict) -> dict:
-    print("Regenerating learning objectives for course...")
-    response = client.models.generate_content(
-        model="gemini-2.0-flash",
-        contents=[f"You're given a partial course syllabus in JSON format. "
-                  f"Some lessons may be missing their 'learning_objectives' field or have it as an empty list. "
-                  f"Your task is to fill in those fields while preserving all existing data.\n\n"
-                  f"Here is the current course syllabus:\n{json.dumps(course_json)}"],
-        config={'response_mime_type': 'application/json',
-                'response_schema': Syllabus,
-                }
+async def get_syllabus_async(topic: str, difficulty: str, depth: str) -> str:
+    print(f"Generating syllabus (async) for topic: {topic}, difficulty: {difficulty}, depth: {depth}")
+    response = await generate_async(client, "syllabus", build_syllabus_prompt(topic, difficulty, depth), SYLLABUS_CONFIG)
+    return response.text
+
+# Course fields sent in the {"type": "header"} event of a streamed syllabus
+SYLLABUS_HEADER_FIELDS = ("title", "description", "estimated_duration_hours_per_week",
+                          "estimated_number_of_weeks", "level", "depth")
+
+class SyllabusStream:
+    """
+    Turns streamed syllabus JSON into events for /generate_syllabus/stream:
+    {"type": "header", "course": {...}} once the course fields are in (or before the
+    first unit), {"type": "unit", "index": i, "unit": {...}} as soon as each unit is
+    complete, and {"type": "done", "syllabus": {...}} with the full document.
+    """
+
+    def __init__(self):
+        watch = [("course", field) for field in SYLLABUS_HEADER_FIELDS]
+        watch.append(("course", "units", WILDCARD))
+        self._parser = IncrementalJSONParser(watch)
+        self._header = {}
+        self._header_sent = False
+
+    def _header_event(self) -> list:
+        if self._header_sent:
+            return []
+        self._header_sent = True
+        return [{"type": "header", "course": self._header}]
+
+    def feed(self, text: str) -> list:
+        events = []
+        for path, value in self._parser.feed(text):
+            if len(path) == 2:
+                self._header[path[1]] = value
+                if len(self._header) == len(SYLLABUS_HEADER_FIELDS):
+                    events.extend(self._header_event())
+            else:
+                events.extend(self._header_event())
+                events.append({"type": "unit", "index": path[2], "unit": value})
+        return events
+
+    def finish(self) -> list:
+        syllabus = self._parser.close()
+        return self._header_event() + [{"type": "done", "syllabus": syllabus}]
+
+def stream_syllabus(topic: str, difficulty: str, depth: str):
+    """get_syllabus(), yielding SyllabusStream events while Gemini is still writing."""
+    print(f"Streaming syllabus for topic: {topic}, difficulty: {difficulty}, depth: {depth}")
+    stream = SyllabusStream()
+    for chunk in generate_stream(client, "syllabus", build_syllabus_prompt(topic, difficulty, depth), SYLLABUS_CONFIG):
+        if chunk.text:
+            yield from stream.feed(chunk.text)
+    yield from stream.finish()
+
+async def stream_syllabus_async(topic: str, difficulty: str, depth: str):
+    print(f"Streaming syllabus (async) for topic: {topic}, difficulty: {difficulty}, depth: {depth}")
+    stream = SyllabusStream()
+    async for chunk in generate_stream_async(client, "syllabus", build_syllabus_prompt(topic, difficulty, depth), SYLLABUS_CONFIG):
+        if chunk.text:
+            for event in stream.feed(chunk.text):
+                yield event
+    for event in stream.finish():
+        yield event
+
+def missing_objectives(course_data: dict) -> list:
+    """(unit, lesson) pairs of the lessons without learning objectives."""
+    course = course_data.get("course", course_data)
+    return [
+        (unit, lesson)
+        for unit in course.get("units", [])
+        for lesson in unit.get("lesson_outline", [])
+        if not lesson.get("learning_objectives")
+    ]
+
+def generate_lesson_objectives(course: dict, unit: dict, lesson: dict) -> List[str]:
+    response = generate(client, "lesson_objectives", build_lesson_objectives_prompt(course, unit, lesson), OBJECTIVES_CONFIG)
+    return json.loads(response.text).get("learning_objectives", [])
+
+async def generate_lesson_objectives_async(course: dict, unit: dict, lesson: dict) -> List[str]:
+    response = await generate_async(client, "lesson_objectives", build_lesson_objectives_prompt(course, unit, lesson), OBJECTIVES_CONFIG)
+    return json.loads(response.text).get("learning_objectives", [])
+
+def fill_learning_objectives(course_data: dict) -> dict:
+    """
+    Fill in missing learning objectives with one small Gemini call per incomplete lesson
+    (run in parallel), merged into course_data in place. Nothing else is sent or
+    regenerated, so cost scales with the number of missing lessons. A lesson whose call
+    fails is left as it was.
+    """
+    course = course_data.get("course", course_data)
+    missing = missing_objectives(course)
+    if not missing:
+        return course_data
+    print(f"Filling learning objectives for {len(missing)} lesson(s)...")
+
+    with ThreadPoolExecutor(max_workers=min(len(missing), MAX_OBJECTIVE_CALLS)) as pool:
+        futures = [(lesson, pool.submit(generate_lesson_objectives, course, unit, lesson)) for unit, lesson in missing]
+        for lesson, future in futures:
+            try:
+                lesson["learning_objectives"] = future.result()
+            except Exception as e:
+                print(f"[ERROR] Filling objectives for lesson {lesson.get('lesson')}: {e}")
+    return course_data
+
+async def fill_learning_objectives_async(course_data: dict) -> dict:
+    """Async version of fill_learning_objectives (calls gathered on the event loop)."""
+    course = course_data.get("course", course_data)
+    missing = missing_objectives(course)
+    if not missing:
+        return course_data
+    print(f"Filling learning objectives (async) for {len(missing)} lesson(s)...")
+
+    results = await asyncio.gather(
+        *[generate_lesson_objectives_async(course, unit, lesson) for unit, lesson in missing],
+        return_exceptions=True,
     )
-    return response.text
\ No newline at end of file
+    for (_, lesson), objectives in zip(missing, results):
+        if isinstance(objectives, Exception):
+            print(f"[ERROR] Filling objectives for lesson {lesson.get('lesson')}: {objectives}")
+        else:
+            lesson["learning_objectives"] = objectives
+    return course_data
+
+def generate_complete_syllabus(topic: str, difficulty: str, depth: str) -> dict:
+    """
+    Syllabus with every lesson's learning objectives filled in, with level and depth set
+    to the requested values (as the create page does). For offline/batch generation.
+    """
+    syllabus = json.loads(get_syllabus(topic, difficulty, depth))
+    syllabus.setdefault("course", {}).update(level=difficulty, depth=depth)
+    return fill_learning_objectives(syllabus)
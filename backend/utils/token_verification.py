@@ -1,4 +1,5 @@
-from supabase import create_client
+import asyncio
+from supabase import create_client, acreate_client, AsyncClient
 import os
 import jwt
 from dotenv import load_dotenv
@@ -9,6 +10,21 @@ SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
 
+# Async client for the ASGI app (asgi.py). Created lazily on first use so it is bound
+# to the server's event loop rather than whatever loop exists at import time.
+_async_supabase = None
+_async_supabase_lock = None
+
+async def get_async_supabase() -> AsyncClient:
+    global _async_supabase, _async_supabase_lock
+    if _async_supabase is None:
+        if _async_supabase_lock is None:
+            _async_supabase_lock = asyncio.Lock()
+        async with _async_supabase_lock:
+            if _async_supabase is None:
+                _async_supabase = await acreate_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+    return _async_supabase
+
 def verify_token_and_get_user_id(token: str):
     try:
         decoded = jwt.decode(token, options={"verify_signature": False})  # Only for extracting sub
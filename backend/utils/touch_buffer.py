@@ -0,0 +1,115 @@
+import atexit
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+from utils.token_verification import supabase
+
+'''
+Write-behind buffer for last_accessed "touches".
+
+Opening a row used to cost an update round-trip before the read. Now touch() records
+the access in memory and returns, and a background thread flushes every
+TOUCH_FLUSH_INTERVAL_SECONDS. Repeated touches of a row collapse into one. Timestamps
+are kept to the second, so everything touched in the same second shares one
+`update ... where id in (...)` per table. The update only moves last_accessed
+forward, so a late flush never overwrites a newer write.
+
+Rows are only touched after the caller has read them with a user_id filter, so the
+flush doesn't need to re-check ownership. It deliberately doesn't upsert: an upsert
+would recreate rows deleted since the touch.
+
+Pending touches are flushed at interpreter exit (atexit) and on ASGI shutdown.
+'''
+
+TOUCH_FLUSH_INTERVAL_SECONDS = float(os.getenv("TOUCH_FLUSH_INTERVAL_SECONDS", 5))
+
+class TouchBuffer:
+    def __init__(self, interval: float = TOUCH_FLUSH_INTERVAL_SECONDS):
+        self.interval = interval
+        self._pending: Dict[Tuple[str, str], str] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self.touches = 0
+        self.writes = 0
+
+    def touch(self, table: str, row_id: str) -> str:
+        """Record an access to a row now; returns the timestamp that will be written."""
+        now = datetime.now(timezone.utc).replace(microsecond=0).isoformat()
+        with self._lock:
+            self._pending[(table, str(row_id))] = now
+            self.touches += 1
+        self._ensure_thread()
+        return now
+
+    def pending(self, table: str, row_id: str):
+        with self._lock:
+            return self._pending.get((table, str(row_id)))
+
+    def apply_pending(self, table: str, rows: List[dict]) -> List[dict]:
+        """Overlay unflushed touches onto rows read from the database, re-sorted newest first."""
+        with self._lock:
+            if not any(t == table for t, _ in self._pending):
+                return rows
+            for row in rows:
+                touched = self._pending.get((table, str(row.get("id"))))
+                if touched and touched > (row.get("last_accessed") or ""):
+                    row["last_accessed"] = touched
+        return sorted(rows, key=lambda row: row.get("last_accessed") or "", reverse=True)
+
+    def flush(self) -> int:
+        """Write all pending touches. Returns the number of rows flushed."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+
+            groups: Dict[Tuple[str, str], List[str]] = {}
+            for (table, row_id), timestamp in batch.items():
+                groups.setdefault((table, timestamp), []).append(row_id)
+
+            for (table, timestamp), row_ids in groups.items():
+                try:
+                    supabase.table(table) \
+                        .update({"last_accessed": timestamp}) \
+                        .in_("id", row_ids) \
+                        .or_(f'last_accessed.is.null,last_accessed.lt."{timestamp}"') \
+                        .execute()
+                    self.writes += 1
+                except Exception as e:
+                    print(f"[ERROR] Flushing {len(row_ids)} last_accessed touches on {table} failed: {e}")
+                    self._requeue(table, timestamp, row_ids)
+            return len(batch)
+
+    def _requeue(self, table: str, timestamp: str, row_ids: List[str]) -> None:
+        with self._lock:
+            for row_id in row_ids:
+                key = (table, row_id)
+                if self._pending.get(key, "") < timestamp:
+                    self._pending[key] = timestamp
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="touch-buffer", daemon=True)
+                self._thread.start()
+
+touch_buffer = TouchBuffer()
+
+def touch(table: str, row_id: str) -> str:
+    return touch_buffer.touch(table, row_id)
+
+def flush_touches() -> int:
+    return touch_buffer.flush()
+
+atexit.register(flush_touches)
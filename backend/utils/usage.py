@@ -0,0 +1,71 @@
+import contextvars
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+'''
+Gemini token usage accounting.
+
+Generation functions call record_usage(stage, response) after each Gemini call. It
+adds the response's usage_metadata to the tracker active in the current context, and
+does nothing when there isn't one, so request handlers pay nothing for it. Callers
+that want totals (e.g. the bulk generation CLI) wrap the work in track_usage().
+Worker threads don't inherit context variables, so the tracker is passed along
+explicitly (see run_tracked).
+'''
+
+_current: contextvars.ContextVar[Optional["UsageTracker"]] = contextvars.ContextVar("usage_tracker", default=None)
+
+class UsageTracker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.total_tokens = 0
+        self.by_stage = {}
+
+    def add(self, stage: str, usage) -> None:
+        prompt = getattr(usage, "prompt_token_count", None) or 0
+        output = getattr(usage, "candidates_token_count", None) or 0
+        total = getattr(usage, "total_token_count", None) or prompt + output
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt
+            self.output_tokens += output
+            self.total_tokens += total
+            stage_totals = self.by_stage.setdefault(stage, {"calls": 0, "total_tokens": 0})
+            stage_totals["calls"] += 1
+            stage_totals["total_tokens"] += total
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "prompt_tokens": self.prompt_tokens,
+                "output_tokens": self.output_tokens,
+                "total_tokens": self.total_tokens,
+                "by_stage": {stage: dict(totals) for stage, totals in self.by_stage.items()},
+            }
+
+@contextmanager
+def track_usage(tracker: Optional[UsageTracker] = None):
+    tracker = tracker or UsageTracker()
+    token = _current.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _current.reset(token)
+
+def run_tracked(tracker: UsageTracker, fn, *args, **kwargs):
+    """Call fn with tracker active; for work handed to a thread pool."""
+    with track_usage(tracker):
+        return fn(*args, **kwargs)
+
+def record_usage(stage: str, response) -> None:
+    tracker = _current.get()
+    if tracker is None:
+        return
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        tracker.add(stage, usage)